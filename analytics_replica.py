@@ -0,0 +1,108 @@
+"""
+نسخة قراءة للتحليلات في الذاكرة
+In-Memory Analytics Replica
+"""
+import time
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict, List
+from config import Config
+from database_manager import db, shard_index
+from backup_manager import copy_snapshot
+
+logger = logging.getLogger(__name__)
+
+class AnalyticsReplica:
+    """نسخة من قاعدة البيانات في الذاكرة تُحدَّث دورياً لتشغيل التقارير الثقيلة بعيداً عن الملف الأساسي"""
+
+    def __init__(self, db_path: str = None, refresh_seconds: int = None, enabled: bool = None):
+        self.db_path = db_path or Config.DB_PATH
+        # الملف الأساسي أولاً ثم ملفات الأجزاء بترتيبها
+        self.paths = [self.db_path] + Config.shard_paths()
+        self.refresh_seconds = refresh_seconds if refresh_seconds is not None else Config.ANALYTICS_REFRESH_SECONDS
+        self.enabled = enabled if enabled is not None else Config.ANALYTICS_REPLICA
+        self._conns: List[sqlite3.Connection] = []
+        self._refreshed_at = 0.0  # وقت آخر تحديث (epoch)
+        # قفل القراءة يحمي الاتصال المشترك، وقفل التحديث يمنع تحديثين متزامنين
+        self._read_lock = threading.RLock()
+        self._refresh_lock = threading.Lock()
+
+    def refresh(self) -> Dict:
+        """بناء نسخة جديدة من لقطة متسقة لكل ملف ثم استبدال القديمة"""
+        if not self.enabled:
+            return {'enabled': False}
+
+        with self._refresh_lock:
+            start = time.monotonic()
+            replicas = []
+            try:
+                for path in self.paths:
+                    replicas.append(self._copy(path))
+            except Exception:
+                for replica in replicas:
+                    replica.close()
+                raise
+
+            with self._read_lock:
+                old, self._conns = self._conns, replicas
+                self._refreshed_at = time.time()
+            for conn in old:
+                conn.close()
+
+            duration = time.monotonic() - start
+            logger.debug(f"📈 تم تحديث نسخة التحليلات في {duration:.2f} ثانية")
+            return {'enabled': True, 'duration_s': round(duration, 3)}
+
+    def _copy(self, path: str) -> sqlite3.Connection:
+        source = sqlite3.connect(path, timeout=Config.DB_BUSY_TIMEOUT / 1000)
+        replica = sqlite3.connect(':memory:', check_same_thread=False)
+        try:
+            copy_snapshot(source, replica)
+        except Exception:
+            replica.close()
+            raise
+        finally:
+            source.close()
+
+        replica.row_factory = sqlite3.Row
+        replica.execute('PRAGMA query_only = ON')
+        return replica
+
+    @contextmanager
+    def get_connection(self, bot_id: int = None):
+        """اتصال قراءة للتقارير: النسخة في الذاكرة إن كانت مفعلة، وإلا الملف الأساسي
+
+        مع bot_id يُعاد جزء bot_users و bot_stats الخاص بالبوت
+        """
+        if self.enabled and not self._conns:
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"خطأ في تحديث نسخة التحليلات: {e}")
+
+        if not self._conns:
+            source = db.get_connection() if bot_id is None else db.get_shard_connection(bot_id)
+            with source as conn:
+                yield conn
+            return
+
+        index = 0 if bot_id is None or len(self.paths) == 1 else 1 + shard_index(bot_id, len(self.paths) - 1)
+        with self._read_lock:
+            yield self._conns[index]
+
+    @property
+    def age_seconds(self) -> float:
+        """عمر البيانات في النسخة الحالية"""
+        return time.time() - self._refreshed_at if self._conns else 0.0
+
+    def close(self):
+        """إغلاق النسخة في الذاكرة"""
+        with self._read_lock:
+            for conn in self._conns:
+                conn.close()
+            self._conns = []
+
+# إنشاء مثيل مشترك من نسخة التحليلات
+analytics_replica = AnalyticsReplica()
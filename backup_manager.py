@@ -0,0 +1,196 @@
+"""
+النسخ الاحتياطي لقاعدة البيانات
+Database Backup Manager
+
+الاستخدام:
+    python backup_manager.py backup
+    python backup_manager.py list
+    python backup_manager.py restore backups/database-20250101-033000.db.gz
+    (مع DB_SHARDS > 1 تُستعاد نسخة كل جزء بنفس الطريقة وتُحدَّد وجهتها من اسم الملف)
+"""
+import os
+import sys
+import glob
+import gzip
+import time
+import shutil
+import sqlite3
+import logging
+import argparse
+from datetime import datetime
+from typing import List
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+def copy_snapshot(source: sqlite3.Connection, target: sqlite3.Connection,
+                  pages: int = -1, step_sleep: float = 0):
+    """نسخ لقطة متسقة من source إلى target عبر واجهة SQLite backup"""
+    # تثبيت لقطة قراءة (WAL) حتى لا تُعاد النسخة من البداية عند كل كتابة جديدة
+    source.execute('BEGIN')
+    try:
+        source.execute('SELECT COUNT(*) FROM sqlite_master').fetchone()
+
+        def pause(status, remaining, total):
+            time.sleep(step_sleep)
+
+        source.backup(target, pages=pages, progress=pause if step_sleep else None)
+    finally:
+        source.rollback()
+
+class BackupManager:
+    """نسخ احتياطي حي بواجهة SQLite backup على خطوات صغيرة مع ضغط وتدوير"""
+
+    def __init__(self, db_path: str = None, backup_dir: str = None, keep: int = None,
+                 shard_paths: List[str] = None):
+        self.db_path = db_path or Config.DB_PATH
+        self.backup_dir = backup_dir or Config.BACKUP_DIR
+        self.keep = keep if keep is not None else Config.BACKUP_KEEP
+        # الملف الأساسي ثم ملفات أجزاء bot_users و bot_stats
+        self.paths = [self.db_path] + (shard_paths if shard_paths is not None else Config.shard_paths())
+
+    @staticmethod
+    def _prefix(path: str) -> str:
+        return os.path.splitext(os.path.basename(path))[0]
+
+    def create_backup(self) -> List[str]:
+        """إنشاء نسخة مضغوطة من كل ملف دون إيقاف الكتابة (قائمة فارغة عند الفشل)"""
+        os.makedirs(self.backup_dir, exist_ok=True)
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+        start = time.monotonic()
+        created = []
+
+        try:
+            for path in self.paths:
+                created.append(self._backup_file(path, stamp))
+        except Exception as e:
+            logger.error(f"خطأ في إنشاء النسخة الاحتياطية: {e}")
+            # لا نحتفظ بمجموعة ناقصة
+            for path in created:
+                os.remove(path)
+            return []
+
+        size_mb = sum(os.path.getsize(path) for path in created) / (1024 * 1024)
+        logger.info(f"💾 تم إنشاء {len(created)} نسخة احتياطية ({size_mb:.1f}MB) في {time.monotonic() - start:.1f} ثانية")
+        self.rotate()
+        return created
+
+    def _backup_file(self, source_path: str, stamp: str) -> str:
+        """نسخ ملف واحد وضغطه وإرجاع مسار النسخة"""
+        prefix = self._prefix(source_path)
+        temp_path = os.path.join(self.backup_dir, f'.{prefix}-{stamp}.db.tmp')
+        final_path = os.path.join(self.backup_dir, f'{prefix}-{stamp}.db.gz')
+        suffix = 1
+        while os.path.exists(final_path):
+            final_path = os.path.join(self.backup_dir, f'{prefix}-{stamp}-{suffix}.db.gz')
+            suffix += 1
+
+        try:
+            self._copy_online(source_path, temp_path)
+
+            with open(temp_path, 'rb') as raw, gzip.open(final_path, 'wb', compresslevel=6) as packed:
+                shutil.copyfileobj(raw, packed, length=1024 * 1024)
+            return final_path
+        except Exception:
+            if os.path.exists(final_path):
+                os.remove(final_path)
+            raise
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def _copy_online(self, source_path: str, target_path: str):
+        """نسخ صفحات قاعدة البيانات على دفعات مع التوقف بين الخطوات لإفساح المجال للكتابة"""
+        source = sqlite3.connect(source_path, timeout=Config.DB_BUSY_TIMEOUT / 1000)
+        target = sqlite3.connect(target_path)
+        try:
+            copy_snapshot(source, target, Config.BACKUP_PAGES_PER_STEP, Config.BACKUP_STEP_SLEEP)
+        finally:
+            target.close()
+            source.close()
+
+    def list_backups(self, source_path: str = None) -> List[str]:
+        """قائمة النسخ الاحتياطية (لملف محدد أو لكل الملفات) من الأحدث للأقدم"""
+        backups = []
+        for path in ([source_path] if source_path else self.paths):
+            backups.extend(glob.glob(os.path.join(self.backup_dir, f'{self._prefix(path)}-*.db.gz')))
+        return sorted(backups, key=os.path.getmtime, reverse=True)
+
+    def rotate(self) -> int:
+        """حذف النسخ الزائدة عن العدد المسموح لكل ملف"""
+        removed = 0
+        for source_path in self.paths:
+            for path in self.list_backups(source_path)[self.keep:]:
+                try:
+                    os.remove(path)
+                    removed += 1
+                except OSError as e:
+                    logger.error(f"خطأ في حذف النسخة القديمة {path}: {e}")
+        return removed
+
+    def _target_for(self, backup_path: str) -> str:
+        """الملف الذي تعود إليه النسخة حسب بادئة اسمها"""
+        name = os.path.basename(backup_path)
+        for path in self.paths:
+            if name.startswith(f'{self._prefix(path)}-'):
+                return path
+        return self.db_path
+
+    def restore(self, backup_path: str, target_path: str = None) -> bool:
+        """استعادة نسخة احتياطية (يجب إيقاف مصنع البوتات أولاً)"""
+        target_path = target_path or self._target_for(backup_path)
+        temp_path = f'{target_path}.restore.tmp'
+
+        try:
+            with gzip.open(backup_path, 'rb') as packed, open(temp_path, 'wb') as raw:
+                shutil.copyfileobj(packed, raw, length=1024 * 1024)
+
+            restored = sqlite3.connect(temp_path)
+            try:
+                check = restored.execute('PRAGMA integrity_check').fetchone()[0]
+                if check != 'ok':
+                    logger.error(f"❌ النسخة الاحتياطية تالفة: {check}")
+                    return False
+
+                # الكتابة عبر واجهة backup تحافظ على اتساق ملفات WAL الخاصة بالهدف
+                target = sqlite3.connect(target_path, timeout=Config.DB_BUSY_TIMEOUT / 1000)
+                try:
+                    restored.backup(target)
+                finally:
+                    target.close()
+            finally:
+                restored.close()
+
+            logger.info(f"✅ تمت استعادة {backup_path} إلى {target_path}")
+            return True
+        except Exception as e:
+            logger.error(f"خطأ في استعادة النسخة الاحتياطية: {e}")
+            return False
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+# إنشاء مثيل مشترك من مدير النسخ الاحتياطي
+backup_manager = BackupManager()
+
+def main():
+    """واجهة سطر الأوامر للنسخ الاحتياطي والاستعادة"""
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description='النسخ الاحتياطي لقاعدة بيانات مصنع البوتات')
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('backup', help='إنشاء نسخة احتياطية الآن')
+    commands.add_parser('list', help='عرض النسخ الاحتياطية')
+    restore_parser = commands.add_parser('restore', help='استعادة نسخة احتياطية (أوقف المصنع أولاً)')
+    restore_parser.add_argument('path', help='مسار ملف النسخة .db.gz')
+
+    args = parser.parse_args()
+    if args.command == 'backup':
+        return 0 if backup_manager.create_backup() else 1
+    if args.command == 'list':
+        for path in backup_manager.list_backups():
+            print(path)
+        return 0
+    return 0 if backup_manager.restore(args.path) else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -14,8 +14,13 @@ from telegram.ext import (
 
 # استيراد الوحدات المخصصة
 from config import Config, EMOJIS, MESSAGES
-from database_manager import db
+from database_manager import db, async_db
+from db_metrics import metrics as db_metrics
 from bot_monitor import monitor, BotAnalytics
+from maintenance import maintenance
+from analytics_replica import analytics_replica
+from health_history import health_history
+from rate_limiter import PTBRateLimiter
 from utils import (
     TokenValidator, MessageFormatter, BroadcastManager, 
     SecurityManager, FileManager
@@ -36,13 +41,14 @@ logger = logging.getLogger(__name__)
 class BotFactory:
     def __init__(self):
         self.app = None
+        self.loop = None
         
     async def start_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """معالج أمر البدء"""
         user = update.effective_user
         
         # تسجيل المستخدم في قاعدة البيانات
-        db.add_or_update_user(
+        await async_db.add_or_update_user(
             user_id=user.id,
             username=user.username,
             first_name=user.first_name,
@@ -50,7 +56,7 @@ class BotFactory:
         )
         
         # تسجيل النشاط
-        db.log_activity(user.id, 'start_command', 'بدء استخدام البوت')
+        await async_db.log_activity(user.id, 'start_command', 'بدء استخدام البوت')
         
         # إنشاء لوحة التحكم
         keyboard = self._create_main_keyboard(user.id)
@@ -98,7 +104,7 @@ class BotFactory:
         data = query.data
         
         # تسجيل النشاط
-        db.log_activity(user.id, 'button_click', data)
+        await async_db.log_activity(user.id, 'button_click', data)
         
         # توجيه الطلبات حسب نوع الزر
         if data == 'main_menu':
@@ -117,6 +123,8 @@ class BotFactory:
             await self._handle_delete_bot(query, data)
         elif data.startswith('confirm_delete_'):
             await self._confirm_delete_bot(query, data)
+        elif data.startswith('check_'):
+            await self._handle_check_bot(query, data)
         
         # أزرار المالك
         elif SecurityManager.is_owner(user.id):
@@ -128,6 +136,8 @@ class BotFactory:
                 await self._show_broadcast_menu(query)
             elif data == 'system_stats':
                 await self._show_system_stats(query)
+            elif data == 'db_stats':
+                await self._show_db_stats(query)
             elif data.startswith('admin_'):
                 await self._handle_admin_action(query, data)
     
@@ -145,8 +155,8 @@ class BotFactory:
         user_id = query.from_user.id
         
         # التحقق من الحد المسموح
-        current_count = db.count_user_bots(user_id)
-        limit = db.get_user_limit(user_id)
+        current_count = await async_db.count_user_bots(user_id)
+        limit = await async_db.get_user_limit(user_id)
         
         if current_count >= limit:
             await query.edit_message_text(
@@ -179,7 +189,7 @@ class BotFactory:
     
     async def _show_my_bots(self, query):
         """عرض بوتات المستخدم"""
-        user_bots = db.get_user_bots(query.from_user.id)
+        user_bots = await async_db.get_user_bots(query.from_user.id)
         
         if not user_bots:
             await query.edit_message_text(
@@ -217,7 +227,7 @@ class BotFactory:
     
     async def _show_my_stats(self, query):
         """عرض إحصائيات المستخدم"""
-        user_bots = db.get_user_bots(query.from_user.id)
+        user_bots = await async_db.get_user_bots(query.from_user.id)
         stats_text = MessageFormatter.format_user_stats(query.from_user.id, user_bots)
         
         await query.edit_message_text(
@@ -231,7 +241,7 @@ class BotFactory:
     async def _handle_bot_action(self, query, data):
         """معالج إجراءات البوت المحدد"""
         bot_id = int(data.split('_')[1])
-        bot_info = db.get_bot_info(bot_id)
+        bot_info = await async_db.get_bot_info(bot_id)
         
         if not bot_info or not SecurityManager.can_manage_bot(query.from_user.id, bot_info['owner_id']):
             await query.answer("❌ ليس لديك صلاحية لهذا البوت")
@@ -243,6 +253,20 @@ class BotFactory:
         if bot_status:
             status_emoji = EMOJIS['active'] if bot_status['status'] == 'online' else EMOJIS['inactive']
             status_text = f"{status_emoji} {bot_status['status']}"
+            checked_at = bot_status.get('last_check')
+            if checked_at:
+                latency_ms = bot_status.get('latency_ms')
+                source = 'نبض' if latency_ms is None else f"{latency_ms:g}ms"
+                status_text += f" ({source}، {checked_at[11:19]})"
+        
+        health = await async_db.run(health_history.get_summary, bot_id)
+        heartbeat = (await async_db.get_heartbeats([bot_id])).get(bot_id)
+        heartbeat_text = "لا يوجد"
+        if heartbeat:
+            heartbeat_text = f"{datetime.fromtimestamp(heartbeat['ts']):%H:%M:%S}"
+            if heartbeat['update_lag_ms'] is not None:
+                heartbeat_text += f" • تأخر التحديثات {heartbeat['update_lag_ms']:,}ms"
+            heartbeat_text += f" • {heartbeat['messages_count']:,} رسالة منذ التشغيل"
         
         text = f"""
 {EMOJIS['bot']} **تفاصيل البوت**
@@ -250,6 +274,8 @@ class BotFactory:
 {MessageFormatter.format_bot_info(bot_info)}
 
 🔍 **الحالة الحالية:** {status_text}
+📈 **التوفر (24 ساعة):** {monitor.format_health(health)}
+💓 **آخر نبض:** {heartbeat_text}
 
 ⚙️ **الإجراءات المتاحة:**
 """
@@ -274,10 +300,31 @@ class BotFactory:
             parse_mode='Markdown'
         )
     
+    async def _handle_check_bot(self, query, data):
+        """فحص فوري لحالة البوت (ينقله إلى مقدمة طابور المراقبة)"""
+        bot_id = int(data.split('_')[1])
+        bot_info = await async_db.get_bot_info(bot_id)
+        
+        if not bot_info or not SecurityManager.can_manage_bot(query.from_user.id, bot_info['owner_id']):
+            await query.answer("❌ ليس لديك صلاحية لهذا البوت")
+            return
+        
+        pending = monitor.prioritize_bot(bot_id)
+        try:
+            if pending is not None:
+                await asyncio.wait_for(asyncio.wrap_future(pending), timeout=Config.HEALTH_CHECK_TIMEOUT + 5)
+            else:
+                # المراقبة متوقفة أو البوت غير نشط: فحص مباشر خارج الطابور
+                await monitor.force_check(bot_id)
+        except asyncio.TimeoutError:
+            logger.warning(f"⚠️ انتهت مهلة انتظار فحص البوت {bot_id}")
+        
+        await self._handle_bot_action(query, f'bot_{bot_id}')
+    
     async def _handle_delete_bot(self, query, data):
         """معالج حذف البوت مع التأكيد"""
         bot_id = int(data.split('_')[1])
-        bot_info = db.get_bot_info(bot_id)
+        bot_info = await async_db.get_bot_info(bot_id)
         
         if not bot_info or not SecurityManager.can_manage_bot(query.from_user.id, bot_info['owner_id']):
             await query.answer("❌ ليس لديك صلاحية لهذا البوت")
@@ -317,21 +364,21 @@ class BotFactory:
     async def _confirm_delete_bot(self, query, data):
         """تأكيد حذف البوت"""
         bot_id = int(data.split('_')[2])
-        bot_info = db.get_bot_info(bot_id)
+        bot_info = await async_db.get_bot_info(bot_id)
         
         if not bot_info or not SecurityManager.can_manage_bot(query.from_user.id, bot_info['owner_id']):
             await query.answer("❌ ليس لديك صلاحية لهذا البوت")
             return
         
         # حذف البوت من قاعدة البيانات
-        success = db.delete_bot(bot_id, query.from_user.id)
+        success = await async_db.delete_bot(bot_id, query.from_user.id)
         
         if success:
             # حذف ملف البوت
             FileManager.delete_bot_file(bot_id)
             
             # تسجيل النشاط
-            db.log_activity(
+            await async_db.log_activity(
                 query.from_user.id,
                 'bot_deleted',
                 f'تم حذف البوت {bot_id}'
@@ -375,7 +422,7 @@ class BotFactory:
             return ADD_TOKEN
         
         # إضافة البوت لقاعدة البيانات
-        bot_id = db.add_bot(user.id, token, bot_info)
+        bot_id = await async_db.add_bot(user.id, token, bot_info)
         
         if bot_id:
             # إنشاء ملف البوت
@@ -383,7 +430,7 @@ class BotFactory:
             FileManager.save_bot_file(bot_id, bot_code)
             
             # تسجيل النشاط
-            db.log_activity(
+            await async_db.log_activity(
                 user.id,
                 'bot_created',
                 f'تم إنشاء البوت {bot_info.get("username", bot_id)}'
@@ -409,7 +456,7 @@ class BotFactory:
     # معالجات المالك
     async def _show_admin_panel(self, query):
         """لوحة تحكم المالك"""
-        system_stats = db.get_system_stats()
+        system_stats = await async_db.get_system_stats()
         
         text = f"""
 {EMOJIS['admin']} **لوحة تحكم المالك**
@@ -431,6 +478,9 @@ class BotFactory:
                 InlineKeyboardButton('📊 التحليلات المتقدمة', callback_data='admin_analytics'),
                 InlineKeyboardButton('🗂️ سجل الأنشطة', callback_data='admin_logs')
             ],
+            [
+                InlineKeyboardButton('🐢 أداء قاعدة البيانات', callback_data='db_stats')
+            ],
             [
                 InlineKeyboardButton(f'{EMOJIS["back"]} العودة', callback_data='main_menu')
             ]
@@ -444,7 +494,7 @@ class BotFactory:
     
     async def _show_monitoring(self, query):
         """عرض نظام المراقبة"""
-        report = monitor.get_monitoring_report()
+        report = await monitor.monitoring_report()
         
         keyboard = [
             [
@@ -464,7 +514,7 @@ class BotFactory:
     
     async def _show_system_stats(self, query):
         """عرض إحصائيات النظام"""
-        analytics_report = BotAnalytics.generate_analytics_report()
+        analytics_report = await async_db.run(BotAnalytics.generate_analytics_report)
         
         keyboard = [
             [
@@ -482,6 +532,25 @@ class BotFactory:
             parse_mode='Markdown'
         )
     
+    async def _show_db_stats(self, query):
+        """عرض أبطأ دوال واستعلامات قاعدة البيانات"""
+        cache_stats = db.get_cache_stats()
+        text = db_metrics.format_report()
+        text += f"\n💾 **الذاكرة المؤقتة:** {cache_stats['hits']:,} إصابة / {cache_stats['misses']:,} إخفاق ({cache_stats['hit_rate']}%)"
+        
+        keyboard = [
+            [
+                InlineKeyboardButton('🔄 تحديث', callback_data='db_stats'),
+                InlineKeyboardButton(f'{EMOJIS["back"]} العودة', callback_data='admin_panel')
+            ]
+        ]
+        
+        await query.edit_message_text(
+            text,
+            reply_markup=InlineKeyboardMarkup(keyboard),
+            parse_mode='Markdown'
+        )
+    
     async def _show_broadcast_menu(self, query):
         """قائمة الإذاعة"""
         text = f"""
@@ -581,6 +650,44 @@ class BotFactory:
         # سيتم تنفيذها لاحقاً
         pass
     
+    async def _post_init(self, application):
+        """حفظ حلقة الأحداث لإرسال الإشعارات وبدء المراقبة على حلقة التطبيق إن طُلب ذلك"""
+        self.loop = asyncio.get_running_loop()
+        if Config.MONITOR_MODE != 'job_queue':
+            return
+        if application.job_queue is None:
+            logger.warning("⚠️ JobQueue غير متوفرة (ثبّت python-telegram-bot[job-queue])، تشغيل المراقبة في خيط")
+            monitor.start_monitoring()
+            return
+        await monitor.start_jobs(application.job_queue)
+    
+    async def _post_shutdown(self, application):
+        """إغلاق مهام المراقبة وعميل الفحص قبل إغلاق حلقة التطبيق"""
+        await monitor.stop_jobs()
+    
+    def _notify_outage(self, event):
+        """إشعار مالك البوت ببدء الانقطاع أو انتهائه (من خيط المراقبة أو من حلقة التطبيق في وضع job_queue)"""
+        if self.loop is None:
+            return
+        bot = event['bot']
+        name = f"@{bot['bot_username']}" if bot.get('bot_username') else f"Bot {bot['id']}"
+        if event['event'] == 'revoked':
+            text = f"🔒 توكن البوت {name} لم يعد صالحاً (أُلغي من BotFather)، تم إيقاف مراقبته"
+        elif event['event'] == 'offline':
+            text = f"{EMOJIS['warning']} البوت {name} متوقف منذ {datetime.fromtimestamp(event['started_at']):%H:%M} ({event['status']})"
+        else:
+            text = f"{EMOJIS['success']} عاد البوت {name} للعمل بعد {max(1, event['duration_seconds'] // 60)} دقيقة"
+        future = asyncio.run_coroutine_threadsafe(
+            self.app.bot.send_message(chat_id=bot['owner_id'], text=text), self.loop
+        )
+        
+        def log_failure(done):
+            # exception() يرفع CancelledError إن أُلغي الإرسال (مثلاً عند إيقاف الحلقة)
+            if not done.cancelled() and done.exception():
+                logger.error(f"خطأ في إرسال إشعار الانقطاع: {done.exception()}")
+        
+        future.add_done_callback(log_failure)
+    
     def run(self):
         """تشغيل البوت"""
         # التحقق من الإعدادات
@@ -588,13 +695,24 @@ class BotFactory:
             return
         
         # إنشاء التطبيق
-        self.app = ApplicationBuilder().token(Config.BOT_TOKEN).build()
+        self.app = (
+            ApplicationBuilder()
+            .token(Config.BOT_TOKEN)
+            .rate_limiter(PTBRateLimiter(Config.BOT_TOKEN))
+            .post_init(self._post_init)
+            .post_shutdown(self._post_shutdown)
+            .build()
+        )
         
         # إعداد المعالجات
         self.setup_handlers()
+        if Config.OUTAGE_NOTIFY_OWNER:
+            monitor.outages.add_listener(self._notify_outage)
         
-        # بدء نظام المراقبة
-        monitor.start_monitoring()
+        # بدء نظام المراقبة ومهام الصيانة (وضع job_queue يبدأ في _post_init)
+        if Config.MONITOR_MODE != 'job_queue':
+            monitor.start_monitoring()
+        maintenance.start()
         
         logger.info("🚀 بدء تشغيل مصنع البوتات...")
         logger.info(f"👑 معرف المالك: {Config.OWNER_ID}")
@@ -612,6 +730,11 @@ class BotFactory:
         finally:
             # إيقاف نظام المراقبة
             monitor.stop_monitoring()
+            maintenance.stop()
+            async_db.shutdown()
+            analytics_replica.close()
+            # تفريغ الكتابات المؤجلة قبل إغلاق الاتصالات
+            db.close()
             logger.info("👋 تم إغلاق مصنع البوتات")
 
 def main():
@@ -3,14 +3,22 @@
 Bot Monitoring System
 """
 import asyncio
+import heapq
 import logging
-import requests
+import random
 import threading
 import time
-from typing import Dict, List, Optional
+from collections import deque
+from concurrent.futures import Future
+from typing import Dict, List, Optional, Set, Tuple
 from datetime import datetime, timedelta
-from database_manager import db
+from database_manager import db, async_db, day_start_ts
 from config import Config, EMOJIS
+from analytics_replica import analytics_replica
+from health_checker import AsyncHealthChecker, ProcessPoolHealthChecker
+from health_history import health_history, format_latency
+from outage_tracker import OutageTracker
+from status_store import StatusStore
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -19,113 +27,450 @@ class BotMonitor:
     def __init__(self):
         self.monitoring = False
         self.monitor_thread = None
-        self.bot_statuses = {}
+        # آخر حالة لكل بوت (رموز وأوقات فقط؛ بيانات البوت تُقرأ لكل دفعة)
+        self.statuses = StatusStore()
         self.last_check = None
+        # أكثر من عملية: الفحص موزع حسب bot_id على عمليات منفصلة
+        if Config.MONITOR_WORKERS == 1:
+            self.checker = AsyncHealthChecker()
+        else:
+            self.checker = ProcessPoolHealthChecker()
+        self.outages = OutageTracker()
+        # مدة كل دفعة فحص بالثواني (لآخر الدفعات)
+        self.sweep_durations = deque(maxlen=100)
+        self.checks_total = 0
+        
+        # طابور أولويات بموعد الفحص التالي لكل بوت: (الموعد، bot_id)
+        # الإدخالات القديمة تبقى في الكومة وتُتجاهل إن لم تطابق _due
+        self._heap: List[Tuple[float, int]] = []
+        self._due: Dict[int, float] = {}
+        self._intervals: Dict[int, float] = {}
+        # عدد الفحوصات الفاشلة المتتالية لكل بوت (قاطع الدائرة)
+        self._failures: Dict[int, int] = {}
+        self._bots: Set[int] = set()
+        self._waiters: Dict[int, List[Future]] = {}
+        self._schedule_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        
+        # وضع job_queue: المراقبة مهام غير متزامنة على حلقة التطبيق بدلاً من خيط خاص
+        self.job_queue = None
+        self._jobs = []
+        self._draining = False
         
     def start_monitoring(self):
-        """بدء مراقبة البوتات"""
+        """بدء مراقبة البوتات في خيط خلفي"""
         if self.monitoring:
             return
             
         self.monitoring = True
+        self._load_state()
+        self.outages.load()
+        self.checker.start()
         self.monitor_thread = threading.Thread(target=self._monitor_loop, daemon=True)
         self.monitor_thread.start()
         logger.info("🔍 تم بدء نظام مراقبة البوتات")
     
     def stop_monitoring(self):
         """إيقاف مراقبة البوتات"""
+        if not self.monitor_thread:
+            return
+        self.monitoring = False
+        self._wakeup.set()
+        self.monitor_thread.join(timeout=5)
+        self.monitor_thread = None
+        self.checker.stop()
+        self._save_state()
+        logger.info("⏹️ تم إيقاف نظام مراقبة البوتات")
+    
+    async def start_jobs(self, job_queue):
+        """بدء المراقبة كمهام مجدولة على JobQueue الخاصة بالتطبيق"""
+        if self.monitoring:
+            return
+        
+        self.monitoring = True
+        self.job_queue = job_queue
+        await self.checker.attach()
+        await async_db.run(self._load_state)
+        await async_db.run(self.outages.load)
+        self._jobs = [
+            job_queue.run_repeating(self._sync_job, interval=Config.MONITOR_INTERVAL, first=0,
+                                    name='monitor_sync'),
+            job_queue.run_repeating(self._drain_job, interval=Config.MONITOR_TICK, first=1,
+                                    name='monitor_tick'),
+        ]
+        logger.info("🔍 تم بدء نظام مراقبة البوتات (JobQueue)")
+    
+    async def stop_jobs(self):
+        """إيقاف مهام المراقبة وإغلاق عميل الفحص"""
+        if self.job_queue is None:
+            return
         self.monitoring = False
-        if self.monitor_thread:
-            self.monitor_thread.join(timeout=5)
+        for job in self._jobs:
+            job.schedule_removal()
+        self._jobs = []
+        self.job_queue = None
+        await self.checker.aclose()
+        await async_db.run(self._save_state)
         logger.info("⏹️ تم إيقاف نظام مراقبة البوتات")
     
+    async def _sync_job(self, context):
+        try:
+            self._sync_schedule(*await async_db.run(self._tracked_bots))
+        except Exception as e:
+            logger.error(f"خطأ في مزامنة قائمة المراقبة: {e}")
+    
+    async def _drain_job(self, context):
+        """فحص كل البوتات المستحقة على دفعات (مهمة واحدة فقط في كل وقت)"""
+        if self._draining:
+            return
+        self._draining = True
+        try:
+            while self.monitoring:
+                due = self._pop_due(time.monotonic(), Config.MONITOR_BATCH_SIZE)
+                if not due:
+                    break
+                await self._check_batch_async(due)
+                self.last_check = datetime.now()
+        except Exception as e:
+            logger.error(f"خطأ في حلقة المراقبة: {e}")
+        finally:
+            self._draining = False
+    
     def _monitor_loop(self):
-        """حلقة المراقبة الرئيسية"""
+        """حلقة المراقبة الرئيسية: فحص البوتات المستحقة من طابور الأولويات"""
+        next_sync = 0.0
         while self.monitoring:
             try:
-                self._check_all_bots()
-                self.last_check = datetime.now()
-                time.sleep(Config.MONITOR_INTERVAL)
+                now = time.monotonic()
+                if now >= next_sync:
+                    self._sync_schedule()
+                    next_sync = now + Config.MONITOR_INTERVAL
+                
+                due = self._pop_due(now, Config.MONITOR_BATCH_SIZE)
+                if due:
+                    self._check_batch(due)
+                    self.last_check = datetime.now()
+                    continue
+                
+                self._wakeup.wait(max(0.0, min(next_sync, self._next_due()) - time.monotonic()))
+                self._wakeup.clear()
             except Exception as e:
                 logger.error(f"خطأ في حلقة المراقبة: {e}")
-                time.sleep(60)  # انتظار دقيقة في حالة الخطأ
+                self._wakeup.wait(60)  # انتظار دقيقة في حالة الخطأ
     
-    def _check_all_bots(self):
-        """فحص جميع البوتات النشطة"""
-        active_bots = db.get_all_bots()
-        
-        for bot in active_bots:
-            if bot['status'] == 'active':
-                status = self._check_bot_health(bot['token'])
-                self.bot_statuses[bot['id']] = {
-                    'status': status,
-                    'last_check': datetime.now().isoformat(),
-                    'bot_info': bot
-                }
-                
-                # تحديث حالة البوت في قاعدة البيانات
-                if status == 'offline':
-                    self._handle_bot_offline(bot)
+    def _load_state(self):
+        """استعادة آخر الحالات المحفوظة ليعرض التقرير الأسطول فور إعادة التشغيل"""
+        try:
+            count = self.statuses.load(Config.MONITOR_STATE_PATH)
+            if count:
+                logger.info(f"📂 تم تحميل حالات {count:,} بوت من {Config.MONITOR_STATE_PATH}")
+        except (OSError, ValueError, EOFError) as e:
+            logger.error(f"خطأ في تحميل حالات المراقبة: {e}")
     
-    def _check_bot_health(self, token: str) -> str:
-        """فحص حالة بوت واحد"""
+    def _save_state(self):
         try:
-            url = f"https://api.telegram.org/bot{token}/getMe"
-            response = requests.get(url, timeout=Config.HEALTH_CHECK_TIMEOUT)
-            
-            if response.status_code == 200:
-                data = response.json()
-                if data.get('ok'):
-                    return 'online'
-                else:
-                    return 'error'
+            self.statuses.save(Config.MONITOR_STATE_PATH)
+        except OSError as e:
+            logger.error(f"خطأ في حفظ حالات المراقبة: {e}")
+    
+    @staticmethod
+    def _tracked_bots() -> Tuple[Set[int], Set[int]]:
+        """البوتات النشطة (تُفحص) والملغاة (لا تُفحص لكن تبقى حالتها في التقرير)"""
+        return set(db.iter_bot_ids(status='active')), set(db.iter_bot_ids(status='revoked'))
+    
+    def _sync_schedule(self, active: Set[int] = None, revoked: Set[int] = None):
+        """مزامنة الطابور مع البوتات النشطة (إضافة الجديدة وإسقاط المحذوفة)"""
+        if active is None:
+            active, revoked = self._tracked_bots()
+        with self._schedule_lock:
+            now = time.monotonic()
+            for bot_id in active - self._bots:
+                # البوتات الجديدة تُفحص قريباً مع توزيع الحمل على أول فترة
+                self._intervals[bot_id] = Config.MONITOR_MIN_INTERVAL
+                self._push(bot_id, now + random.uniform(0, Config.MONITOR_MIN_INTERVAL))
+            removed = self._bots - active
+            for bot_id in removed:
+                self._due.pop(bot_id, None)
+                self._intervals.pop(bot_id, None)
+                self._failures.pop(bot_id, None)
+            self._bots = active
+        # يشمل الحالات المحمّلة من الملف لبوتات حُذفت أثناء التوقف
+        self.statuses.retain(active | (revoked or set()))
+        self.outages.forget(removed)
+    
+    def _push(self, bot_id: int, due: float):
+        self._due[bot_id] = due
+        heapq.heappush(self._heap, (due, bot_id))
+    
+    def _next_due(self) -> float:
+        with self._schedule_lock:
+            while self._heap and self._due.get(self._heap[0][1]) != self._heap[0][0]:
+                heapq.heappop(self._heap)
+            return self._heap[0][0] if self._heap else float('inf')
+    
+    def _pop_due(self, now: float, limit: int) -> List[int]:
+        """سحب معرفات البوتات التي حان موعد فحصها (بحد أقصى limit)"""
+        due = []
+        with self._schedule_lock:
+            while self._heap and self._heap[0][0] <= now and len(due) < limit:
+                when, bot_id = heapq.heappop(self._heap)
+                if self._due.get(bot_id) != when:
+                    continue
+                del self._due[bot_id]
+                due.append(bot_id)
+        return due
+    
+    def _next_interval(self, bot_id: int, previous: Optional[str], status: str) -> float:
+        """الفترة حتى الفحص التالي: تتباعد للبوتات المستقرة وتقصر للجديدة أو المتذبذبة
+        
+        بعد MONITOR_BREAKER_THRESHOLD فشلاً متتالياً تُفتح الدائرة: يتضاعف الانتظار حتى
+        فحص التجربة التالي (half-open)، وأول نجاح يغلقها ويعيد الفترة إلى الحد الأدنى
+        """
+        if status == 'online':
+            self._failures.pop(bot_id, None)
+            if previous == 'online':
+                interval = min(self._intervals.get(bot_id, Config.MONITOR_MIN_INTERVAL) * Config.MONITOR_BACKOFF,
+                               Config.MONITOR_MAX_INTERVAL)
             else:
-                return 'offline'
-                
-        except requests.exceptions.Timeout:
-            return 'timeout'
-        except requests.exceptions.RequestException:
-            return 'offline'
-        except Exception as e:
-            logger.error(f"خطأ في فحص البوت: {e}")
-            return 'error'
+                interval = Config.MONITOR_MIN_INTERVAL
+        else:
+            failures = self._failures[bot_id] = self._failures.get(bot_id, 0) + 1
+            if failures >= Config.MONITOR_BREAKER_THRESHOLD:
+                interval = min(Config.MONITOR_MIN_INTERVAL * 2 ** (failures - Config.MONITOR_BREAKER_THRESHOLD + 1),
+                               Config.MONITOR_BREAKER_MAX_INTERVAL)
+            else:
+                interval = Config.MONITOR_MIN_INTERVAL
+        self._intervals[bot_id] = interval
+        jitter = interval * Config.MONITOR_JITTER
+        return interval + random.uniform(-jitter, jitter)
+    
+    def _check_batch(self, bot_ids: List[int]):
+        """فحص دفعة من البوتات المستحقة بالتوازي"""
+        start = time.monotonic()
+        bots = self._resolve(bot_ids, db.get_bots_for_check(bot_ids))
+        heartbeats = db.get_heartbeats([bot['id'] for bot in bots])
+        results, silent, stalled = self._from_heartbeats(bots, heartbeats)
+        if silent:
+            self._merge_probes(results, self.checker.sweep(silent), stalled)
+            bots = self._defer_unchecked(bots, results)
+        # آلة الحالات تكتب فقط عند بدء انقطاع أو انتهائه
+        self.outages.observe(bots, results)
+        revoked = self._apply_results(bots, results)
+        if revoked:
+            self._revoke(revoked)
+        if Config.HEALTH_HISTORY_ENABLED:
+            health_history.record_batch(self._history_rows(results))
+        self._finish_batch(bots, start)
+    
+    async def _check_batch_async(self, bot_ids: List[int]):
+        """نسخة وضع JobQueue: الفحص على حلقة التطبيق والكتابة عبر async_db"""
+        start = time.monotonic()
+        bots = self._resolve(bot_ids, await async_db.get_bots_for_check(bot_ids))
+        heartbeats = await async_db.get_heartbeats([bot['id'] for bot in bots])
+        results, silent, stalled = self._from_heartbeats(bots, heartbeats)
+        if silent:
+            self._merge_probes(results, await self.checker.check_many(silent), stalled)
+            bots = self._defer_unchecked(bots, results)
+        # الحالات تُعدّل على الحلقة فقط؛ المنفذ للقراءة والكتابة في قاعدة البيانات
+        await self.outages.observe_async(bots, results)
+        revoked = self._apply_results(bots, results)
+        if revoked:
+            await self._revoke_async(revoked)
+        if Config.HEALTH_HISTORY_ENABLED:
+            await async_db.run(health_history.record_batch, self._history_rows(results))
+        self._finish_batch(bots, start)
     
-    def _handle_bot_offline(self, bot: Dict):
-        """التعامل مع البوت المتوقف"""
-        logger.warning(f"⚠️ البوت {bot['id']} متوقف")
+    def _resolve(self, bot_ids: List[int], found: Dict[int, Dict]) -> List[Dict]:
+        """بيانات الفحص للدفعة بترتيبها، مع إسقاط البوتات المحذوفة منذ آخر مزامنة"""
+        missing = [bot_id for bot_id in bot_ids if bot_id not in found]
+        if missing:
+            with self._schedule_lock:
+                self._bots.difference_update(missing)
+                waiters = [self._waiters.pop(bot_id, []) for bot_id in missing]
+            for waiter in (waiter for group in waiters for waiter in group):
+                waiter.set_result(None)
+            for bot_id in missing:
+                self.statuses.remove(bot_id)
+        return [found[bot_id] for bot_id in bot_ids if bot_id in found]
+    
+    @staticmethod
+    def _from_heartbeats(bots: List[Dict], heartbeats: Dict[int, Dict]) -> Tuple[Dict[int, tuple], List[Dict], set]:
+        """نتائج البوتات ذات النبض الحديث، والبوتات التي تحتاج getMe، والبوتات ذات الاستقبال المتوقف
         
-        # تسجيل النشاط
-        db.log_activity(
-            user_id=bot['owner_id'],
-            action='bot_offline',
-            details=f"البوت {bot['bot_username'] or bot['id']} متوقف"
-        )
+        النبض الحديث مع getUpdates حديث يعني أن البوت حي دون أي طلب شبكة
+        """
+        now = int(time.time())
+        stale_before = now - Config.HEARTBEAT_STALE_SECONDS
+        results, silent, stalled = {}, [], set()
+        for bot in bots:
+            heartbeat = heartbeats.get(bot['id'])
+            if heartbeat and heartbeat['ts'] >= stale_before:
+                if (heartbeat['last_poll_at'] or 0) >= stale_before:
+                    results[bot['id']] = ('online', None)
+                    continue
+                # العملية حية لكن حلقة الاستقبال لا تعمل؛ getMe يكشف إن كان التوكن هو السبب
+                stalled.add(bot['id'])
+            silent.append(bot)
+        return results, silent, stalled
+    
+    @staticmethod
+    def _merge_probes(results: Dict[int, tuple], probes: Dict[int, tuple], stalled: set):
+        for bot_id, (status, latency_ms) in probes.items():
+            if bot_id in stalled and status == 'online':
+                status = 'stalled'
+            results[bot_id] = (status, latency_ms)
+    
+    def _defer_unchecked(self, bots: List[Dict], results: Dict[int, tuple]) -> List[Dict]:
+        """إعادة جدولة البوتات التي لم يرجع لها فحص (تعطل عملية فحص) دون تسجيل أي حالة لها
+        
+        تسجيلها كخطأ كان سيظهر كانقطاع جماعي ويفتح دوائر الفشل بلا سبب
+        """
+        unchecked = [bot['id'] for bot in bots if bot['id'] not in results]
+        if not unchecked:
+            return bots
+        now = time.monotonic()
+        with self._schedule_lock:
+            for bot_id in unchecked:
+                if bot_id in self._bots:
+                    self._push(bot_id, now + Config.MONITOR_MIN_INTERVAL)
+        return [bot for bot in bots if bot['id'] in results]
+    
+    @staticmethod
+    def _history_rows(results: Dict[int, tuple]) -> List[Tuple[int, str, float]]:
+        return [(bot_id, status, latency_ms) for bot_id, (status, latency_ms) in results.items()]
+    
+    def _finish_batch(self, bots: List[Dict], start: float):
+        duration = time.monotonic() - start
+        self.sweep_durations.append(duration)
+        self.checks_total += len(bots)
+        logger.debug(f"🔍 تم فحص {len(bots)} بوت في {duration:.2f} ثانية")
+    
+    def _apply_results(self, bots: List[Dict], results: Dict[int, tuple]) -> List[Dict]:
+        """تحديث الحالات من نتائج دفعة فحص وجدولة الفحص التالي، وإرجاع البوتات الملغاة"""
+        checked_at = int(time.time())
+        now = time.monotonic()
+        revoked = []
+        for bot in bots:
+            status, latency_ms = results[bot['id']]
+            previous = self.statuses.status(bot['id'])
+            self.statuses.set(bot['id'], status, latency_ms, checked_at)
+            
+            with self._schedule_lock:
+                if status == 'revoked':
+                    # حالة نهائية: لا فحوصات أخرى لهذا البوت
+                    self._bots.discard(bot['id'])
+                    self._intervals.pop(bot['id'], None)
+                    self._failures.pop(bot['id'], None)
+                    revoked.append(bot)
+                elif bot['id'] in self._bots:
+                    self._push(bot['id'], now + self._next_interval(bot['id'], previous, status))
+                waiters = self._waiters.pop(bot['id'], [])
+            if waiters:
+                result = self.get_bot_status(bot['id'])
+                for waiter in waiters:
+                    waiter.set_result(result)
+        return revoked
+    
+    def _revoke(self, bots: List[Dict]):
+        """تعليم البوتات ذات التوكن الملغى في قاعدة البيانات وإيقاف مراقبتها"""
+        for bot in bots:
+            if not db.set_bot_status(bot['id'], 'revoked'):
+                continue
+            logger.warning(f"🔒 توكن البوت {bot['id']} ملغى، تم إيقاف مراقبته")
+            db.log_activity(
+                user_id=bot['owner_id'],
+                action='bot_revoked',
+                details=f"توكن البوت {bot['bot_username'] or bot['id']} ملغى"
+            )
+            self.outages.revoked(bot)
+    
+    async def _revoke_async(self, bots: List[Dict]):
+        """نسخة _revoke لوضع JobQueue: الكتابة عبر async_db وإسقاط الحالة على الحلقة"""
+        for bot in bots:
+            if not await async_db.set_bot_status(bot['id'], 'revoked'):
+                continue
+            logger.warning(f"🔒 توكن البوت {bot['id']} ملغى، تم إيقاف مراقبته")
+            await async_db.log_activity(
+                user_id=bot['owner_id'],
+                action='bot_revoked',
+                details=f"توكن البوت {bot['bot_username'] or bot['id']} ملغى"
+            )
+            await self.outages.revoked_async(bot)
+    
+    def prioritize_bot(self, bot_id: int) -> Optional[Future]:
+        """نقل بوت إلى مقدمة طابور الفحص وإرجاع Future تكتمل بنتيجة الفحص"""
+        if not self.monitoring:
+            return None
+        
+        with self._schedule_lock:
+            known = bot_id in self._bots
+        if not known:
+            bot_info = db.get_bot_info(bot_id)
+            if not bot_info or bot_info['status'] != 'active':
+                return None
+        
+        future = Future()
+        with self._schedule_lock:
+            self._bots.add(bot_id)
+            self._waiters.setdefault(bot_id, []).append(future)
+            self._push(bot_id, 0.0)
+        self._wakeup.set()
+        if self.job_queue is not None:
+            self.job_queue.run_once(self._drain_job, 0)
+        return future
+    
+    def open_circuits(self) -> int:
+        """عدد البوتات التي تُفحص بتباعد أسي بعد فشل متكرر"""
+        return sum(1 for failures in list(self._failures.values())
+                   if failures >= Config.MONITOR_BREAKER_THRESHOLD)
     
     def get_bot_status(self, bot_id: int) -> Optional[Dict]:
         """الحصول على حالة بوت محدد"""
-        return self.bot_statuses.get(bot_id)
+        result = self.statuses.get(bot_id)
+        if result:
+            result['state'] = self.outages.get_state(bot_id)
+        return result
     
     def get_all_statuses(self) -> Dict:
         """الحصول على حالة جميع البوتات"""
         return {
-            'bots': self.bot_statuses,
+            'counts': self.statuses.counts(),
+            'total': len(self.statuses),
             'last_check': self.last_check.isoformat() if self.last_check else None,
+            'last_sweep_seconds': self.sweep_durations[-1] if self.sweep_durations else None,
+            'scheduled': len(self._due),
+            'checks_total': self.checks_total,
+            'workers': getattr(self.checker, 'workers', 1),
             'monitoring': self.monitoring
         }
     
     def get_monitoring_report(self) -> str:
         """إنشاء تقرير مراقبة مفصل"""
-        if not self.bot_statuses:
+        if not len(self.statuses):
+            return f"{EMOJIS['info']} لم يتم فحص أي بوتات بعد"
+        
+        offline_bots = self.statuses.failing(5)  # أول 5 بوتات فقط
+        names = db.get_bots_for_check([bot_id for bot_id, _ in offline_bots]) if offline_bots else {}
+        return self._format_report(health_history.get_summary(), offline_bots, names)
+    
+    async def monitoring_report(self) -> str:
+        """نسخة get_monitoring_report لحلقة الأحداث: القراءة من قاعدة البيانات على المنفذ وبناء التقرير على الحلقة"""
+        if not len(self.statuses):
             return f"{EMOJIS['info']} لم يتم فحص أي بوتات بعد"
         
-        online_count = sum(1 for status in self.bot_statuses.values() 
-                          if status['status'] == 'online')
-        offline_count = sum(1 for status in self.bot_statuses.values() 
-                           if status['status'] == 'offline')
-        error_count = sum(1 for status in self.bot_statuses.values() 
-                         if status['status'] == 'error')
+        offline_bots = self.statuses.failing(5)
+        names = await async_db.get_bots_for_check([bot_id for bot_id, _ in offline_bots]) if offline_bots else {}
+        return self._format_report(await async_db.run(health_history.get_summary), offline_bots, names)
+    
+    def _format_report(self, summary: Dict, offline_bots: List[Tuple[int, str]], names: Dict[int, Dict]) -> str:
+        # الأعداد محسوبة أثناء الفحص، فلا مرور على كل البوتات هنا
+        counts = self.statuses.counts()
+        online_count = counts['online']
+        offline_count = counts['offline']
+        error_count = counts['error'] + counts['timeout'] + counts['stalled']
+        revoked_count = counts['revoked']
         
-        total_bots = len(self.bot_statuses)
+        total_bots = len(self.statuses)
         
         report = f"""
 {EMOJIS['monitor']} **تقرير مراقبة البوتات**
@@ -134,56 +479,79 @@ class BotMonitor:
 {EMOJIS['active']} متصل: {online_count}
 {EMOJIS['inactive']} منقطع: {offline_count}
 {EMOJIS['error']} خطأ: {error_count}
+🔒 توكن ملغى: {revoked_count}
 📈 المجموع: {total_bots}
 
 ⏰ **آخر فحص:** {self.last_check.strftime('%Y-%m-%d %H:%M:%S') if self.last_check else 'لم يتم'}
+📈 **التوفر (24 ساعة):** {self.format_health(summary)}
+⏱️ **مدة آخر دفعة فحص:** {f'{self.sweep_durations[-1]:.2f} ثانية' if self.sweep_durations else 'لم يتم'}
+🔢 **الفحوصات منذ البدء:** {self.checks_total:,}
+🚨 **انقطاعات مفتوحة:** {self.outages.open_outages()}
+🔌 **فحص متباعد (دائرة مفتوحة):** {self.open_circuits()}
 
 🔄 **حالة المراقبة:** {'نشط' if self.monitoring else 'متوقف'}
 """
         
         # إضافة تفاصيل البوتات المتوقفة
-        offline_bots = [
-            status for status in self.bot_statuses.values()
-            if status['status'] in ['offline', 'error']
-        ]
-        
         if offline_bots:
             report += f"\n{EMOJIS['warning']} **البوتات المتوقفة:**\n"
-            for bot_status in offline_bots[:5]:  # أول 5 بوتات فقط
-                bot_info = bot_status['bot_info']
-                report += f"• {bot_info.get('bot_username', f'Bot {bot_info[\"id\"]}')} - {bot_status['status']}\n"
+            for bot_id, status in offline_bots:
+                bot_name = names.get(bot_id, {}).get('bot_username') or f"Bot {bot_id}"
+                report += f"• {bot_name} - {status}\n"
         
         return report
     
+    @staticmethod
+    def format_health(summary: Dict) -> str:
+        """سطر مختصر للتوفر وزمن الاستجابة من ملخص سجل الصحة"""
+        if not summary['checks']:
+            return 'لا توجد بيانات بعد'
+        text = f"{summary['uptime']:g}% من {summary['checks']:,} فحص"
+        if summary['p50_ms'] is not None:
+            text += f" • p50 {format_latency(summary['p50_ms'])} • p95 {format_latency(summary['p95_ms'])}"
+        return text
+    
     def force_check_bot(self, bot_id: int) -> Dict:
         """فحص فوري لبوت محدد"""
         bot_info = db.get_bot_info(bot_id)
         if not bot_info:
             return {'error': 'البوت غير موجود'}
         
-        status = self._check_bot_health(bot_info['token'])
-        result = {
-            'bot_id': bot_id,
-            'status': status,
-            'checked_at': datetime.now().isoformat(),
-            'bot_info': bot_info
-        }
+        status, latency_ms = self.checker.check_sync(bot_info['token'])
+        return self._record_forced(bot_id, status, latency_ms)
+    
+    async def force_check(self, bot_id: int) -> Dict:
+        """نسخة force_check_bot لحلقة الأحداث: الطلب على منفذ والتسجيل على الحلقة نفسها
         
-        self.bot_statuses[bot_id] = result
+        في وضع job_queue تبقى الحالات لا تُعدّل إلا من حلقة التطبيق
+        """
+        bot_info = await async_db.get_bot_info(bot_id)
+        if not bot_info:
+            return {'error': 'البوت غير موجود'}
+        
+        status, latency_ms = await asyncio.get_running_loop().run_in_executor(
+            None, self.checker.check_sync, bot_info['token']
+        )
+        return self._record_forced(bot_id, status, latency_ms)
+    
+    def _record_forced(self, bot_id: int, status: str, latency_ms: Optional[float]) -> Dict:
+        self.statuses.set(bot_id, status, latency_ms)
+        result = self.get_bot_status(bot_id)
+        result['bot_id'] = bot_id
         return result
 
 class BotAnalytics:
-    """نظام تحليل أداء البوتات"""
+    """نظام تحليل أداء البوتات (يقرأ من نسخة التحليلات)"""
     
     @staticmethod
     def get_bot_performance(bot_id: int, days: int = 7) -> Dict:
         """تحليل أداء بوت لفترة محددة"""
         try:
-            with db.get_connection() as conn:
+            with analytics_replica.get_connection(bot_id) as conn:
                 cursor = conn.cursor()
                 
                 # الحصول على إحصائيات آخر أسبوع
-                start_date = (datetime.now() - timedelta(days=days)).date().isoformat()
+                start_date = day_start_ts((datetime.now() - timedelta(days=days)).date())
                 
                 cursor.execute('''
                     SELECT date, messages_count, users_count, groups_count
@@ -228,7 +596,7 @@ class BotAnalytics:
     def get_top_performing_bots(limit: int = 10) -> List[Dict]:
         """الحصول على أفضل البوتات أداءً"""
         try:
-            with db.get_connection() as conn:
+            with analytics_replica.get_connection() as conn:
                 cursor = conn.cursor()
                 
                 cursor.execute('''
@@ -277,6 +645,8 @@ class BotAnalytics:
                 report += "لا توجد بيانات متاحة\n"
             
             report += f"\n📅 **تاريخ التقرير:** {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
+            if analytics_replica.enabled:
+                report += f"\n🔄 **عمر البيانات:** {int(analytics_replica.age_seconds)} ثانية"
             
             return report
             
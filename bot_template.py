@@ -5,6 +5,7 @@ Enhanced Bot Template - Used as base for created bots
 import os
 import json
 import random
+import sqlite3
 import logging
 import requests
 import threading
@@ -12,6 +13,7 @@ import time
 from datetime import datetime
 from telebot import TeleBot
 from telebot.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
+from rate_limiter import rate_limiter
 
 # إعداد التسجيل
 logging.basicConfig(
@@ -20,17 +22,62 @@ logging.basicConfig(
 )
 logger = logging.getLogger('bot_template')
 
+# النبض يُكتب في قاعدة بيانات المصنع ليغني المراقبة عن طلب getMe
+HEARTBEAT_DB = os.getenv('DB_PATH', 'database.db')
+HEARTBEAT_INTERVAL = int(os.getenv('HEARTBEAT_INTERVAL', '30'))
+
+HEARTBEAT_UPSERT_SQL = '''
+    INSERT INTO bot_heartbeats (bot_id, ts, started_at, last_poll_at, last_update_at, update_lag_ms,
+                                messages_count, users_count, groups_count, pid)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(bot_id) DO UPDATE SET
+        ts = excluded.ts,
+        started_at = excluded.started_at,
+        last_poll_at = excluded.last_poll_at,
+        last_update_at = excluded.last_update_at,
+        update_lag_ms = excluded.update_lag_ms,
+        messages_count = excluded.messages_count,
+        users_count = excluded.users_count,
+        groups_count = excluded.groups_count,
+        pid = excluded.pid
+'''
+
+class PollingTeleBot(TeleBot):
+    """TeleBot يحفظ وقت آخر getUpdates ناجح (دليل أن حلقة الاستقبال حية)
+
+    ويمرر الإرسال والتعديل عبر محدد المعدل (reply_to يستدعي send_message)
+    """
+    last_poll_at = None
+
+    def get_updates(self, *args, **kwargs):
+        updates = super().get_updates(*args, **kwargs)
+        self.last_poll_at = int(time.time())
+        return updates
+
+    def send_message(self, chat_id, *args, **kwargs):
+        return rate_limiter.call_sync(self.token, _chat_key(chat_id), super().send_message, chat_id, *args, **kwargs)
+
+    def edit_message_text(self, text, chat_id=None, *args, **kwargs):
+        return rate_limiter.call_sync(self.token, _chat_key(chat_id), super().edit_message_text,
+                                      text, chat_id, *args, **kwargs)
+
+def _chat_key(chat_id):
+    # معرفات @username للقنوات تُحد بدلو البوت العام فقط
+    return chat_id if isinstance(chat_id, int) else None
+
 class EnhancedBot:
     def __init__(self, token: str, bot_id: int = None):
         self.token = token
         self.bot_id = bot_id
-        self.bot = TeleBot(token)
+        self.bot = PollingTeleBot(token)
         self.owner_id = None
         self.stats = {
             'messages_count': 0,
             'users_count': 0,
             'groups_count': 0,
-            'start_time': datetime.now()
+            'start_time': datetime.now(),
+            'last_update_at': None,
+            'update_lag_ms': None
         }
         self.user_cache = set()
         self.group_cache = set()
@@ -325,6 +372,7 @@ class EnhancedBot:
                 'reaction': json.dumps([{'type': 'emoji', 'emoji': emoji}])
             }
             
+            rate_limiter.acquire_sync(self.token)
             response = requests.post(reaction_url, data=reaction_data, timeout=5)
             
             if response.status_code != 200:
@@ -343,6 +391,11 @@ class EnhancedBot:
         """تحديث إحصائيات البوت"""
         self.stats['messages_count'] += 1
         
+        # التأخر بين إرسال الرسالة ومعالجتها
+        now = time.time()
+        self.stats['last_update_at'] = int(now)
+        self.stats['update_lag_ms'] = max(0, int((now - message.date) * 1000))
+        
         # تتبع المستخدمين الفريدين
         self.user_cache.add(message.from_user.id)
         
@@ -440,9 +493,44 @@ class EnhancedBot:
             parse_mode='Markdown'
         )
     
+    def _start_heartbeat(self):
+        """بدء خيط النبض (يتطلب معرف البوت في المصنع)"""
+        if not self.bot_id or HEARTBEAT_INTERVAL <= 0 or getattr(self, '_heartbeat_thread', None):
+            return
+        self._heartbeat_thread = threading.Thread(target=self._heartbeat_loop, name='heartbeat', daemon=True)
+        self._heartbeat_thread.start()
+    
+    def _heartbeat_loop(self):
+        """كتابة النبض كل HEARTBEAT_INTERVAL ثانية على اتصال واحد"""
+        conn = None
+        while True:
+            try:
+                if conn is None:
+                    conn = sqlite3.connect(HEARTBEAT_DB, timeout=5)
+                conn.execute(HEARTBEAT_UPSERT_SQL, (
+                    self.bot_id,
+                    int(time.time()),
+                    int(self.stats['start_time'].timestamp()),
+                    self.bot.last_poll_at,
+                    self.stats['last_update_at'],
+                    self.stats['update_lag_ms'],
+                    self.stats['messages_count'],
+                    len(self.user_cache),
+                    len(self.group_cache),
+                    os.getpid()
+                ))
+                conn.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"تعذر إرسال النبض: {e}")
+                if conn is not None:
+                    conn.close()
+                    conn = None
+            time.sleep(HEARTBEAT_INTERVAL)
+    
     def run(self):
         """تشغيل البوت"""
         logger.info(f"🚀 بدء تشغيل البوت {self.bot_id or 'غير محدد'}...")
+        self._start_heartbeat()
         
         try:
             self.bot.infinity_polling(
@@ -464,10 +552,11 @@ def main():
     if not token:
         logger.error("❌ متغير BOT_TOKEN غير موجود")
         return
+    bot_id = int(os.getenv('BOT_ID', '0')) or None
     
     # إنشاء وتشغيل البوت
     try:
-        bot_instance = EnhancedBot(token)
+        bot_instance = EnhancedBot(token, bot_id)
         bot_instance.run()
     except KeyboardInterrupt:
         logger.info("⏹️ تم إيقاف البوت بواسطة المستخدم")
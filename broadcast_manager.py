@@ -8,8 +8,14 @@ from typing import Dict, List, Any
 from telegram import Message
 from telegram.error import TelegramError
 
-from database import db
-from config import BROADCAST_DELAY, MAX_BROADCAST_RETRIES
+from database_manager import db, async_db
+from config import Config
+from rate_limiter import rate_limiter, retry_after_in, send_all
+
+try:
+    import aiohttp
+except ImportError:  # pragma: no cover - الإرسال عبر بوتات المستخدمين يتطلب aiohttp
+    aiohttp = None
 
 logging.basicConfig(level=logging.INFO)
 log = logging.getLogger(__name__)
@@ -22,55 +28,41 @@ class BroadcastManager:
         """إذاعة الرسالة لجميع المستخدمين عبر جميع البوتات"""
         start_time = time.time()
         
-        # الحصول على جميع المستخدمين المميزين
-        all_bots = db.get_all_bots()
-        active_bots = [bot for bot in all_bots if bot[5] == 'active']  # status
-        
-        # جمع معرفات المستخدمين الفريدة
+        # جمع معرفات المستخدمين الفريدة (قراءة البوتات النشطة على دفعات)
         unique_users = set()
         bot_tokens = {}
+        bots_count = 0
         
-        for bot in active_bots:
-            bot_id, owner_id, token, username, created, status, last_seen, msg_count, user_count = bot
-            unique_users.add(owner_id)
-            bot_tokens[owner_id] = token
+        async for bot in async_db.aiter_bots(status='active'):
+            bots_count += 1
+            unique_users.add(bot['owner_id'])
+            bot_tokens[bot['owner_id']] = bot['token']
         
-        # إحصائيات الإرسال
         total_users = len(unique_users)
-        success_count = 0
-        failed_count = 0
-        
-        log.info(f"Starting broadcast to {total_users} users via {len(active_bots)} bots")
-        
-        # إرسال الرسائل
-        for user_id in unique_users:
-            try:
-                # محاولة الإرسال عبر البوت الرئيسي أولاً
-                success = await self.send_via_main_bot(message, user_id)
-                
-                if not success:
-                    # إذا فشل، جرب الإرسال عبر بوت المستخدم
-                    user_token = bot_tokens.get(user_id)
-                    if user_token:
-                        success = await self.send_via_user_bot(message, user_id, user_token)
-                
-                if success:
-                    success_count += 1
-                else:
-                    failed_count += 1
-                
-                # تأخير بين الرسائل لتجنب الحظر
-                await asyncio.sleep(BROADCAST_DELAY)
-                
-            except Exception as e:
-                log.error(f"Error broadcasting to user {user_id}: {e}")
-                failed_count += 1
+        log.info(f"Starting broadcast to {total_users} users via {bots_count} bots")
+        
+        session = self._open_session()
+        
+        async def deliver(user_id: int) -> bool:
+            # محاولة الإرسال عبر البوت الرئيسي أولاً، ثم عبر بوت المستخدم
+            if await self.send_via_main_bot(message, user_id):
+                return True
+            user_token = bot_tokens.get(user_id)
+            return bool(user_token) and await self.send_via_user_bot(message, user_id, user_token, session)
+        
+        # إرسال متوازٍ؛ التوقيت يضبطه محدد المعدل (PTBRateLimiter للبوت الرئيسي وrate_limiter لبوتات المستخدمين)
+        try:
+            _, success_count = await send_all(unique_users, deliver)
+        finally:
+            if session is not None:
+                await session.close()
+        failed_count = total_users - success_count
         
         end_time = time.time()
         duration = end_time - start_time
         
         # تسجيل النتائج
-        db.log_activity(
+        await async_db.log_activity(
             message.from_user.id,
             'broadcast_completed',
             f'Sent to {success_count}/{total_users} users in {duration:.2f}s'
@@ -125,11 +117,18 @@ class BroadcastManager:
             log.error(f"Unexpected error sending via main bot to {target_user_id}: {e}")
             return False
     
-    async def send_via_user_bot(self, original_message: Message, target_user_id: int, bot_token: str) -> bool:
-        """إرسال الرسالة عبر بوت المستخدم"""
+    @staticmethod
+    def _open_session():
+        """جلسة HTTP واحدة لكل إذاعة تعيد استخدام اتصالات api.telegram.org (None بدون aiohttp)"""
+        return aiohttp.ClientSession() if aiohttp is not None else None
+    
+    async def send_via_user_bot(self, original_message: Message, target_user_id: int, bot_token: str,
+                                session) -> bool:
+        """إرسال الرسالة عبر بوت المستخدم على جلسة الإذاعة"""
+        if session is None:
+            return False
+        
         try:
-            import aiohttp
-            
             # إعداد الرسالة
             broadcast_text = f"📢 <b>إذاعة خاصة</b>\n\n{original_message.text or original_message.caption or ''}"
             
@@ -142,11 +141,17 @@ class BroadcastManager:
                 'parse_mode': 'HTML'
             }
             
-            async with aiohttp.ClientSession() as session:
+            for attempt in range(Config.MAX_BROADCAST_RETRIES + 1):
+                await rate_limiter.acquire(bot_token, target_user_id)
                 async with session.post(url, json=payload, timeout=10) as response:
                     if response.status == 200:
                         result = await response.json()
                         return result.get('ok', False)
+                    if response.status != 429:
+                        return False
+                    retry_after = retry_after_in(await response.json()) or 1
+                # 429: الانتظار حسب retry_after وإبطاء البوت ثم إعادة المحاولة
+                rate_limiter.on_retry_after(bot_token, retry_after)
             
             return False
             
@@ -159,18 +164,26 @@ class BroadcastManager:
         start_time = time.time()
         
         # الحصول على معلومات البوت
-        bot_info = db.get_bot_info(bot_id)
+        bot_info = await async_db.get_bot_info(bot_id)
         if not bot_info:
             return {'error': 'Bot not found'}
         
-        # الحصول على مستخدمي البوت من قاعدة البيانات
-        # هذا يتطلب تتبع المستخدمين في البوتات المصنوعة
-        # سيتم تنفيذه في النسخة المحدثة من قالب البوت
+        # قراءة مستخدمي البوت على دفعات والإرسال لهم بالتوازي دون تحميلهم كلهم في الذاكرة
+        audience = (bot_user['user_id'] async for bot_user in async_db.aiter_bot_users(bot_id))
+        session = self._open_session()
+        try:
+            total_users, success_count = await send_all(
+                audience, lambda user_id: self.send_via_user_bot(message, user_id, bot_info['token'], session)
+            )
+        finally:
+            if session is not None:
+                await session.close()
+        failed_count = total_users - success_count
         
         return {
-            'total': 0,
-            'success': 0,
-            'failed': 0,
+            'total': total_users,
+            'success': success_count,
+            'failed': failed_count,
             'duration': time.time() - start_time
         }
     
@@ -204,10 +217,10 @@ class BroadcastManager:
     def get_broadcast_stats(self) -> Dict[str, Any]:
         """الحصول على إحصائيات الإذاعة"""
         # الحصول على إحصائيات من قاعدة البيانات
-        activity_log = db.get_activity_log(100)
+        activity_log = db.get_recent_activities(100)
         broadcast_activities = [
             activity for activity in activity_log 
-            if activity[1] == 'broadcast_completed'
+            if activity['action'] == 'broadcast_completed'
         ]
         
         if not broadcast_activities:
@@ -219,14 +232,14 @@ class BroadcastManager:
             }
         
         total_broadcasts = len(broadcast_activities)
-        last_broadcast = broadcast_activities[0][3] if broadcast_activities else None
+        last_broadcast = broadcast_activities[0]['timestamp'] if broadcast_activities else None
         
         # حساب معدل النجاح
         success_rates = []
         total_messages = 0
         
         for activity in broadcast_activities:
-            details = activity[2]  # details column
+            details = activity['details']
             if details and 'Sent to' in details:
                 try:
                     # استخراج الأرقام من النص
@@ -0,0 +1,89 @@
+"""
+ذاكرة التخزين المؤقت لمصنع البوتات
+Cache Manager for Bot Factory
+"""
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+# قيمة مميزة تعني عدم وجود المفتاح في الذاكرة المؤقتة
+MISSING = object()
+
+class TTLCache:
+    """ذاكرة مؤقتة محدودة الحجم (LRU) مع مدة صلاحية لكل عنصر
+
+    القارئ يأخذ generation قبل الاستعلام ويمررها إلى set؛ أي إبطاء أثناء الاستعلام يزيدها
+    فلا تُخزَّن النتيجة القديمة بعد الإبطاء
+    """
+
+    def __init__(self, max_size: int = 10000, ttl: float = 60):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Any:
+        """إرجاع القيمة المخزنة أو MISSING إذا لم توجد أو انتهت صلاحيتها"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return MISSING
+
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return MISSING
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    @property
+    def generation(self) -> int:
+        """عداد الإبطاء الحالي (يزيد مع كل invalidate أو clear)"""
+        return self._generation
+
+    def set(self, key: Hashable, value: Any, generation: Optional[int] = None):
+        """تخزين قيمة مع إخراج الأقدم استخداماً عند امتلاء الذاكرة
+
+        مع generation لا تُخزَّن القيمة إن حدث إبطاء منذ أخذها
+        """
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def invalidate(self, *keys: Hashable):
+        """حذف مفاتيح محددة"""
+        with self._lock:
+            self._generation += 1
+            for key in keys:
+                self._data.pop(key, None)
+
+    def clear(self):
+        """مسح الذاكرة المؤقتة بالكامل"""
+        with self._lock:
+            self._generation += 1
+            self._data.clear()
+
+    def stats(self) -> Dict:
+        """إحصائيات الإصابة والإخفاق"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total * 100, 2) if total else 0.0
+            }
@@ -3,7 +3,7 @@
 Configuration file for Bot Factory
 """
 import os
-from typing import Optional
+from typing import List, Optional
 
 class Config:
     # إعدادات البوت الرئيسي
@@ -12,18 +12,82 @@ class Config:
     
     # إعدادات قاعدة البيانات
     DB_PATH: str = os.getenv('DB_PATH', 'database.db')
+    DB_BUSY_TIMEOUT: int = int(os.getenv('DB_BUSY_TIMEOUT', '5000'))  # ميلي ثانية
+    DB_CACHE_SIZE_KB: int = int(os.getenv('DB_CACHE_SIZE_KB', '16384'))
+    DB_MMAP_SIZE: int = int(os.getenv('DB_MMAP_SIZE', str(256 * 1024 * 1024)))
+    DB_EXECUTOR_WORKERS: int = int(os.getenv('DB_EXECUTOR_WORKERS', '4'))  # خيوط الاستعلامات غير المتزامنة
+    WRITE_BUFFER_ENABLED: bool = os.getenv('WRITE_BUFFER_ENABLED', 'true').lower() == 'true'
+    WRITE_BUFFER_INTERVAL_MS: int = int(os.getenv('WRITE_BUFFER_INTERVAL_MS', '500'))
+    WRITE_BUFFER_MAX_ROWS: int = int(os.getenv('WRITE_BUFFER_MAX_ROWS', '500'))
+    CACHE_MAX_SIZE: int = int(os.getenv('CACHE_MAX_SIZE', '10000'))
+    CACHE_TTL: int = int(os.getenv('CACHE_TTL', '60'))  # ثانية
+    DB_METRICS_ENABLED: bool = os.getenv('DB_METRICS_ENABLED', 'true').lower() == 'true'
+    SLOW_QUERY_MS: float = float(os.getenv('SLOW_QUERY_MS', '100'))
+    DB_SHARDS: int = int(os.getenv('DB_SHARDS', '1'))  # عدد ملفات bot_users و bot_stats (1 = الملف الأساسي)
+    DB_SHARD_PATH: str = os.getenv('DB_SHARD_PATH', os.path.splitext(DB_PATH)[0] + '_shard{index}.db')
+    DB_OFFLINE_MIGRATIONS: bool = os.getenv('DB_OFFLINE_MIGRATIONS', 'false').lower() == 'true'  # تطبيق الترحيلات غير المتصلة عند البدء
+    
+    # إعدادات الصيانة
+    MAINTENANCE_TIME: str = os.getenv('MAINTENANCE_TIME', '03:30')  # وقت المهام اليومية
+    ACTIVITY_RETENTION_DAYS: int = int(os.getenv('ACTIVITY_RETENTION_DAYS', '30'))
+    ACTIVITY_COMPACT_BATCH: int = int(os.getenv('ACTIVITY_COMPACT_BATCH', '1000'))
+    VACUUM_PAGES: int = int(os.getenv('VACUUM_PAGES', '1000'))
+    
+    # إعدادات النسخ الاحتياطي
+    BACKUP_DIR: str = os.getenv('BACKUP_DIR', 'backups')
+    BACKUP_KEEP: int = int(os.getenv('BACKUP_KEEP', '7'))  # عدد النسخ المحفوظة
+    BACKUP_INTERVAL_HOURS: int = int(os.getenv('BACKUP_INTERVAL_HOURS', '6'))
+    BACKUP_PAGES_PER_STEP: int = int(os.getenv('BACKUP_PAGES_PER_STEP', '256'))
+    BACKUP_STEP_SLEEP: float = float(os.getenv('BACKUP_STEP_SLEEP', '0.01'))  # ثانية بين الخطوات
+    
+    # إعدادات نسخة التحليلات
+    ANALYTICS_REPLICA: bool = os.getenv('ANALYTICS_REPLICA', 'true').lower() == 'true'
+    ANALYTICS_REFRESH_SECONDS: int = int(os.getenv('ANALYTICS_REFRESH_SECONDS', '300'))
     
     # إعدادات النظام
     DEFAULT_LIMIT: int = int(os.getenv('DEFAULT_LIMIT', '3'))
     MAX_BOTS_PER_USER: int = int(os.getenv('MAX_BOTS_PER_USER', '10'))
     
     # إعدادات المراقبة
-    MONITOR_INTERVAL: int = int(os.getenv('MONITOR_INTERVAL', '300'))  # 5 دقائق
+    MONITOR_MODE: str = os.getenv('MONITOR_MODE', 'thread')  # thread أو job_queue (على حلقة التطبيق)
+    MONITOR_TICK: int = int(os.getenv('MONITOR_TICK', '5'))  # فترة البحث عن البوتات المستحقة في وضع job_queue
+    MONITOR_INTERVAL: int = int(os.getenv('MONITOR_INTERVAL', '300'))  # مزامنة قائمة البوتات كل 5 دقائق
+    MONITOR_MIN_INTERVAL: int = int(os.getenv('MONITOR_MIN_INTERVAL', '60'))  # للبوتات الجديدة أو المتذبذبة
+    MONITOR_MAX_INTERVAL: int = int(os.getenv('MONITOR_MAX_INTERVAL', '1800'))  # للبوتات المستقرة
+    MONITOR_BACKOFF: float = float(os.getenv('MONITOR_BACKOFF', '1.5'))
+    MONITOR_JITTER: float = float(os.getenv('MONITOR_JITTER', '0.1'))  # نسبة التوزيع العشوائي
+    HEARTBEAT_INTERVAL: int = int(os.getenv('HEARTBEAT_INTERVAL', '30'))  # فترة نبض البوتات المستضافة
+    HEARTBEAT_STALE_SECONDS: int = int(os.getenv('HEARTBEAT_STALE_SECONDS', '90'))  # بعدها يُعتبر البوت صامتاً ويُفحص بـ getMe
+    MONITOR_BREAKER_THRESHOLD: int = int(os.getenv('MONITOR_BREAKER_THRESHOLD', '3'))  # فشل متتالٍ قبل التباعد الأسي
+    MONITOR_BREAKER_MAX_INTERVAL: int = int(os.getenv('MONITOR_BREAKER_MAX_INTERVAL', '21600'))  # أقصى انتظار لفحص التجربة
+    OUTAGE_FAILURE_THRESHOLD: int = int(os.getenv('OUTAGE_FAILURE_THRESHOLD', '3'))  # فحوصات فاشلة متتالية قبل اعتبار البوت متوقفاً
+    OUTAGE_RECOVERY_THRESHOLD: int = int(os.getenv('OUTAGE_RECOVERY_THRESHOLD', '2'))  # فحوصات ناجحة متتالية قبل إغلاق الانقطاع
+    OUTAGE_NOTIFY_DEBOUNCE: int = int(os.getenv('OUTAGE_NOTIFY_DEBOUNCE', '900'))  # أقل فترة بين إشعارَي انقطاع للبوت نفسه
+    OUTAGE_NOTIFY_OWNER: bool = os.getenv('OUTAGE_NOTIFY_OWNER', 'true').lower() == 'true'
+    HEALTH_HISTORY_ENABLED: bool = os.getenv('HEALTH_HISTORY_ENABLED', 'true').lower() == 'true'
+    HEALTH_RAW_RETENTION_HOURS: int = int(os.getenv('HEALTH_RAW_RETENTION_HOURS', '24'))
+    HEALTH_MINUTE_RETENTION_DAYS: int = int(os.getenv('HEALTH_MINUTE_RETENTION_DAYS', '2'))
+    HEALTH_HOUR_RETENTION_DAYS: int = int(os.getenv('HEALTH_HOUR_RETENTION_DAYS', '30'))
+    HEALTH_DAY_RETENTION_DAYS: int = int(os.getenv('HEALTH_DAY_RETENTION_DAYS', '400'))
     HEALTH_CHECK_TIMEOUT: int = int(os.getenv('HEALTH_CHECK_TIMEOUT', '10'))
+    MONITOR_STATE_PATH: str = os.getenv('MONITOR_STATE_PATH', os.path.splitext(DB_PATH)[0] + '_monitor.state')
+    MONITOR_WORKERS: int = int(os.getenv('MONITOR_WORKERS', '1'))  # عمليات الفحص (1 = داخل العملية، 0 = عدد الأنوية)
+    MONITOR_CONCURRENCY: int = int(os.getenv('MONITOR_CONCURRENCY', '50'))  # طلبات getMe المتزامنة
+    MONITOR_BATCH_SIZE: int = int(os.getenv('MONITOR_BATCH_SIZE', '1000'))  # بوتات كل دفعة فحص
     
     # إعدادات الإذاعة
-    BROADCAST_DELAY: float = float(os.getenv('BROADCAST_DELAY', '0.1'))  # تأخير بين الرسائل
-    MAX_BROADCAST_RETRIES: int = int(os.getenv('MAX_BROADCAST_RETRIES', '3'))
+    BROADCAST_DELAY: float = float(os.getenv('BROADCAST_DELAY', '0.1'))  # قديم: التوقيت يضبطه محدد المعدل
+    MAX_BROADCAST_RETRIES: int = int(os.getenv('MAX_BROADCAST_RETRIES', '3'))  # إعادة المحاولة بعد 429
+    BROADCAST_CONCURRENCY: int = int(os.getenv('BROADCAST_CONCURRENCY', '30'))  # طلبات إرسال متزامنة
+    
+    # محدد معدل الإرسال إلى تيليجرام
+    RATE_LIMIT_GLOBAL: float = float(os.getenv('RATE_LIMIT_GLOBAL', '30'))  # رسائل/ثانية لكل بوت
+    RATE_LIMIT_CHAT: float = float(os.getenv('RATE_LIMIT_CHAT', '1'))  # رسائل/ثانية لكل محادثة خاصة
+    RATE_LIMIT_GROUP_PER_MINUTE: float = float(os.getenv('RATE_LIMIT_GROUP_PER_MINUTE', '20'))  # لكل مجموعة
+    RATE_LIMIT_CHAT_BURST: int = int(os.getenv('RATE_LIMIT_CHAT_BURST', '3'))  # رسائل متتالية مسموحة لكل محادثة
+    RATE_LIMIT_BACKOFF: float = float(os.getenv('RATE_LIMIT_BACKOFF', '0.5'))  # معامل تخفيض المعدل بعد 429
+    RATE_LIMIT_MIN: float = float(os.getenv('RATE_LIMIT_MIN', '1'))  # أدنى معدل بعد التخفيض
+    RATE_LIMIT_RECOVERY: int = int(os.getenv('RATE_LIMIT_RECOVERY', '60'))  # ثوانٍ بدون 429 لاستعادة المعدل
     
     # رسائل النظام
     WELCOME_MESSAGE: str = """
@@ -50,6 +114,14 @@ class Config:
 • يمكنك تخصيص رسائل الترحيب من الإعدادات
 """
 
+    @classmethod
+    def shard_paths(cls, count: int = None) -> List[str]:
+        """مسارات ملفات الأجزاء (قائمة فارغة عند عدم التقسيم)"""
+        count = cls.DB_SHARDS if count is None else count
+        if count <= 1:
+            return []
+        return [cls.DB_SHARD_PATH.format(index=index) for index in range(count)]
+
     @classmethod
     def validate(cls) -> bool:
         """التحقق من صحة الإعدادات"""
@@ -0,0 +1,300 @@
+"""
+تصدير واستيراد بيانات مصنع البوتات بالكامل
+Bulk Data Export / Import
+
+الاستخدام:
+    python data_transfer.py export exports/factory --format ndjson
+    python data_transfer.py export exports/factory --format csv --tables bots users
+    python data_transfer.py import exports/factory     # على قاعدة بيانات فارغة والمصنع متوقف
+"""
+import os
+import sys
+import csv
+import json
+import gzip
+import time
+import sqlite3
+import logging
+import argparse
+from itertools import chain
+from datetime import datetime
+from typing import Dict, Iterator, List, Tuple
+from config import Config
+from migrations import LATEST_VERSION
+from database_manager import db, shard_index
+from shard_manager import layout
+
+logger = logging.getLogger(__name__)
+
+# الجداول بترتيب التصدير والاستيراد مع مفتاح الترقيم لكل منها
+TABLES: Dict[str, Tuple[str, ...]] = {
+    'users': ('user_id',),
+    'bots': ('id',),
+    'bot_users': ('id',),
+    'bot_stats': ('id',),
+    'broadcasts': ('id',),
+    'activity_log': ('id',),
+    'activity_daily': ('day', 'user_id', 'action'),
+    'health_checks': ('ts', 'bot_id'),
+    'health_rollups': ('resolution', 'bot_id', 'bucket'),
+    'bot_outages': ('id',),
+}
+
+# جداول موزعة على الأجزاء؛ معرفاتها محلية لكل ملف فلا تُستورد
+SHARDED_TABLES = ('bot_users', 'bot_stats')
+
+# تمثيل NULL في CSV (لتمييزه عن النص الفارغ)
+NULL_MARKER = '\\N'
+
+MANIFEST = 'manifest.json'
+
+def _source_paths(table: str) -> List[str]:
+    return layout(Config.DB_SHARDS) if table in SHARDED_TABLES else [Config.DB_PATH]
+
+def open_snapshot(path: str) -> sqlite3.Connection:
+    """اتصال قراءة بلقطة ثابتة تبدأ لحظة فتحه وتبقى حتى إغلاقه"""
+    conn = sqlite3.connect(path, timeout=Config.DB_BUSY_TIMEOUT / 1000)
+    conn.row_factory = sqlite3.Row
+    conn.execute('BEGIN')
+    # أول قراءة تثبّت اللقطة (BEGIN المؤجل لا يبدأها بنفسه)
+    conn.execute('SELECT 1 FROM sqlite_master LIMIT 1').fetchall()
+    return conn
+
+def close_snapshot(conn: sqlite3.Connection):
+    conn.rollback()
+    conn.close()
+
+def iter_rows(conn: sqlite3.Connection, table: str, batch_size: int = 10000) -> Iterator[sqlite3.Row]:
+    """قراءة جدول بالترقيم بالمفتاح من لقطة الاتصال (ذاكرة ثابتة مهما كان الحجم)"""
+    key = TABLES[table]
+    columns = ', '.join(key)
+    marks = ', '.join('?' * len(key))
+
+    last = None
+    while True:
+        if last is None:
+            rows = conn.execute(
+                f'SELECT * FROM {table} ORDER BY {columns} LIMIT ?', (batch_size,)
+            ).fetchall()
+        else:
+            rows = conn.execute(
+                f'SELECT * FROM {table} WHERE ({columns}) > ({marks}) ORDER BY {columns} LIMIT ?',
+                (*last, batch_size)
+            ).fetchall()
+        if not rows:
+            return
+        yield from rows
+        last = tuple(rows[-1][column] for column in key)
+
+def export_table(table: str, out_dir: str, fmt: str = 'ndjson', batch_size: int = 10000, level: int = 1,
+                 snapshots: Dict[str, sqlite3.Connection] = None) -> int:
+    """تصدير جدول إلى ملف مضغوط وإرجاع عدد الصفوف
+
+    snapshots: لقطات مفتوحة لكل ملف (من export_all)؛ بدونها يفتح الجدول لقطاته الخاصة
+    """
+    owned = snapshots is None
+    if owned:
+        snapshots = {source: open_snapshot(source) for source in _source_paths(table) if os.path.exists(source)}
+
+    path = os.path.join(out_dir, f'{table}.{fmt}.gz')
+    count = 0
+    try:
+        with gzip.open(path, 'wt', encoding='utf-8', newline='', compresslevel=level) as out:
+            writer = csv.writer(out) if fmt == 'csv' else None
+            header_written = False
+            for source in _source_paths(table):
+                if source not in snapshots:
+                    continue
+                for row in iter_rows(snapshots[source], table, batch_size):
+                    if writer is None:
+                        out.write(json.dumps(dict(row), ensure_ascii=False))
+                        out.write('\n')
+                    else:
+                        if not header_written:
+                            writer.writerow(row.keys())
+                            header_written = True
+                        writer.writerow([NULL_MARKER if value is None else value for value in row])
+                    count += 1
+    finally:
+        if owned:
+            for conn in snapshots.values():
+                close_snapshot(conn)
+    return count
+
+def export_all(out_dir: str, fmt: str = 'ndjson', tables: List[str] = None,
+               batch_size: int = 10000, level: int = 1) -> Dict[str, int]:
+    """تصدير الجداول مع ملف وصف (manifest)
+
+    كل جداول الملف الأساسي تُقرأ من لقطة واحدة فتتسق فيما بينها. ملفات الأجزاء لها لقطة
+    لكل ملف تُفتح في اللحظة نفسها تقريباً، لكن SQLite لا يضمن لقطة مشتركة بين ملفات مختلفة:
+    تحت كتابات نشطة قد يظهر في bot_users مستخدم لبوت غير موجود في bots (أو العكس)
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    sources = {Config.DB_PATH, *layout(Config.DB_SHARDS)}
+    snapshots = {source: open_snapshot(source) for source in sources if os.path.exists(source)}
+    counts = {}
+    try:
+        for table in tables or TABLES:
+            start = time.monotonic()
+            counts[table] = export_table(table, out_dir, fmt, batch_size, level, snapshots)
+            logger.info(f"📤 {table}: {counts[table]:,} صف في {time.monotonic() - start:.1f} ثانية")
+    finally:
+        for conn in snapshots.values():
+            close_snapshot(conn)
+
+    with open(os.path.join(out_dir, MANIFEST), 'w', encoding='utf-8') as manifest:
+        json.dump({
+            'format': fmt,
+            'schema_version': LATEST_VERSION,
+            'created_at': datetime.now().isoformat(),
+            'tables': counts
+        }, manifest, ensure_ascii=False, indent=2)
+    return counts
+
+def _read_rows(path: str, fmt: str) -> Iterator[Dict]:
+    with gzip.open(path, 'rt', encoding='utf-8', newline='') as source:
+        if fmt == 'csv':
+            for row in csv.DictReader(source):
+                yield {key: None if value == NULL_MARKER else value for key, value in row.items()}
+        else:
+            for line in source:
+                if line.strip():
+                    yield json.loads(line)
+
+def _open_target(path: str) -> sqlite3.Connection:
+    """اتصال استيراد: بدون مزامنة القرص بعد كل معاملة وذاكرة مؤقتة كبيرة"""
+    conn = sqlite3.connect(path, timeout=Config.DB_BUSY_TIMEOUT / 1000)
+    conn.execute('PRAGMA synchronous=OFF')
+    conn.execute('PRAGMA cache_size=-262144')
+    conn.execute('PRAGMA temp_store=MEMORY')
+    return conn
+
+def _drop_indexes(conn: sqlite3.Connection, table: str) -> List[str]:
+    """حذف الفهارس الثانوية قبل التحميل وإرجاع تعريفاتها لإعادة بنائها"""
+    indexes = conn.execute(
+        "SELECT name, sql FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL",
+        (table,)
+    ).fetchall()
+    for name, _ in indexes:
+        conn.execute(f'DROP INDEX {name}')
+    conn.commit()
+    return [sql for _, sql in indexes]
+
+def import_table(table: str, path: str, fmt: str, targets: Dict[str, sqlite3.Connection],
+                 batch_size: int = 50000) -> int:
+    """استيراد جدول على دفعات كبيرة مع تأجيل بناء الفهارس"""
+    conns = [targets[target] for target in _source_paths(table)]
+    for conn in conns:
+        if conn.execute(f'SELECT 1 FROM {table} LIMIT 1').fetchone():
+            raise ValueError(f'الجدول {table} ليس فارغاً في قاعدة البيانات الهدف')
+
+    rows = _read_rows(path, fmt)
+    first = next(rows, None)
+    if first is None:
+        return 0
+
+    known = {info[1] for info in conns[0].execute(f'PRAGMA table_info({table})')}
+    columns = [column for column in first if not (table in SHARDED_TABLES and column == 'id')]
+    unknown = set(columns) - known
+    if unknown:
+        raise ValueError(f'أعمدة غير معروفة في {table}: {", ".join(sorted(unknown))}')
+
+    sql = f'INSERT INTO {table} ({", ".join(columns)}) VALUES ({", ".join("?" * len(columns))})'
+    routed = table in SHARDED_TABLES and len(conns) > 1
+    dropped = [_drop_indexes(conn, table) for conn in conns]
+    batches: List[List[tuple]] = [[] for _ in conns]
+    count = 0
+
+    try:
+        for row in chain([first], rows):
+            index = shard_index(int(row['bot_id'])) if routed else 0
+            batch = batches[index]
+            batch.append(tuple(row.get(column) for column in columns))
+            if len(batch) >= batch_size:
+                conns[index].executemany(sql, batch)
+                conns[index].commit()
+                count += len(batch)
+                batch.clear()
+
+        for conn, batch in zip(conns, batches):
+            if batch:
+                conn.executemany(sql, batch)
+                conn.commit()
+                count += len(batch)
+    except Exception:
+        for conn in conns:
+            if conn.in_transaction:
+                conn.rollback()
+        raise
+    finally:
+        # إعادة بناء الفهارس مرة واحدة بعد التحميل (أسرع من تحديثها صفاً صفاً)
+        for conn, indexes in zip(conns, dropped):
+            for index_sql in indexes:
+                conn.execute(index_sql)
+            conn.commit()
+    return count
+
+def import_all(in_dir: str, tables: List[str] = None, batch_size: int = 50000) -> Dict[str, int]:
+    """استيراد تصدير كامل إلى قاعدة البيانات الحالية"""
+    with open(os.path.join(in_dir, MANIFEST), encoding='utf-8') as manifest_file:
+        manifest = json.load(manifest_file)
+    if manifest['schema_version'] != LATEST_VERSION:
+        raise ValueError(
+            f"إصدار المخطط في التصدير ({manifest['schema_version']}) لا يطابق الحالي ({LATEST_VERSION})"
+        )
+
+    fmt = manifest['format']
+    targets = {path: _open_target(path) for path in {Config.DB_PATH, *layout(Config.DB_SHARDS)}}
+    counts = {}
+    try:
+        for table in tables or manifest['tables']:
+            path = os.path.join(in_dir, f'{table}.{fmt}.gz')
+            if not os.path.exists(path):
+                continue
+            start = time.monotonic()
+            counts[table] = import_table(table, path, fmt, targets, batch_size)
+            logger.info(f"📥 {table}: {counts[table]:,} صف في {time.monotonic() - start:.1f} ثانية")
+
+        for conn in targets.values():
+            conn.execute('PRAGMA optimize')
+    finally:
+        for conn in targets.values():
+            conn.close()
+    db.cache.clear()
+    return counts
+
+def main():
+    """واجهة سطر الأوامر للتصدير والاستيراد"""
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description='تصدير واستيراد بيانات مصنع البوتات')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    export_parser = commands.add_parser('export', help='تصدير الجداول إلى ملفات مضغوطة')
+    export_parser.add_argument('directory')
+    export_parser.add_argument('--format', choices=('ndjson', 'csv'), default='ndjson')
+    export_parser.add_argument('--tables', nargs='+', choices=list(TABLES))
+    export_parser.add_argument('--batch-size', type=int, default=10000)
+    export_parser.add_argument('--level', type=int, default=1, help='مستوى ضغط gzip (1 الأسرع)')
+
+    import_parser = commands.add_parser('import', help='استيراد تصدير إلى قاعدة بيانات فارغة')
+    import_parser.add_argument('directory')
+    import_parser.add_argument('--tables', nargs='+', choices=list(TABLES))
+    import_parser.add_argument('--batch-size', type=int, default=50000)
+
+    args = parser.parse_args()
+    try:
+        if args.command == 'export':
+            counts = export_all(args.directory, args.format, args.tables, args.batch_size, args.level)
+        else:
+            counts = import_all(args.directory, args.tables, args.batch_size)
+        for table, count in counts.items():
+            print(f"{table}\t{count:,}")
+        return 0
+    except (OSError, ValueError, sqlite3.Error) as e:
+        logger.error(f"❌ فشل النقل: {e}")
+        return 1
+    finally:
+        db.close()
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -3,140 +3,398 @@
 Database Manager for Bot Factory
 """
 import sqlite3
+import atexit
+import asyncio
 import datetime
+import functools
 import logging
-from typing import List, Dict, Optional, Tuple
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, List, Dict, Iterator, Optional, Tuple
 from contextlib import contextmanager
 from config import Config
+from migrations import apply_migrations, enable_incremental_vacuum, SHARD_MIGRATIONS
+from cache_manager import TTLCache, MISSING
+from db_metrics import InstrumentedConnection, instrument_methods
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+def now_ts() -> int:
+    """الوقت الحالي بالثواني منذ epoch (صيغة تخزين أعمدة الوقت)"""
+    return int(time.time())
+
+def day_start_ts(day: datetime.date = None) -> int:
+    """بداية اليوم (منتصف الليل بالتوقيت المحلي) بالثواني منذ epoch"""
+    day = day or datetime.date.today()
+    return int(datetime.datetime.combine(day, datetime.time()).timestamp())
+
+class ConnectionPool:
+    """مجمع اتصالات دائمة (اتصال واحد لكل خيط) لملف قاعدة بيانات"""
+    
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections: Dict[int, Tuple[threading.Thread, sqlite3.Connection]] = {}
+    
+    def _open(self) -> sqlite3.Connection:
+        """فتح اتصال جديد وضبط إعداداته مرة واحدة"""
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=Config.DB_BUSY_TIMEOUT / 1000,
+            check_same_thread=False,
+            factory=InstrumentedConnection if Config.DB_METRICS_ENABLED else sqlite3.Connection
+        )
+        conn.row_factory = sqlite3.Row  # للحصول على النتائج كقاموس
+        # يسري فقط على قاعدة بيانات جديدة قبل إنشاء الجداول (القواعد الموجودة: migrations.py --offline)
+        conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute(f'PRAGMA busy_timeout={Config.DB_BUSY_TIMEOUT}')
+        conn.execute(f'PRAGMA cache_size=-{Config.DB_CACHE_SIZE_KB}')
+        conn.execute(f'PRAGMA mmap_size={Config.DB_MMAP_SIZE}')
+        conn.execute('PRAGMA temp_store=MEMORY')
+        return conn
+    
+    def acquire(self) -> sqlite3.Connection:
+        """الحصول على اتصال الخيط الحالي (يُنشأ عند أول استخدام)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._open()
+            self._local.conn = conn
+            with self._lock:
+                self._prune_dead_threads()
+                current = threading.current_thread()
+                self._connections[current.ident] = (current, conn)
+        return conn
+    
+    def _prune_dead_threads(self):
+        """إغلاق اتصالات الخيوط المنتهية"""
+        for ident, (thread, conn) in list(self._connections.items()):
+            if not thread.is_alive():
+                conn.close()
+                del self._connections[ident]
+    
+    def close_all(self):
+        """إغلاق جميع الاتصالات المفتوحة"""
+        with self._lock:
+            for _, conn in self._connections.values():
+                try:
+                    conn.close()
+                except sqlite3.Error:
+                    pass
+            self._connections.clear()
+        self._local = threading.local()
+
+def shard_index(bot_id: int, shards: int = None) -> int:
+    """رقم الجزء الذي يحفظ بيانات البوت"""
+    shards = shards or Config.DB_SHARDS
+    return bot_id % shards if shards > 1 else 0
+
+class ShardSet:
+    """ملفات مستقلة لجداول bot_users و bot_stats موزعة حسب bot_id، لكل منها مجمع اتصالات وكاتب خاص"""
+    
+    def __init__(self, paths: List[str]):
+        self.paths = paths
+        self.pools = [ConnectionPool(path) for path in paths]
+        for pool in self.pools:
+            apply_migrations(pool.acquire(), SHARD_MIGRATIONS)
+        # خيط كتابة لكل جزء: الأجزاء تُكتب بالتوازي وكل خيط يعيد استخدام اتصاله بجزئه
+        self.writers = [ThreadPoolExecutor(max_workers=1, thread_name_prefix=f'db-shard-{index}')
+                        for index in range(len(paths))]
+    
+    def __len__(self) -> int:
+        return len(self.pools)
+    
+    def index(self, bot_id: int) -> int:
+        return shard_index(bot_id, len(self.pools))
+    
+    @contextmanager
+    def get_connection(self, index: int):
+        """اتصال الخيط الحالي بالجزء المحدد مع التراجع عند الخطأ"""
+        conn = self.pools[index].acquire()
+        try:
+            yield conn
+        except Exception as e:
+            if conn.in_transaction:
+                conn.rollback()
+            logger.error(f"خطأ في قاعدة بيانات الجزء {index}: {e}")
+            raise
+    
+    def partition(self, rows: Dict[Tuple[int, int], list]) -> Dict[int, Dict[Tuple[int, int], list]]:
+        """تقسيم صفوف مستخدمي البوتات (المفتاح (bot_id, user_id)) حسب الجزء"""
+        groups: Dict[int, Dict[Tuple[int, int], list]] = {}
+        for key, row in rows.items():
+            groups.setdefault(self.index(key[0]), {})[key] = row
+        return groups
+    
+    def write_bot_users(self, rows: Dict[Tuple[int, int], list]) -> Tuple[Dict[int, int], Dict[Tuple[int, int], list]]:
+        """كتابة مستخدمي البوتات في أجزائهم بالتوازي وإرجاع (عدد الجدد لكل بوت من كل الأجزاء، الصفوف التي فشلت)"""
+        groups = self.partition(rows)
+        futures = {index: self.writers[index].submit(self._write_shard, index, shard_rows)
+                   for index, shard_rows in groups.items()}
+        new_users: Dict[int, int] = {}
+        failed: Dict[Tuple[int, int], list] = {}
+        for index, future in futures.items():
+            try:
+                counts = future.result()
+            except Exception as e:
+                logger.error(f"خطأ في كتابة مستخدمي البوتات في الجزء {index}: {e}")
+                failed.update(groups[index])
+                continue
+            for bot_id, count in counts.items():
+                new_users[bot_id] = new_users.get(bot_id, 0) + count
+        return new_users, failed
+    
+    def _write_shard(self, index: int, rows: Dict[Tuple[int, int], list]) -> Dict[int, int]:
+        with self.get_connection(index) as conn:
+            new_users = _upsert_bot_users(conn.cursor(), rows.values())
+            conn.commit()
+        return new_users
+    
+    def close_all(self):
+        for writer in self.writers:
+            writer.shutdown(wait=True)
+        for pool in self.pools:
+            pool.close_all()
+
+# إدراج مستخدم بوت جديد فقط؛ آخر معامل هو عدد الرسائل المتراكمة ناقص واحد
+BOT_USER_INSERT_SQL = '''
+    INSERT INTO bot_users (bot_id, user_id, username, first_name,
+                         chat_type, date_joined, last_interaction, message_count)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(bot_id, user_id) DO NOTHING
+'''
+
+BOT_USER_TOUCH_SQL = '''
+    UPDATE bot_users SET
+        last_interaction = ?,
+        message_count = message_count + ?
+    WHERE bot_id = ? AND user_id = ?
+'''
+
+def _upsert_bot_users(cursor: sqlite3.Cursor, rows) -> Dict[int, int]:
+    """إدراج أو تحديث مستخدمي البوتات وإرجاع عدد المستخدمين الجدد لكل بوت"""
+    new_users: Dict[int, int] = {}
+    for bot_id, user_id, username, first_name, chat_type, joined, last_interaction, extra in rows:
+        cursor.execute(BOT_USER_INSERT_SQL, (
+            bot_id, user_id, username, first_name, chat_type, joined, last_interaction, extra
+        ))
+        if cursor.rowcount == 1:
+            new_users[bot_id] = new_users.get(bot_id, 0) + 1
+        else:
+            cursor.execute(BOT_USER_TOUCH_SQL, (last_interaction, extra + 1, bot_id, user_id))
+    return new_users
+
+def _add_total_users(cursor: sqlite3.Cursor, new_users: Dict[int, int]) -> Dict[int, int]:
+    """زيادة bots.total_users بعدد المستخدمين الجدد (في الملف الأساسي) وإرجاع مالك كل بوت محدَّث"""
+    owners: Dict[int, int] = {}
+    for bot_id, count in new_users.items():
+        row = cursor.execute(
+            'UPDATE bots SET total_users = total_users + ? WHERE id = ? RETURNING owner_id', (count, bot_id)
+        ).fetchone()
+        if row:
+            owners[bot_id] = row[0]
+    return owners
+
+ACTIVITY_INSERT_SQL = '''
+    INSERT INTO activity_log (user_id, action, details, timestamp)
+    VALUES (?, ?, ?, ?)
+'''
+
+class WriteBehindBuffer:
+    """مخزن كتابة مؤجلة يجمع الكتابات المتكررة ويكتبها في معاملة واحدة"""
+    
+    def __init__(self, manager: 'DatabaseManager', interval_ms: int = None, max_rows: int = None):
+        self.manager = manager
+        self.interval = (interval_ms or Config.WRITE_BUFFER_INTERVAL_MS) / 1000
+        self.max_rows = max_rows or Config.WRITE_BUFFER_MAX_ROWS
+        self._lock = threading.Lock()
+        self._activities: List[Tuple] = []
+        self._bot_users: Dict[Tuple[int, int], list] = {}
+        self._wakeup = threading.Event()
+        self._running = False
+        self._thread = None
+    
+    def start(self):
+        """بدء خيط التفريغ الدوري"""
+        with self._lock:
+            if self._running:
+                return
+            self._running = True
+            self._thread = threading.Thread(target=self._flush_loop, name='db-write-buffer', daemon=True)
+            self._thread.start()
+        atexit.register(self.stop)
+    
+    def stop(self):
+        """إيقاف الخيط وتفريغ ما تبقى في المخزن"""
+        with self._lock:
+            if not self._running:
+                return
+            self._running = False
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join(timeout=10)
+        self.flush()
+    
+    def _pending(self) -> int:
+        return len(self._activities) + len(self._bot_users)
+    
+    def add_activity(self, user_id: int, action: str, details: str, timestamp: int):
+        """إضافة نشاط إلى المخزن"""
+        with self._lock:
+            self._activities.append((user_id, action, details, timestamp))
+            full = self._pending() >= self.max_rows
+        self._ensure_started(full)
+    
+    def add_bot_user(self, bot_id: int, user_id: int, username: str,
+                     first_name: str, chat_type: str, timestamp: int):
+        """إضافة تفاعل مستخدم بوت مع دمج التفاعلات المتكررة لنفس المستخدم"""
+        key = (bot_id, user_id)
+        with self._lock:
+            row = self._bot_users.get(key)
+            if row:
+                row[6] = timestamp
+                row[7] += 1
+            else:
+                self._bot_users[key] = [bot_id, user_id, username, first_name,
+                                        chat_type, timestamp, timestamp, 0]
+            full = self._pending() >= self.max_rows
+        self._ensure_started(full)
+    
+    def _ensure_started(self, full: bool):
+        if not self._running:
+            self.start()
+        if full:
+            self._wakeup.set()
+    
+    def _flush_loop(self):
+        """حلقة التفريغ كل فترة أو عند امتلاء المخزن"""
+        while self._running:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            self.flush()
+    
+    def flush(self) -> int:
+        """كتابة محتوى المخزن في معاملة واحدة وإرجاع عدد الصفوف المكتوبة"""
+        with self._lock:
+            activities, self._activities = self._activities, []
+            bot_users, self._bot_users = self._bot_users, {}
+        
+        if not activities and not bot_users:
+            return 0
+        
+        shards = self.manager.shards
+        new_users: Dict[int, int] = {}
+        failed: Dict[Tuple[int, int], list] = {}
+        if bot_users and shards is not None:
+            # الأجزاء أولاً بالتوازي، ثم معاملة واحدة في الملف الأساسي لكل العدادات مع الأنشطة
+            new_users, failed = shards.write_bot_users(bot_users)
+        
+        try:
+            with self.manager.get_connection() as conn:
+                cursor = conn.cursor()
+                if activities:
+                    cursor.executemany(ACTIVITY_INSERT_SQL, activities)
+                if bot_users and shards is None:
+                    new_users = _upsert_bot_users(cursor, bot_users.values())
+                owners = _add_total_users(cursor, new_users)
+                conn.commit()
+            self.manager.invalidate_bot_cache(owners)
+        except Exception as e:
+            logger.error(f"خطأ في تفريغ مخزن الكتابة المؤجلة: {e}")
+            # صفوف الأجزاء كُتبت؛ انحراف total_users يُصحَّح بأمر recount في shard_manager
+            self._requeue(activities, bot_users if shards is None else failed)
+            return 0
+        
+        if failed:
+            self._requeue([], failed)
+        return len(activities) + len(bot_users) - len(failed)
+    
+    def _requeue(self, activities: List[Tuple], bot_users: Dict[Tuple[int, int], list]):
+        """إعادة الصفوف للمخزن لمحاولة لاحقة"""
+        with self._lock:
+            self._activities[:0] = activities
+            for key, row in bot_users.items():
+                newer = self._bot_users.get(key)
+                if newer:
+                    newer[7] += row[7] + 1
+                else:
+                    self._bot_users[key] = row
+
+@instrument_methods(exclude=('get_connection', 'get_shard_connection', 'close',
+                             'iter_bots', 'iter_bot_ids', 'iter_bot_users', 'iter_activities'))
 class DatabaseManager:
     def __init__(self, db_path: str = None):
         self.db_path = db_path or Config.DB_PATH
+        self.pool = ConnectionPool(self.db_path)
+        shard_paths = Config.shard_paths()
+        self.shards = ShardSet(shard_paths) if shard_paths else None
+        self.write_buffer = WriteBehindBuffer(self) if Config.WRITE_BUFFER_ENABLED else None
+        self.cache = TTLCache(Config.CACHE_MAX_SIZE, Config.CACHE_TTL)
         self.init_database()
     
     @contextmanager
     def get_connection(self):
-        """إدارة اتصال قاعدة البيانات بطريقة آمنة"""
-        conn = None
+        """إدارة اتصال قاعدة البيانات بطريقة آمنة (من مجمع الاتصالات)"""
+        conn = self.pool.acquire()
         try:
-            conn = sqlite3.connect(self.db_path)
-            conn.row_factory = sqlite3.Row  # للحصول على النتائج كقاموس
             yield conn
         except Exception as e:
-            if conn:
+            if conn.in_transaction:
                 conn.rollback()
             logger.error(f"خطأ في قاعدة البيانات: {e}")
             raise
-        finally:
-            if conn:
-                conn.close()
+    
+    @contextmanager
+    def get_shard_connection(self, bot_id: int):
+        """اتصال الجزء الذي يحفظ bot_users و bot_stats للبوت (الملف الأساسي عند عدم التقسيم)"""
+        if self.shards is None:
+            with self.get_connection() as conn:
+                yield conn
+            return
+        
+        with self.shards.get_connection(self.shards.index(bot_id)) as conn:
+            yield conn
+    
+    def invalidate_user_cache(self, user_id: int):
+        """إبطال القيم المخزنة مؤقتاً لمستخدم"""
+        self.cache.invalidate(('user_bots', user_id), ('bot_count', user_id))
+    
+    def invalidate_bot_cache(self, owners: Dict[int, int]):
+        """إبطال معلومات البوتات وقوائم مالكيها بعد تغير عداداتها (total_users وtotal_messages وlast_active)"""
+        if owners:
+            self.cache.invalidate(*[('bot_info', bot_id) for bot_id in owners],
+                                  *[('user_bots', owner_id) for owner_id in set(owners.values())])
+    
+    def get_cache_stats(self) -> Dict:
+        """إحصائيات الذاكرة المؤقتة (الإصابات والإخفاقات)"""
+        return self.cache.stats()
+    
+    def flush_writes(self) -> int:
+        """تفريغ الكتابات المؤجلة فوراً"""
+        return self.write_buffer.flush() if self.write_buffer else 0
+    
+    def close(self):
+        """تفريغ الكتابات المؤجلة وإغلاق اتصالات قاعدة البيانات"""
+        if self.write_buffer:
+            self.write_buffer.stop()
+        if self.shards:
+            self.shards.close_all()
+        self.pool.close_all()
     
     def init_database(self):
-        """إنشاء جداول قاعدة البيانات"""
+        """ترقية مخطط قاعدة البيانات إلى آخر إصدار (مرة واحدة عند البدء)"""
         with self.get_connection() as conn:
-            cursor = conn.cursor()
-            
-            # جدول البوتات المحسن
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS bots (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    owner_id INTEGER NOT NULL,
-                    token TEXT NOT NULL UNIQUE,
-                    bot_username TEXT,
-                    bot_name TEXT,
-                    date_created TEXT NOT NULL,
-                    last_active TEXT,
-                    status TEXT NOT NULL DEFAULT 'active',
-                    total_users INTEGER DEFAULT 0,
-                    total_messages INTEGER DEFAULT 0,
-                    settings TEXT DEFAULT '{}',
-                    FOREIGN KEY (owner_id) REFERENCES users (user_id)
-                )
-            ''')
-            
-            # جدول المستخدمين
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS users (
-                    user_id INTEGER PRIMARY KEY,
-                    username TEXT,
-                    first_name TEXT,
-                    last_name TEXT,
-                    date_joined TEXT NOT NULL,
-                    last_seen TEXT,
-                    bot_limit INTEGER DEFAULT 3,
-                    is_premium BOOLEAN DEFAULT FALSE,
-                    total_bots_created INTEGER DEFAULT 0
-                )
-            ''')
-            
-            # جدول إحصائيات البوتات
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS bot_stats (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    bot_id INTEGER NOT NULL,
-                    date TEXT NOT NULL,
-                    messages_count INTEGER DEFAULT 0,
-                    users_count INTEGER DEFAULT 0,
-                    groups_count INTEGER DEFAULT 0,
-                    FOREIGN KEY (bot_id) REFERENCES bots (id)
-                )
-            ''')
-            
-            # جدول مستخدمي البوتات المصنوعة
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS bot_users (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    bot_id INTEGER NOT NULL,
-                    user_id INTEGER NOT NULL,
-                    username TEXT,
-                    first_name TEXT,
-                    chat_type TEXT,
-                    date_joined TEXT NOT NULL,
-                    last_interaction TEXT,
-                    message_count INTEGER DEFAULT 0,
-                    FOREIGN KEY (bot_id) REFERENCES bots (id),
-                    UNIQUE(bot_id, user_id)
-                )
-            ''')
-            
-            # جدول الإذاعات
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS broadcasts (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    sender_id INTEGER NOT NULL,
-                    message_text TEXT NOT NULL,
-                    target_type TEXT NOT NULL,
-                    date_sent TEXT NOT NULL,
-                    total_sent INTEGER DEFAULT 0,
-                    total_failed INTEGER DEFAULT 0,
-                    status TEXT DEFAULT 'pending'
-                )
-            ''')
-            
-            # جدول سجل الأنشطة
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS activity_log (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id INTEGER,
-                    action TEXT NOT NULL,
-                    details TEXT,
-                    timestamp TEXT NOT NULL,
-                    ip_address TEXT
-                )
-            ''')
-            
-            # إنشاء الفهارس لتحسين الأداء
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_bots_owner ON bots(owner_id)')
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_bots_status ON bots(status)')
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_bot_users_bot ON bot_users(bot_id)')
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_activity_user ON activity_log(user_id)')
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_activity_timestamp ON activity_log(timestamp)')
-            
-            conn.commit()
-            logger.info("✅ تم إنشاء قاعدة البيانات بنجاح")
+            version = apply_migrations(conn, offline=Config.DB_OFFLINE_MIGRATIONS)
+            if Config.DB_OFFLINE_MIGRATIONS:
+                enable_incremental_vacuum(conn)
+            elif conn.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+                logger.warning("⚠️ auto_vacuum ليس INCREMENTAL على هذه القاعدة فلن يحرر incremental_vacuum أي صفحات؛ "
+                               "شغّل python migrations.py --offline والمصنع متوقف")
+            logger.info(f"✅ قاعدة البيانات جاهزة (إصدار المخطط {version})")
     
     # === إدارة المستخدمين ===
     def add_or_update_user(self, user_id: int, username: str = None, 
@@ -145,7 +403,7 @@ class DatabaseManager:
         try:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
-                now = datetime.datetime.now().isoformat()
+                now = now_ts()
                 
                 cursor.execute('''
                     INSERT INTO users (user_id, username, first_name, last_name, date_joined, last_seen)
@@ -165,12 +423,19 @@ class DatabaseManager:
     
     def get_user_limit(self, user_id: int) -> int:
         """الحصول على حد البوتات للمستخدم"""
+        cached = self.cache.get(('user_limit', user_id))
+        if cached is not MISSING:
+            return cached
+        
+        generation = self.cache.generation
         try:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
                 cursor.execute('SELECT bot_limit FROM users WHERE user_id = ?', (user_id,))
                 result = cursor.fetchone()
-                return result['bot_limit'] if result else Config.DEFAULT_LIMIT
+                limit = result['bot_limit'] if result else Config.DEFAULT_LIMIT
+                self.cache.set(('user_limit', user_id), limit, generation)
+                return limit
         except Exception as e:
             logger.error(f"خطأ في الحصول على حد المستخدم {user_id}: {e}")
             return Config.DEFAULT_LIMIT
@@ -186,13 +451,14 @@ class DatabaseManager:
                 
                 if cursor.rowcount == 0:
                     # إنشاء المستخدم إذا لم يكن موجوداً
-                    now = datetime.datetime.now().isoformat()
+                    now = now_ts()
                     cursor.execute('''
                         INSERT INTO users (user_id, bot_limit, date_joined, last_seen)
                         VALUES (?, ?, ?, ?)
                     ''', (user_id, limit, now, now))
                 
                 conn.commit()
+                self.cache.invalidate(('user_limit', user_id))
                 return True
         except Exception as e:
             logger.error(f"خطأ في تعديل حد المستخدم {user_id}: {e}")
@@ -204,7 +470,7 @@ class DatabaseManager:
         try:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
-                now = datetime.datetime.now().isoformat()
+                now = now_ts()
                 
                 bot_username = bot_info.get('username', '') if bot_info else ''
                 bot_name = bot_info.get('first_name', '') if bot_info else ''
@@ -223,6 +489,7 @@ class DatabaseManager:
                 ''', (owner_id,))
                 
                 conn.commit()
+                self.invalidate_user_cache(owner_id)
                 logger.info(f"✅ تم إضافة البوت {bot_id} للمستخدم {owner_id}")
                 return bot_id
         except Exception as e:
@@ -235,30 +502,76 @@ class DatabaseManager:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
                 
+                cursor.execute('SELECT owner_id, status FROM bots WHERE id = ?', (bot_id,))
+                result = cursor.fetchone()
+                if not result:
+                    return False
+                
                 # التحقق من الملكية إذا تم تحديد المالك
-                if owner_id:
-                    cursor.execute('''
-                        SELECT owner_id FROM bots WHERE id = ? AND status = 'active'
-                    ''', (bot_id,))
-                    result = cursor.fetchone()
-                    if not result or result['owner_id'] != owner_id:
-                        return False
+                if owner_id and (result['status'] != 'active' or result['owner_id'] != owner_id):
+                    return False
                 
                 # تحديث حالة البوت إلى محذوف
                 cursor.execute('''
                     UPDATE bots SET status = 'deleted', last_active = ?
                     WHERE id = ?
-                ''', (datetime.datetime.now().isoformat(), bot_id))
+                ''', (now_ts(), bot_id))
                 
                 conn.commit()
+                self.cache.invalidate(('bot_info', bot_id))
+                self.invalidate_user_cache(result['owner_id'])
                 logger.info(f"✅ تم حذف البوت {bot_id}")
                 return True
         except Exception as e:
             logger.error(f"خطأ في حذف البوت {bot_id}: {e}")
             return False
     
+    def set_bot_status(self, bot_id: int, status: str) -> bool:
+        """تغيير حالة بوت نشط (مثل revoked عند إلغاء التوكن)"""
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    UPDATE bots SET status = ? WHERE id = ? AND status = 'active'
+                    RETURNING owner_id
+                ''', (status, bot_id))
+                result = cursor.fetchone()
+                conn.commit()
+                if not result:
+                    return False
+                
+                self.cache.invalidate(('bot_info', bot_id))
+                self.invalidate_user_cache(result['owner_id'])
+                return True
+        except Exception as e:
+            logger.error(f"خطأ في تحديث حالة البوت {bot_id}: {e}")
+            return False
+    
+    def get_heartbeats(self, bot_ids: List[int]) -> Dict[int, Dict]:
+        """آخر نبض لمجموعة بوتات {bot_id: صف النبض}"""
+        heartbeats = {}
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                # على دفعات تحت حد متغيرات SQLite
+                for i in range(0, len(bot_ids), 500):
+                    chunk = bot_ids[i:i + 500]
+                    cursor.execute(
+                        f"SELECT * FROM bot_heartbeats WHERE bot_id IN ({', '.join('?' * len(chunk))})",
+                        chunk
+                    )
+                    heartbeats.update((row['bot_id'], dict(row)) for row in cursor.fetchall())
+        except Exception as e:
+            logger.error(f"خطأ في الحصول على نبضات البوتات: {e}")
+        return heartbeats
+    
     def get_user_bots(self, user_id: int) -> List[Dict]:
         """الحصول على بوتات المستخدم"""
+        cached = self.cache.get(('user_bots', user_id))
+        if cached is not MISSING:
+            return [dict(bot) for bot in cached]
+        
+        generation = self.cache.generation
         try:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
@@ -270,13 +583,20 @@ class DatabaseManager:
                     ORDER BY date_created DESC
                 ''', (user_id,))
                 
-                return [dict(row) for row in cursor.fetchall()]
+                bots = [dict(row) for row in cursor.fetchall()]
+                self.cache.set(('user_bots', user_id), bots, generation)
+                return [dict(bot) for bot in bots]
         except Exception as e:
             logger.error(f"خطأ في الحصول على بوتات المستخدم {user_id}: {e}")
             return []
     
     def count_user_bots(self, user_id: int) -> int:
         """عد بوتات المستخدم النشطة"""
+        cached = self.cache.get(('bot_count', user_id))
+        if cached is not MISSING:
+            return cached
+        
+        generation = self.cache.generation
         try:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
@@ -286,7 +606,9 @@ class DatabaseManager:
                 ''', (user_id,))
                 
                 result = cursor.fetchone()
-                return result['count'] if result else 0
+                count = result['count'] if result else 0
+                self.cache.set(('bot_count', user_id), count, generation)
+                return count
         except Exception as e:
             logger.error(f"خطأ في عد بوتات المستخدم {user_id}: {e}")
             return 0
@@ -308,8 +630,83 @@ class DatabaseManager:
             logger.error(f"خطأ في الحصول على جميع البوتات: {e}")
             return []
     
+    def get_bots_page(self, after: int = 0, limit: int = 50,
+                      status: str = None) -> Tuple[List[Dict], Optional[int]]:
+        """صفحة من البوتات مرتبة بالمعرف (ترقيم بالمفتاح) مع مؤشر الصفحة التالية"""
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                query = '''
+                    SELECT b.*, u.username as owner_username, u.first_name as owner_name
+                    FROM bots b
+                    LEFT JOIN users u ON b.owner_id = u.user_id
+                    WHERE b.id > ?
+                '''
+                params = [after]
+                if status:
+                    query += ' AND b.status = ?'
+                    params.append(status)
+                query += ' ORDER BY b.id LIMIT ?'
+                params.append(limit)
+                
+                cursor.execute(query, params)
+                rows = [dict(row) for row in cursor.fetchall()]
+                next_cursor = rows[-1]['id'] if len(rows) == limit else None
+                return rows, next_cursor
+        except Exception as e:
+            logger.error(f"خطأ في الحصول على صفحة البوتات: {e}")
+            return [], None
+    
+    def iter_bots(self, status: str = None, batch_size: int = 500, after: int = 0) -> Iterator[Dict]:
+        """المرور على البوتات دفعة بعد دفعة دون تحميلها كلها في الذاكرة"""
+        cursor = after
+        while cursor is not None:
+            rows, cursor = self.get_bots_page(after=cursor, limit=batch_size, status=status)
+            yield from rows
+    
+    def iter_bot_ids(self, status: str = None, batch_size: int = 5000) -> Iterator[int]:
+        """المرور على معرفات البوتات فقط (يكفيها الفهرس دون قراءة الصفوف)"""
+        last_id = 0
+        while True:
+            with self.get_connection() as conn:
+                if status:
+                    rows = conn.execute(
+                        'SELECT id FROM bots WHERE id > ? AND status = ? ORDER BY id LIMIT ?',
+                        (last_id, status, batch_size)
+                    ).fetchall()
+                else:
+                    rows = conn.execute(
+                        'SELECT id FROM bots WHERE id > ? ORDER BY id LIMIT ?', (last_id, batch_size)
+                    ).fetchall()
+            if not rows:
+                return
+            yield from (row[0] for row in rows)
+            last_id = rows[-1][0]
+    
+    def get_bots_for_check(self, bot_ids: List[int]) -> Dict[int, Dict]:
+        """الحقول التي يحتاجها فحص الصحة فقط لمجموعة بوتات {bot_id: {id, token, owner_id, bot_username}}"""
+        bots = {}
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                for i in range(0, len(bot_ids), 500):
+                    chunk = bot_ids[i:i + 500]
+                    cursor.execute(
+                        f"SELECT id, token, owner_id, bot_username FROM bots WHERE id IN ({', '.join('?' * len(chunk))})",
+                        chunk
+                    )
+                    bots.update((row['id'], dict(row)) for row in cursor.fetchall())
+        except Exception as e:
+            logger.error(f"خطأ في الحصول على بيانات فحص البوتات: {e}")
+        return bots
+    
     def get_bot_info(self, bot_id: int) -> Optional[Dict]:
         """الحصول على معلومات بوت محدد"""
+        cached = self.cache.get(('bot_info', bot_id))
+        if cached is not MISSING:
+            return dict(cached) if cached else None
+        
+        generation = self.cache.generation
         try:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
@@ -318,7 +715,9 @@ class DatabaseManager:
                 ''', (bot_id,))
                 
                 result = cursor.fetchone()
-                return dict(result) if result else None
+                bot_info = dict(result) if result else None
+                self.cache.set(('bot_info', bot_id), bot_info, generation)
+                return dict(bot_info) if bot_info else None
         except Exception as e:
             logger.error(f"خطأ في الحصول على معلومات البوت {bot_id}: {e}")
             return None
@@ -327,30 +726,47 @@ class DatabaseManager:
     def add_bot_user(self, bot_id: int, user_id: int, username: str = None, 
                      first_name: str = None, chat_type: str = 'private') -> bool:
         """إضافة مستخدم لبوت معين"""
+        now = now_ts()
+        if self.write_buffer:
+            self.write_buffer.add_bot_user(bot_id, user_id, username, first_name, chat_type, now)
+            return True
+        
+        row = [bot_id, user_id, username, first_name, chat_type, now, now, 0]
+        if self.shards:
+            return not self._write_sharded_bot_users({(bot_id, user_id): row})
+        
         try:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
-                now = datetime.datetime.now().isoformat()
-                
-                cursor.execute('''
-                    INSERT INTO bot_users (bot_id, user_id, username, first_name, 
-                                         chat_type, date_joined, last_interaction)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                    ON CONFLICT(bot_id, user_id) DO UPDATE SET
-                        last_interaction = excluded.last_interaction,
-                        message_count = message_count + 1
-                ''', (bot_id, user_id, username, first_name, chat_type, now, now))
+                owners = _add_total_users(cursor, _upsert_bot_users(cursor, [row]))
                 
                 conn.commit()
+                self.invalidate_bot_cache(owners)
                 return True
         except Exception as e:
             logger.error(f"خطأ في إضافة مستخدم البوت: {e}")
             return False
     
+    def _write_sharded_bot_users(self, rows: Dict[Tuple[int, int], list]) -> Dict[Tuple[int, int], list]:
+        """كتابة مستخدمي البوتات في أجزائهم بالتوازي ثم تحديث total_users بمعاملة واحدة، وإرجاع الصفوف التي فشلت"""
+        new_users, failed = self.shards.write_bot_users(rows)
+        if not new_users:
+            return failed
+        
+        # معاملة منفصلة في الملف الأساسي؛ أي انحراف يُصحَّح بأمر recount في shard_manager
+        try:
+            with self.get_connection() as conn:
+                owners = _add_total_users(conn.cursor(), new_users)
+                conn.commit()
+            self.invalidate_bot_cache(owners)
+        except Exception as e:
+            logger.error(f"خطأ في تحديث عدد مستخدمي البوتات: {e}")
+        return failed
+    
     def get_bot_users(self, bot_id: int) -> List[Dict]:
         """الحصول على مستخدمي بوت معين"""
         try:
-            with self.get_connection() as conn:
+            with self.get_shard_connection(bot_id) as conn:
                 cursor = conn.cursor()
                 cursor.execute('''
                     SELECT * FROM bot_users 
@@ -363,16 +779,44 @@ class DatabaseManager:
             logger.error(f"خطأ في الحصول على مستخدمي البوت {bot_id}: {e}")
             return []
     
+    def get_bot_users_page(self, bot_id: int, after: int = None,
+                           limit: int = 50) -> Tuple[List[Dict], Optional[int]]:
+        """صفحة من مستخدمي بوت مرتبة بمعرف المستخدم (عبر فهرس UNIQUE(bot_id, user_id))"""
+        try:
+            with self.get_shard_connection(bot_id) as conn:
+                cursor = conn.cursor()
+                query = 'SELECT * FROM bot_users WHERE bot_id = ?'
+                params = [bot_id]
+                if after is not None:
+                    query += ' AND user_id > ?'
+                    params.append(after)
+                query += ' ORDER BY user_id LIMIT ?'
+                params.append(limit)
+                
+                cursor.execute(query, params)
+                rows = [dict(row) for row in cursor.fetchall()]
+                next_cursor = rows[-1]['user_id'] if len(rows) == limit else None
+                return rows, next_cursor
+        except Exception as e:
+            logger.error(f"خطأ في الحصول على صفحة مستخدمي البوت {bot_id}: {e}")
+            return [], None
+    
+    def iter_bot_users(self, bot_id: int, after: int = None, batch_size: int = 1000) -> Iterator[Dict]:
+        """المرور على مستخدمي بوت دفعة بعد دفعة"""
+        while True:
+            rows, after = self.get_bot_users_page(bot_id, after=after, limit=batch_size)
+            yield from rows
+            if after is None:
+                return
+    
     # === إدارة الإحصائيات ===
     def update_bot_stats(self, bot_id: int, messages_count: int = 0, 
                         users_count: int = 0, groups_count: int = 0) -> bool:
         """تحديث إحصائيات البوت"""
         try:
-            with self.get_connection() as conn:
-                cursor = conn.cursor()
-                today = datetime.date.today().isoformat()
-                
-                cursor.execute('''
+            with self.get_shard_connection(bot_id) as conn:
+                today = day_start_ts()
+                conn.execute('''
                     INSERT INTO bot_stats (bot_id, date, messages_count, users_count, groups_count)
                     VALUES (?, ?, ?, ?, ?)
                     ON CONFLICT(bot_id, date) DO UPDATE SET
@@ -380,47 +824,42 @@ class DatabaseManager:
                         users_count = excluded.users_count,
                         groups_count = excluded.groups_count
                 ''', (bot_id, today, messages_count, users_count, groups_count))
-                
-                # تحديث الإحصائيات الإجمالية للبوت
-                cursor.execute('''
+                # بدون تقسيم هو نفس الاتصال فتكتمل المعاملة مع تحديث bots أدناه
+                if self.shards:
+                    conn.commit()
+            
+            with self.get_connection() as conn:
+                # تحديث الإحصائيات الإجمالية للبوت (total_users يُحدَّث عند إضافة مستخدم جديد)
+                row = conn.execute('''
                     UPDATE bots SET 
                         total_messages = total_messages + ?,
-                        total_users = (SELECT COUNT(DISTINCT user_id) FROM bot_users WHERE bot_id = ?),
                         last_active = ?
                     WHERE id = ?
-                ''', (messages_count, bot_id, datetime.datetime.now().isoformat(), bot_id))
+                    RETURNING owner_id
+                ''', (messages_count, now_ts(), bot_id)).fetchone()
                 
                 conn.commit()
+                if row:
+                    self.invalidate_bot_cache({bot_id: row['owner_id']})
                 return True
         except Exception as e:
             logger.error(f"خطأ في تحديث إحصائيات البوت {bot_id}: {e}")
             return False
     
     def get_system_stats(self) -> Dict:
-        """الحصول على إحصائيات النظام العامة"""
+        """الحصول على إحصائيات النظام العامة (من العدادات المحدثة تلقائياً)"""
         try:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
-                
-                # إحصائيات عامة
-                cursor.execute('SELECT COUNT(*) as total FROM bots WHERE status = "active"')
-                total_bots = cursor.fetchone()['total']
-                
-                cursor.execute('SELECT COUNT(*) as total FROM users')
-                total_users = cursor.fetchone()['total']
-                
-                cursor.execute('SELECT SUM(total_messages) as total FROM bots WHERE status = "active"')
-                total_messages = cursor.fetchone()['total'] or 0
-                
-                cursor.execute('SELECT SUM(total_users) as total FROM bots WHERE status = "active"')
-                total_bot_users = cursor.fetchone()['total'] or 0
+                cursor.execute('SELECT name, value FROM system_counters')
+                counters = {row['name']: row['value'] for row in cursor.fetchall()}
                 
                 return {
-                    'total_bots': total_bots,
-                    'total_users': total_users,
-                    'total_messages': total_messages,
-                    'total_bot_users': total_bot_users,
-                    'timestamp': datetime.datetime.now().isoformat()
+                    'total_bots': counters.get('active_bots', 0),
+                    'total_users': counters.get('total_users', 0),
+                    'total_messages': counters.get('active_messages', 0),
+                    'total_bot_users': counters.get('active_bot_users', 0),
+                    'timestamp': now_ts()
                 }
         except Exception as e:
             logger.error(f"خطأ في الحصول على إحصائيات النظام: {e}")
@@ -429,13 +868,15 @@ class DatabaseManager:
     # === سجل الأنشطة ===
     def log_activity(self, user_id: int, action: str, details: str = None) -> bool:
         """تسجيل نشاط المستخدم"""
+        now = now_ts()
+        if self.write_buffer:
+            self.write_buffer.add_activity(user_id, action, details, now)
+            return True
+        
         try:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
-                cursor.execute('''
-                    INSERT INTO activity_log (user_id, action, details, timestamp)
-                    VALUES (?, ?, ?, ?)
-                ''', (user_id, action, details, datetime.datetime.now().isoformat()))
+                cursor.execute(ACTIVITY_INSERT_SQL, (user_id, action, details, now))
                 
                 conn.commit()
                 return True
@@ -460,6 +901,178 @@ class DatabaseManager:
         except Exception as e:
             logger.error(f"خطأ في الحصول على الأنشطة: {e}")
             return []
+    
+    def get_activities_page(self, before: int = None,
+                            limit: int = 50) -> Tuple[List[Dict], Optional[int]]:
+        """صفحة من سجل الأنشطة من الأحدث للأقدم مع مؤشر الصفحة التالية"""
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                query = '''
+                    SELECT a.*, u.username, u.first_name
+                    FROM activity_log a
+                    LEFT JOIN users u ON a.user_id = u.user_id
+                '''
+                params = []
+                if before is not None:
+                    query += ' WHERE a.id < ?'
+                    params.append(before)
+                query += ' ORDER BY a.id DESC LIMIT ?'
+                params.append(limit)
+                
+                cursor.execute(query, params)
+                rows = [dict(row) for row in cursor.fetchall()]
+                next_cursor = rows[-1]['id'] if len(rows) == limit else None
+                return rows, next_cursor
+        except Exception as e:
+            logger.error(f"خطأ في الحصول على صفحة الأنشطة: {e}")
+            return [], None
+    
+    def iter_activities(self, before: int = None, batch_size: int = 1000) -> Iterator[Dict]:
+        """المرور على سجل الأنشطة من الأحدث للأقدم دفعة بعد دفعة"""
+        while True:
+            rows, before = self.get_activities_page(before=before, limit=batch_size)
+            yield from rows
+            if before is None:
+                return
+
+    # === الصيانة ===
+    def compact_activity_log(self, retention_days: int = None, batch_size: int = None) -> Dict:
+        """تجميع الأنشطة الأقدم من مدة الاحتفاظ في صفوف يومية ثم حذفها على دفعات"""
+        retention_days = retention_days if retention_days is not None else Config.ACTIVITY_RETENTION_DAYS
+        batch_size = batch_size or Config.ACTIVITY_COMPACT_BATCH
+        cutoff = day_start_ts(datetime.date.today() - datetime.timedelta(days=retention_days))
+        
+        # نفس الدفعة تُجمَّع ثم تُحذف داخل معاملة واحدة قصيرة
+        batch_query = '''
+            SELECT id FROM activity_log
+            WHERE timestamp < ?
+            ORDER BY timestamp, id
+            LIMIT ?
+        '''
+        compacted = 0
+        try:
+            while True:
+                with self.get_connection() as conn:
+                    cursor = conn.cursor()
+                    cursor.execute(f'''
+                        INSERT INTO activity_daily (day, user_id, action, count)
+                        SELECT CAST(strftime('%s', timestamp, 'unixepoch', 'localtime',
+                                             'start of day', 'utc') AS INTEGER),
+                               COALESCE(user_id, 0), action, COUNT(*)
+                        FROM activity_log
+                        WHERE id IN ({batch_query})
+                        GROUP BY 1, 2, 3
+                        ON CONFLICT(day, user_id, action) DO UPDATE SET
+                            count = count + excluded.count
+                    ''', (cutoff, batch_size))
+                    cursor.execute(f'DELETE FROM activity_log WHERE id IN ({batch_query})',
+                                   (cutoff, batch_size))
+                    deleted = cursor.rowcount
+                    conn.commit()
+                
+                compacted += deleted
+                if deleted < batch_size:
+                    break
+            
+            vacuumed = self.incremental_vacuum()
+            if compacted:
+                logger.info(f"🧹 تم تجميع وحذف {compacted} نشاط أقدم من {retention_days} يوم")
+            return {'compacted': compacted, 'vacuumed_pages': vacuumed}
+        except Exception as e:
+            logger.error(f"خطأ في ضغط سجل الأنشطة: {e}")
+            return {'compacted': compacted, 'error': str(e)}
+    
+    def incremental_vacuum(self, pages: int = None) -> int:
+        """تحرير الصفحات الفارغة تدريجياً وإرجاع عددها"""
+        pages = pages or Config.VACUUM_PAGES
+        try:
+            with self.get_connection() as conn:
+                if conn.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+                    return 0
+                freelist = conn.execute('PRAGMA freelist_count').fetchone()[0]
+                conn.execute(f'PRAGMA incremental_vacuum({pages})').fetchall()
+                return min(freelist, pages)
+        except Exception as e:
+            logger.error(f"خطأ في التفريغ التدريجي: {e}")
+            return 0
+    
+    def get_activity_rollups(self, days: int = 30, user_id: int = None) -> List[Dict]:
+        """الأنشطة المجمعة يومياً لفترة محددة"""
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                since = day_start_ts(datetime.date.today() - datetime.timedelta(days=days))
+                if user_id is None:
+                    cursor.execute('''
+                        SELECT day, action, SUM(count) as count FROM activity_daily
+                        WHERE day >= ? GROUP BY day, action ORDER BY day
+                    ''', (since,))
+                else:
+                    cursor.execute('''
+                        SELECT day, action, count FROM activity_daily
+                        WHERE user_id = ? AND day >= ? ORDER BY day
+                    ''', (user_id, since))
+                return [dict(row) for row in cursor.fetchall()]
+        except Exception as e:
+            logger.error(f"خطأ في الحصول على الأنشطة المجمعة: {e}")
+            return []
+
+class AsyncDatabaseManager:
+    """واجهة غير متزامنة لمدير قاعدة البيانات تنفذ الاستعلامات في خيوط مخصصة"""
+    
+    # دوال لا معنى لتنفيذها عبر المنفذ
+    _SYNC_ONLY = {'get_connection', 'get_shard_connection', 'close', 'iter_bots', 'iter_bot_ids',
+                  'iter_bot_users', 'iter_activities'}
+    
+    def __init__(self, manager: DatabaseManager, max_workers: int = None):
+        self.manager = manager
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers or Config.DB_EXECUTOR_WORKERS,
+            thread_name_prefix='db'
+        )
+    
+    async def run(self, func, *args, **kwargs):
+        """تنفيذ دالة متزامنة على منفذ قاعدة البيانات دون حجب حلقة الأحداث"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(func, *args, **kwargs))
+    
+    async def aiter_bots(self, status: str = None, batch_size: int = 500) -> AsyncIterator[Dict]:
+        """نسخة غير متزامنة من iter_bots: كل صفحة تُقرأ على المنفذ"""
+        cursor = 0
+        while cursor is not None:
+            rows, cursor = await self.run(self.manager.get_bots_page, after=cursor, limit=batch_size, status=status)
+            for row in rows:
+                yield row
+    
+    async def aiter_bot_users(self, bot_id: int, batch_size: int = 1000) -> AsyncIterator[Dict]:
+        """نسخة غير متزامنة من iter_bot_users"""
+        after = None
+        while True:
+            rows, after = await self.run(self.manager.get_bot_users_page, bot_id, after=after, limit=batch_size)
+            for row in rows:
+                yield row
+            if after is None:
+                return
+    
+    def __getattr__(self, name: str):
+        """إرجاع نسخة قابلة للانتظار من دوال DatabaseManager العامة"""
+        attr = getattr(self.manager, name)
+        if name.startswith('_') or name in self._SYNC_ONLY or not callable(attr):
+            return attr
+        
+        @functools.wraps(attr)
+        async def wrapper(*args, **kwargs):
+            return await self.run(attr, *args, **kwargs)
+        
+        # حفظ الغلاف لتجنب إعادة إنشائه في كل استدعاء
+        setattr(self, name, wrapper)
+        return wrapper
+    
+    def shutdown(self):
+        """إيقاف المنفذ بعد انتهاء الاستعلامات الجارية"""
+        self.executor.shutdown(wait=True)
 
 # إنشاء مثيل مشترك من مدير قاعدة البيانات
 db = DatabaseManager()
+async_db = AsyncDatabaseManager(db)
@@ -0,0 +1,227 @@
+"""
+قياس أداء قاعدة البيانات وسجل الاستعلامات البطيئة
+Database Metrics and Slow Query Log
+"""
+import time
+import itertools
+import sqlite3
+import logging
+import functools
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, Optional
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# حدود مدرج زمن الاستجابة بالميلي ثانية (آخر خانة لما يتجاوز الحد الأخير)
+LATENCY_BUCKETS_MS = (1, 5, 10, 50, 100, 500, 1000)
+
+# أنواع الاستعلامات التي يمكن شرح خطة تنفيذها
+EXPLAINABLE = ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'WITH', 'REPLACE')
+
+class MethodStats:
+    """إحصائيات دالة واحدة: عدد الاستدعاءات ومدرج زمن الاستجابة"""
+
+    __slots__ = ('calls', 'errors', 'total_ms', 'max_ms', 'buckets')
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+
+    def observe(self, duration_ms: float, failed: bool = False):
+        self.calls += 1
+        self.total_ms += duration_ms
+        self.max_ms = max(self.max_ms, duration_ms)
+        if failed:
+            self.errors += 1
+        for i, bound in enumerate(LATENCY_BUCKETS_MS):
+            if duration_ms <= bound:
+                self.buckets[i] += 1
+                return
+        self.buckets[-1] += 1
+
+    def percentile(self, pct: float) -> float:
+        """تقدير نسبة مئوية من المدرج (الحد الأعلى للخانة)"""
+        if not self.calls:
+            return 0.0
+        target = self.calls * pct / 100
+        seen = 0
+        for i, count in enumerate(self.buckets):
+            seen += count
+            if seen >= target:
+                return float(LATENCY_BUCKETS_MS[i]) if i < len(LATENCY_BUCKETS_MS) else self.max_ms
+        return self.max_ms
+
+    def to_dict(self) -> Dict:
+        return {
+            'calls': self.calls,
+            'errors': self.errors,
+            'total_ms': round(self.total_ms, 2),
+            'avg_ms': round(self.total_ms / self.calls, 2) if self.calls else 0.0,
+            'p95_ms': self.percentile(95),
+            'max_ms': round(self.max_ms, 2),
+            'histogram': dict(zip([f'<={b}ms' for b in LATENCY_BUCKETS_MS] + ['>1000ms'], self.buckets))
+        }
+
+class QueryMetrics:
+    """مجمع إحصائيات دوال مدير قاعدة البيانات والاستعلامات البطيئة"""
+
+    def __init__(self, slow_query_ms: float = None, max_slow_queries: int = 50):
+        self.slow_query_ms = slow_query_ms if slow_query_ms is not None else Config.SLOW_QUERY_MS
+        self._lock = threading.Lock()
+        self._methods: Dict[str, MethodStats] = {}
+        self.slow_queries: deque = deque(maxlen=max_slow_queries)
+        self.started_at = datetime.now()
+
+    def record(self, name: str, duration_ms: float, failed: bool = False):
+        """تسجيل زمن تنفيذ دالة"""
+        with self._lock:
+            stats = self._methods.get(name)
+            if stats is None:
+                stats = self._methods[name] = MethodStats()
+            stats.observe(duration_ms, failed)
+
+    def record_slow_query(self, sql: str, params, duration_ms: float, plan: List[str]):
+        """تسجيل استعلام بطيء مع معاملاته وخطة تنفيذه"""
+        entry = {
+            'sql': ' '.join(sql.split()),
+            'params': repr(params)[:200],
+            'duration_ms': round(duration_ms, 2),
+            'plan': plan,
+            'at': datetime.now().isoformat()
+        }
+        with self._lock:
+            self.slow_queries.append(entry)
+        logger.warning(
+            f"🐢 استعلام بطيء ({entry['duration_ms']}ms): {entry['sql']} | "
+            f"المعاملات: {entry['params']} | الخطة: {' ; '.join(plan)}"
+        )
+
+    def snapshot(self) -> Dict:
+        """نسخة من جميع الإحصائيات (للتصدير أو العرض)"""
+        with self._lock:
+            return {
+                'since': self.started_at.isoformat(),
+                'slow_query_ms': self.slow_query_ms,
+                'methods': {name: stats.to_dict() for name, stats in self._methods.items()},
+                'slow_queries': list(self.slow_queries)
+            }
+
+    def top_methods(self, limit: int = 10, key: str = 'total_ms') -> List[Dict]:
+        """أكثر الدوال استهلاكاً للوقت"""
+        methods = self.snapshot()['methods']
+        ranked = sorted(methods.items(), key=lambda item: item[1][key], reverse=True)
+        return [dict(stats, method=name) for name, stats in ranked[:limit]]
+
+    def reset(self):
+        """تصفير الإحصائيات"""
+        with self._lock:
+            self._methods.clear()
+            self.slow_queries.clear()
+            self.started_at = datetime.now()
+
+    def format_report(self, limit: int = 8) -> str:
+        """تقرير مختصر لأكثر الدوال والاستعلامات بطئاً (للمالك)"""
+        report = f"🐢 **أداء قاعدة البيانات**\n\n⏰ منذ: {self.started_at.strftime('%Y-%m-%d %H:%M:%S')}\n"
+
+        top = self.top_methods(limit)
+        if not top:
+            return report + "\nلا توجد بيانات بعد"
+
+        report += "\n📊 **أكثر الدوال استهلاكاً للوقت:**\n"
+        for item in top:
+            report += (
+                f"• `{item['method']}` - {item['calls']:,} استدعاء، "
+                f"متوسط {item['avg_ms']}ms، p95 ≤{item['p95_ms']:g}ms، أقصى {item['max_ms']}ms\n"
+            )
+
+        slow = list(self.slow_queries)[-3:]
+        if slow:
+            report += f"\n⚠️ **آخر الاستعلامات البطيئة (> {self.slow_query_ms}ms):**\n"
+            for entry in reversed(slow):
+                report += f"```\n{entry['duration_ms']}ms: {entry['sql'][:150]}\n{' ; '.join(entry['plan'])[:150]}\n```\n"
+
+        return report
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """مؤشر يقيس زمن كل استعلام ويسجل البطيء منها"""
+
+    def execute(self, sql, parameters=()):
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._observe(sql, parameters, start)
+
+    def executemany(self, sql, seq_of_parameters):
+        # أول صف معاملات يكفي لشرح الخطة (الاستعلام نفسه لكل الصفوف)
+        rows = iter(seq_of_parameters)
+        first = next(rows, None)
+        if first is not None:
+            rows = itertools.chain((first,), rows)
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, rows)
+        finally:
+            self._observe(sql, first, start)
+
+    def _observe(self, sql: str, parameters, start: float):
+        duration_ms = (time.perf_counter() - start) * 1000
+        if duration_ms < metrics.slow_query_ms:
+            return
+        metrics.record_slow_query(sql, parameters, duration_ms, self._explain(sql, parameters))
+
+    def _explain(self, sql: str, parameters) -> List[str]:
+        """خطة تنفيذ الاستعلام عبر EXPLAIN QUERY PLAN"""
+        if parameters is None or not sql.lstrip().upper().startswith(EXPLAINABLE):
+            return []
+        try:
+            # مؤشر عادي حتى لا يُقاس استعلام الشرح نفسه
+            rows = sqlite3.Cursor(self.connection).execute(f'EXPLAIN QUERY PLAN {sql}', parameters).fetchall()
+            return [row[-1] for row in rows]
+        except sqlite3.Error as e:
+            return [f'تعذر الشرح: {e}']
+
+class InstrumentedConnection(sqlite3.Connection):
+    """اتصال يُنشئ مؤشرات مقاسة افتراضياً"""
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+def instrument_methods(exclude: tuple = ()):
+    """مزخرف صنف يغلف كل دالة عامة بقياس زمن التنفيذ"""
+    def decorator(cls):
+        for name, attr in list(vars(cls).items()):
+            if name.startswith('_') or name in exclude or not callable(attr):
+                continue
+            setattr(cls, name, _timed(f'{cls.__name__}.{name}', attr))
+        return cls
+    return decorator
+
+def _timed(name: str, func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        failed = False
+        try:
+            return func(*args, **kwargs)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            metrics.record(name, (time.perf_counter() - start) * 1000, failed)
+    return wrapper
+
+# إنشاء مثيل مشترك من مجمع الإحصائيات
+metrics = QueryMetrics()
@@ -0,0 +1,262 @@
+"""
+محرك فحص صحة البوتات غير المتزامن
+Async Bot Health Checker
+"""
+import os
+import time
+import asyncio
+import logging
+import threading
+import multiprocessing
+from typing import Dict, Iterable, List, Optional, Tuple
+import httpx
+from config import Config
+
+logger = logging.getLogger(__name__)
+# httpx يسجل رابط كل طلب، والرابط يحتوي على توكن البوت
+logging.getLogger('httpx').setLevel(logging.WARNING)
+
+TELEGRAM_API = 'https://api.telegram.org'
+
+class AsyncHealthChecker:
+    """فحص getMe لعدد كبير من البوتات بعميل HTTP مشترك (keep-alive) وحد للتزامن ومهلة لكل طلب
+
+    يعمل على حلقة أحداث خاصة في خيط خلفي (start) أو على حلقة التطبيق نفسها (attach)،
+    وفي الحالتين يمكن استدعاء check_sync و sweep من خيوط أخرى
+    """
+
+    def __init__(self, concurrency: int = None, timeout: float = None):
+        self.concurrency = concurrency or Config.MONITOR_CONCURRENCY
+        self.timeout = timeout or Config.HEALTH_CHECK_TIMEOUT
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """تشغيل حلقة الأحداث الخاصة بالمحرك"""
+        with self._lock:
+            if self._loop is not None:
+                return
+            self._loop = asyncio.new_event_loop()
+            self._thread = threading.Thread(target=self._loop.run_forever, name='health-checker', daemon=True)
+            self._thread.start()
+        self._submit(self._open()).result()
+
+    async def attach(self):
+        """تشغيل المحرك على حلقة الأحداث الحالية بدلاً من خيط خاص"""
+        with self._lock:
+            if self._loop is not None:
+                return
+            self._loop = asyncio.get_running_loop()
+        await self._open()
+
+    async def aclose(self):
+        """إغلاق العميل من حلقة الأحداث التي يعمل عليها (وضع attach)"""
+        with self._lock:
+            self._loop = None
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _open(self):
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self._client = httpx.AsyncClient(
+            base_url=TELEGRAM_API,
+            timeout=httpx.Timeout(self.timeout),
+            limits=httpx.Limits(max_connections=self.concurrency,
+                                max_keepalive_connections=self.concurrency)
+        )
+
+    def stop(self):
+        """إغلاق العميل وإيقاف حلقة الأحداث الخاصة (في وضع attach يُستخدم aclose)"""
+        with self._lock:
+            if self._thread is None:
+                return
+            loop, self._loop = self._loop, None
+        try:
+            asyncio.run_coroutine_threadsafe(self._client.aclose(), loop).result(timeout=5)
+        except Exception as e:
+            logger.error(f"خطأ في إغلاق عميل الفحص: {e}")
+        loop.call_soon_threadsafe(loop.stop)
+        self._thread.join(timeout=5)
+        self._thread = None
+        loop.close()
+
+    def _submit(self, coro):
+        if self._loop is None:
+            self.start()
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    async def check(self, token: str) -> Tuple[str, float]:
+        """فحص بوت واحد وإرجاع (الحالة، زمن الاستجابة بالميلي ثانية)"""
+        async with self._semaphore:
+            start = time.perf_counter()
+            try:
+                # المهلة تشمل الانتظار في مجمع الاتصالات وقراءة الرد كاملاً
+                response = await asyncio.wait_for(self._client.get(f'/bot{token}/getMe'), self.timeout)
+                if response.status_code == 200:
+                    status = 'online' if response.json().get('ok') else 'error'
+                elif response.status_code == 401:
+                    # التوكن أُلغي من BotFather: حالة نهائية لا فائدة من إعادة فحصها
+                    status = 'revoked'
+                else:
+                    status = 'offline'
+            except (asyncio.TimeoutError, httpx.TimeoutException):
+                status = 'timeout'
+            except httpx.HTTPError:
+                status = 'offline'
+            except Exception as e:
+                logger.error(f"خطأ في فحص البوت: {e}")
+                status = 'error'
+            return status, round((time.perf_counter() - start) * 1000, 1)
+
+    async def check_many(self, bots: Iterable[Dict]) -> Dict[int, Tuple[str, float]]:
+        """فحص مجموعة بوتات بالتوازي وإرجاع النتائج دفعة واحدة {bot_id: (الحالة، الزمن)}"""
+        bots = list(bots)
+        results = await asyncio.gather(*(self.check(bot['token']) for bot in bots))
+        return {bot['id']: result for bot, result in zip(bots, results)}
+
+    def check_sync(self, token: str) -> Tuple[str, float]:
+        """فحص بوت واحد من كود متزامن"""
+        return self._submit(self.check(token)).result()
+
+    def sweep(self, bots: Iterable[Dict]) -> Dict[int, Tuple[str, float]]:
+        """فحص دفعة بوتات من كود متزامن (ينتظر حتى انتهاء الدفعة)"""
+        return self._submit(self.check_many(bots)).result()
+
+
+def _worker_main(conn, api: str, concurrency: int, timeout: float):
+    """عملية فحص: تستقبل دفعات {id, token} وترجع نتائجها حتى تصل None"""
+    global TELEGRAM_API
+    TELEGRAM_API = api
+    checker = AsyncHealthChecker(concurrency, timeout)
+    checker.start()
+    try:
+        while True:
+            bots = conn.recv()
+            if bots is None:
+                break
+            conn.send(checker.sweep(bots))
+    except (EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        checker.stop()
+        conn.close()
+
+class ProcessPoolHealthChecker:
+    """توزيع الفحص على عدة عمليات حسب bot_id (لكل عملية حلقة أحداث وعميل HTTP خاص بها)
+
+    الجدولة وحفظ النتائج تبقى في العملية الأم؛ العمليات تتحمل كلفة TLS وتحليل JSON.
+    التوزيع يُحسب لكل دفعة، لذا لا يحتاج إضافة البوتات أو حذفها إلى إعادة توزيع
+    """
+
+    def __init__(self, workers: int = None, concurrency: int = None, timeout: float = None):
+        self.workers = workers or Config.MONITOR_WORKERS or os.cpu_count() or 1
+        self.concurrency = concurrency or Config.MONITOR_CONCURRENCY
+        self.timeout = timeout or Config.HEALTH_CHECK_TIMEOUT
+        # spawn: العملية الأم فيها خيوط (قاعدة البيانات والمراقبة) فلا يصلح fork
+        self._context = multiprocessing.get_context('spawn')
+        self._processes: List[Optional[multiprocessing.Process]] = []
+        self._conns: list = []
+        # يُمسك طوال الدفعة لأن كل أنبوب يحمل طلباً واحداً ورده في المرة
+        self._lock = threading.Lock()
+        # فحص فوري داخل العملية الأم حتى لا ينتظر الدفعة الجارية
+        self._local = AsyncHealthChecker(concurrency=4, timeout=self.timeout)
+
+    def start(self):
+        """تشغيل عمليات الفحص"""
+        with self._lock:
+            if self._processes:
+                return
+            for index in range(self.workers):
+                self._spawn(index)
+        logger.info(f"🧵 تم تشغيل {self.workers} عملية فحص")
+
+    def _spawn(self, index: int):
+        parent_conn, child_conn = self._context.Pipe()
+        process = self._context.Process(
+            target=_worker_main, args=(child_conn, TELEGRAM_API, self.concurrency, self.timeout),
+            name=f'health-worker-{index}', daemon=True
+        )
+        process.start()
+        child_conn.close()
+        if index < len(self._processes):
+            self._processes[index], self._conns[index] = process, parent_conn
+        else:
+            self._processes.append(process)
+            self._conns.append(parent_conn)
+
+    def stop(self):
+        """إيقاف عمليات الفحص"""
+        with self._lock:
+            for conn in self._conns:
+                try:
+                    conn.send(None)
+                except OSError:
+                    pass
+            for process in self._processes:
+                process.join(timeout=5)
+                if process.is_alive():
+                    process.terminate()
+            for conn in self._conns:
+                conn.close()
+            self._processes, self._conns = [], []
+        self._local.stop()
+
+    async def attach(self):
+        await asyncio.get_running_loop().run_in_executor(None, self.start)
+
+    async def aclose(self):
+        await asyncio.get_running_loop().run_in_executor(None, self.stop)
+
+    def sweep(self, bots: Iterable[Dict]) -> Dict[int, Tuple[str, float]]:
+        """تقسيم الدفعة على العمليات حسب bot_id وانتظار نتائجها كلها
+
+        بوتات العملية التي تعطلت لا تظهر في النتائج (لم تُفحص)؛ المراقب يعيد جدولتها دون تسجيل
+        """
+        if not self._processes:
+            self.start()
+        with self._lock:
+            parts: List[List[Dict]] = [[] for _ in self._conns]
+            for bot in bots:
+                parts[bot['id'] % len(parts)].append({'id': bot['id'], 'token': bot['token']})
+
+            sent = []
+            for index, part in enumerate(parts):
+                if part:
+                    try:
+                        self._conns[index].send(part)
+                        sent.append(index)
+                    except OSError as e:
+                        logger.error(f"خطأ في إرسال دفعة لعملية الفحص {index}: {e}")
+
+            results: Dict[int, Tuple[str, float]] = {}
+            for index in sent:
+                try:
+                    results.update(self._conns[index].recv())
+                except (EOFError, OSError) as e:
+                    logger.error(f"توقفت عملية الفحص {index}: {e}")
+                    results.update(self._fail(index, parts[index]))
+            for index, part in enumerate(parts):
+                if part and index not in sent:
+                    results.update(self._fail(index, part))
+            return results
+
+    def _fail(self, index: int, part: List[Dict]) -> Dict[int, Tuple[str, float]]:
+        """إعادة تشغيل عملية تعطل اتصالها؛ دفعتها بلا نتائج لأن التعطل لا يخبر بشيء عن البوتات"""
+        process = self._processes[index]
+        if process.is_alive():
+            process.terminate()
+        process.join(timeout=1)
+        self._conns[index].close()
+        self._spawn(index)
+        logger.warning(f"⚠️ لم تُفحص {len(part)} بوت بسبب تعطل عملية الفحص {index}")
+        return {}
+
+    async def check_many(self, bots: Iterable[Dict]) -> Dict[int, Tuple[str, float]]:
+        return await asyncio.get_running_loop().run_in_executor(None, self.sweep, list(bots))
+
+    def check_sync(self, token: str) -> Tuple[str, float]:
+        return self._local.check_sync(token)
@@ -0,0 +1,182 @@
+"""
+سجل صحة البوتات: فحوصات خام مع تجميع بالدقيقة والساعة واليوم
+Bot Health History (time series with downsampling)
+"""
+import math
+import logging
+from typing import Dict, Iterable, List, Optional, Tuple
+from config import Config
+from database_manager import db, now_ts
+
+logger = logging.getLogger(__name__)
+
+# ترميز الحالات في الجدول الخام
+STATUS_CODES = {'online': 0, 'timeout': 1, 'offline': 2, 'error': 3, 'revoked': 4, 'stalled': 5}
+
+# دقات التجميع بالثواني
+MINUTE, HOUR, DAY = 60, 3600, 86400
+RESOLUTIONS = (MINUTE, HOUR, DAY)
+
+# حدود مدرج زمن getMe بالميلي ثانية (الخانة الأخيرة لما يتجاوز الحد الأخير)
+LATENCY_BUCKETS_MS = (50, 100, 200, 500, 1000, 2000, 5000)
+HISTOGRAM_COLUMNS = tuple(f'h{i}' for i in range(len(LATENCY_BUCKETS_MS) + 1))
+
+# bot_id المحجوز لمجموع الأسطول
+FLEET = 0
+
+ROLLUP_UPSERT_SQL = f'''
+    INSERT INTO health_rollups (resolution, bot_id, bucket, checks, ok, latency_sum,
+                                {', '.join(HISTOGRAM_COLUMNS)})
+    VALUES (?, ?, ?, ?, ?, ?, {', '.join('?' * len(HISTOGRAM_COLUMNS))})
+    ON CONFLICT(resolution, bot_id, bucket) DO UPDATE SET
+        checks = checks + excluded.checks,
+        ok = ok + excluded.ok,
+        latency_sum = latency_sum + excluded.latency_sum,
+        {', '.join(f'{h} = {h} + excluded.{h}' for h in HISTOGRAM_COLUMNS)}
+'''
+
+SUMMARY_COLUMNS = (
+    'SUM(checks) AS checks, SUM(ok) AS ok, SUM(latency_sum) AS latency_sum, '
+    + ', '.join(f'SUM({h}) AS {h}' for h in HISTOGRAM_COLUMNS)
+)
+
+def _latency_bucket(latency_ms: float) -> int:
+    for i, bound in enumerate(LATENCY_BUCKETS_MS):
+        if latency_ms <= bound:
+            return i
+    return len(LATENCY_BUCKETS_MS)
+
+def _percentile(histogram: List[int], pct: float) -> Optional[float]:
+    """تقدير نسبة مئوية من المدرج (الحد الأعلى للخانة، وinf لخانة ما فوق آخر حد)"""
+    total = sum(histogram)
+    if not total:
+        return None
+    target = total * pct / 100
+    seen = 0
+    for i, count in enumerate(histogram):
+        seen += count
+        if seen >= target:
+            break
+    return float(LATENCY_BUCKETS_MS[i]) if i < len(LATENCY_BUCKETS_MS) else math.inf
+
+def format_latency(bound: float) -> str:
+    """عرض حد الخانة: ≤200ms، أو >5000ms لخانة ما فوق آخر حد"""
+    if math.isinf(bound):
+        return f">{LATENCY_BUCKETS_MS[-1]}ms"
+    return f"≤{bound:g}ms"
+
+def _resolution_for(hours: float) -> int:
+    """أخشن دقة تكفي للنافذة الزمنية (عدد صفوف أقل لكل استعلام)"""
+    if hours <= 6:
+        return MINUTE
+    if hours <= 24 * 14:
+        return HOUR
+    return DAY
+
+class HealthHistory:
+    """تخزين نتائج الفحص وتجميعها واستعلامات التوفر وزمن الاستجابة"""
+
+    def record_batch(self, results: Iterable[Tuple[int, str, Optional[float]]], ts: int = None) -> int:
+        """حفظ دفعة نتائج (bot_id، الحالة، الزمن أو None) وتحديث التجميعات في معاملة واحدة
+
+        فحص ثانٍ للبوت نفسه في الثانية نفسها يُتجاهل في الخام والتجميعات معاً حتى لا تختلف أعدادهما
+        """
+        ts = ts or now_ts()
+        results = list(results)
+        if not results:
+            return 0
+        try:
+            with db.get_connection() as conn:
+                inserted = []
+                for bot_id, status, latency_ms in results:
+                    cursor = conn.execute('INSERT OR IGNORE INTO health_checks VALUES (?, ?, ?, ?)', (
+                        ts, bot_id, STATUS_CODES.get(status, STATUS_CODES['error']), int(latency_ms or 0)
+                    ))
+                    if cursor.rowcount == 1:
+                        inserted.append((bot_id, status, latency_ms))
+                rollups = self._rollups(inserted, ts)
+                conn.executemany(ROLLUP_UPSERT_SQL, [key + tuple(row) for key, row in rollups.items()])
+                conn.commit()
+            return len(inserted)
+        except Exception as e:
+            logger.error(f"خطأ في حفظ سجل الفحوصات: {e}")
+            return 0
+
+    @staticmethod
+    def _rollups(results: List[Tuple[int, str, Optional[float]]], ts: int) -> Dict[Tuple[int, int, int], list]:
+        """تجميع نتائج الدفعة لكل (الدقة، البوت أو الأسطول، الخانة الزمنية)"""
+        rollups: Dict[Tuple[int, int, int], list] = {}
+        for bot_id, status, latency_ms in results:
+            ok = status == 'online'
+            for resolution in RESOLUTIONS:
+                bucket = ts - ts % resolution
+                for target in (bot_id, FLEET):
+                    row = rollups.get((resolution, target, bucket))
+                    if row is None:
+                        row = rollups[(resolution, target, bucket)] = [0, 0, 0] + [0] * len(HISTOGRAM_COLUMNS)
+                    row[0] += 1
+                    if ok:
+                        row[1] += 1
+                        # نتائج النبض بلا زمن getMe: تُحسب في التوفر فقط
+                        if latency_ms is not None:
+                            row[2] += int(latency_ms)
+                            row[3 + _latency_bucket(latency_ms)] += 1
+        return rollups
+
+    def get_summary(self, bot_id: int = FLEET, hours: float = 24) -> Dict:
+        """التوفر وزمن الاستجابة (p50/p95/المتوسط) لبوت أو للأسطول كاملاً (bot_id = 0)"""
+        resolution = _resolution_for(hours)
+        since = now_ts() - int(hours * 3600)
+        since -= since % resolution
+        try:
+            with db.get_connection() as conn:
+                row = conn.execute(f'''
+                    SELECT {SUMMARY_COLUMNS} FROM health_rollups
+                    WHERE resolution = ? AND bot_id = ? AND bucket >= ?
+                ''', (resolution, bot_id, since)).fetchone()
+        except Exception as e:
+            logger.error(f"خطأ في الحصول على سجل صحة البوت {bot_id}: {e}")
+            row = None
+
+        if not row or not row['checks']:
+            return {'checks': 0, 'uptime': None, 'p50_ms': None, 'p95_ms': None, 'avg_ms': None}
+
+        histogram = [row[h] for h in HISTOGRAM_COLUMNS]
+        return {
+            'checks': row['checks'],
+            'uptime': round(row['ok'] / row['checks'] * 100, 2),
+            'p50_ms': _percentile(histogram, 50),
+            'p95_ms': _percentile(histogram, 95),
+            'avg_ms': round(row['latency_sum'] / sum(histogram), 1) if sum(histogram) else None
+        }
+
+    def get_uptime(self, bot_id: int, hours: float = 24) -> Optional[float]:
+        """نسبة التوفر المئوية لبوت خلال آخر hours ساعة"""
+        return self.get_summary(bot_id, hours)['uptime']
+
+    def get_fleet_availability(self, hours: float = 24) -> Optional[float]:
+        """نسبة الفحوصات الناجحة لكل البوتات خلال آخر hours ساعة"""
+        return self.get_summary(FLEET, hours)['uptime']
+
+    def prune(self) -> Dict[str, int]:
+        """حذف الفحوصات الخام والتجميعات الأقدم من مدد الاحتفاظ"""
+        now = now_ts()
+        retention = {
+            MINUTE: Config.HEALTH_MINUTE_RETENTION_DAYS * DAY,
+            HOUR: Config.HEALTH_HOUR_RETENTION_DAYS * DAY,
+            DAY: Config.HEALTH_DAY_RETENTION_DAYS * DAY,
+        }
+        removed = {}
+        with db.get_connection() as conn:
+            cursor = conn.execute('DELETE FROM health_checks WHERE ts < ?',
+                                  (now - Config.HEALTH_RAW_RETENTION_HOURS * 3600,))
+            removed['raw'] = cursor.rowcount
+            for resolution, keep in retention.items():
+                cursor = conn.execute('DELETE FROM health_rollups WHERE resolution = ? AND bucket < ?',
+                                      (resolution, now - keep))
+                removed[str(resolution)] = cursor.rowcount
+            conn.commit()
+        return removed
+
+# إنشاء مثيل مشترك من سجل الصحة
+health_history = HealthHistory()
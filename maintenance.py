@@ -0,0 +1,82 @@
+"""
+مهام الصيانة الدورية لمصنع البوتات
+Periodic Maintenance Jobs for Bot Factory
+"""
+import time
+import logging
+import threading
+import schedule
+from database_manager import db
+from backup_manager import backup_manager
+from analytics_replica import analytics_replica
+from health_history import health_history
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+class MaintenanceScheduler:
+    """جدولة مهام الصيانة (ضغط السجلات والنسخ الاحتياطي وتحديث نسخة التحليلات) في خيط خلفي"""
+
+    def __init__(self):
+        self.scheduler = schedule.Scheduler()
+        self.running = False
+        self.thread = None
+        self._stop_event = threading.Event()
+        self._register_jobs()
+
+    def _register_jobs(self):
+        """تسجيل المهام الدورية"""
+        self.scheduler.every().day.at(Config.MAINTENANCE_TIME).do(
+            self._run_job, 'compact_activity_log', db.compact_activity_log
+        )
+        self.scheduler.every(Config.BACKUP_INTERVAL_HOURS).hours.do(
+            self._run_job, 'backup', backup_manager.create_backup
+        )
+        self.scheduler.every().hour.do(
+            self._run_job, 'prune_health_history', health_history.prune
+        )
+        if analytics_replica.enabled:
+            self.scheduler.every(Config.ANALYTICS_REFRESH_SECONDS).seconds.do(
+                self._run_job, 'refresh_analytics', analytics_replica.refresh
+            )
+
+    def _run_job(self, name: str, job, *args, **kwargs):
+        """تشغيل مهمة مع تسجيل مدتها وعزل أخطائها"""
+        start = time.monotonic()
+        try:
+            result = job(*args, **kwargs)
+            logger.info(f"🛠️ اكتملت مهمة الصيانة {name} في {time.monotonic() - start:.1f} ثانية: {result}")
+        except Exception as e:
+            logger.error(f"خطأ في مهمة الصيانة {name}: {e}")
+
+    def start(self):
+        """بدء خيط الصيانة"""
+        if self.running:
+            return
+        self.running = True
+        self._stop_event.clear()
+        self.thread = threading.Thread(target=self._loop, name='maintenance', daemon=True)
+        self.thread.start()
+        logger.info("🛠️ تم بدء مهام الصيانة الدورية")
+
+    def stop(self):
+        """إيقاف خيط الصيانة"""
+        self.running = False
+        self._stop_event.set()
+        if self.thread:
+            self.thread.join(timeout=5)
+        logger.info("⏹️ تم إيقاف مهام الصيانة الدورية")
+
+    def run_now(self, name: str = None):
+        """تشغيل جميع المهام (أو مهمة محددة) فوراً"""
+        for job in self.scheduler.get_jobs():
+            if name is None or job.job_func.args[0] == name:
+                job.run()
+
+    def _loop(self):
+        while self.running:
+            self.scheduler.run_pending()
+            self._stop_event.wait(min(60, max(1, self.scheduler.idle_seconds or 60)))
+
+# إنشاء مثيل مشترك من مجدول الصيانة
+maintenance = MaintenanceScheduler()
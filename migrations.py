@@ -0,0 +1,660 @@
+"""
+ترحيل مخطط قاعدة البيانات
+Database Schema Migrations
+"""
+import sys
+import sqlite3
+import datetime
+import logging
+import argparse
+from typing import Callable, List, Set, Tuple
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+def _migration_001_initial_schema(cursor: sqlite3.Cursor):
+    """المخطط الأساسي (يتوافق مع قواعد البيانات الموجودة مسبقاً)"""
+    # جدول البوتات المحسن
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS bots (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            owner_id INTEGER NOT NULL,
+            token TEXT NOT NULL UNIQUE,
+            bot_username TEXT,
+            bot_name TEXT,
+            date_created TEXT NOT NULL,
+            last_active TEXT,
+            status TEXT NOT NULL DEFAULT 'active',
+            total_users INTEGER DEFAULT 0,
+            total_messages INTEGER DEFAULT 0,
+            settings TEXT DEFAULT '{}',
+            FOREIGN KEY (owner_id) REFERENCES users (user_id)
+        )
+    ''')
+
+    # جدول المستخدمين
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            user_id INTEGER PRIMARY KEY,
+            username TEXT,
+            first_name TEXT,
+            last_name TEXT,
+            date_joined TEXT NOT NULL,
+            last_seen TEXT,
+            bot_limit INTEGER DEFAULT 3,
+            is_premium BOOLEAN DEFAULT FALSE,
+            total_bots_created INTEGER DEFAULT 0
+        )
+    ''')
+
+    # جدول إحصائيات البوتات
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS bot_stats (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            bot_id INTEGER NOT NULL,
+            date TEXT NOT NULL,
+            messages_count INTEGER DEFAULT 0,
+            users_count INTEGER DEFAULT 0,
+            groups_count INTEGER DEFAULT 0,
+            FOREIGN KEY (bot_id) REFERENCES bots (id)
+        )
+    ''')
+
+    # جدول مستخدمي البوتات المصنوعة
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS bot_users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            bot_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            username TEXT,
+            first_name TEXT,
+            chat_type TEXT,
+            date_joined TEXT NOT NULL,
+            last_interaction TEXT,
+            message_count INTEGER DEFAULT 0,
+            FOREIGN KEY (bot_id) REFERENCES bots (id),
+            UNIQUE(bot_id, user_id)
+        )
+    ''')
+
+    # جدول الإذاعات
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS broadcasts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            sender_id INTEGER NOT NULL,
+            message_text TEXT NOT NULL,
+            target_type TEXT NOT NULL,
+            date_sent TEXT NOT NULL,
+            total_sent INTEGER DEFAULT 0,
+            total_failed INTEGER DEFAULT 0,
+            status TEXT DEFAULT 'pending'
+        )
+    ''')
+
+    # جدول سجل الأنشطة
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS activity_log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            action TEXT NOT NULL,
+            details TEXT,
+            timestamp TEXT NOT NULL,
+            ip_address TEXT
+        )
+    ''')
+
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_bots_owner ON bots(owner_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_bots_status ON bots(status)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_bot_users_bot ON bot_users(bot_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_activity_user ON activity_log(user_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_activity_timestamp ON activity_log(timestamp)')
+
+def _migration_002_bot_stats_unique_day(cursor: sqlite3.Cursor):
+    """دمج الصفوف المكررة في bot_stats وإضافة قيد التفرد (bot_id, date)"""
+    # جمع رسائل الأيام المكررة في أقدم صف ثم حذف البقية
+    cursor.execute('''
+        UPDATE bot_stats SET messages_count = (
+            SELECT SUM(s.messages_count) FROM bot_stats s
+            WHERE s.bot_id = bot_stats.bot_id AND s.date = bot_stats.date
+        )
+        WHERE id IN (
+            SELECT MIN(id) FROM bot_stats
+            GROUP BY bot_id, date HAVING COUNT(*) > 1
+        )
+    ''')
+    cursor.execute('''
+        DELETE FROM bot_stats WHERE id NOT IN (
+            SELECT MIN(id) FROM bot_stats GROUP BY bot_id, date
+        )
+    ''')
+    cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_bot_stats_bot_date ON bot_stats(bot_id, date)')
+
+def _migration_003_query_indexes(cursor: sqlite3.Cursor):
+    """فهارس مطابقة لأنماط الاستعلامات الفعلية"""
+    # count_user_bots / get_user_bots: (owner_id, status) مرتبة بتاريخ الإنشاء
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_bots_owner_status ON bots(owner_id, status, date_created)')
+    cursor.execute('DROP INDEX IF EXISTS idx_bots_owner')
+
+    # get_top_performing_bots: البوتات النشطة مرتبة بعدد الرسائل
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_bots_status_messages ON bots(status, total_messages)')
+    cursor.execute('DROP INDEX IF EXISTS idx_bots_status')
+
+    # get_all_bots: الترتيب بتاريخ الإنشاء
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_bots_created ON bots(date_created)')
+
+    # get_bot_users: مستخدمو البوت مرتبين بآخر تفاعل
+    # (القيد UNIQUE(bot_id, user_id) يغني عن فهرس bot_id المنفرد)
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_bot_users_bot_interaction ON bot_users(bot_id, last_interaction)')
+    cursor.execute('DROP INDEX IF EXISTS idx_bot_users_bot')
+
+def _migration_004_system_counters(cursor: sqlite3.Cursor):
+    """عدادات النظام المحدثة تلقائياً عبر المشغلات (triggers)"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS system_counters (
+            name TEXT PRIMARY KEY,
+            value INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+    ''')
+
+    # القيم الابتدائية من البيانات الحالية (مسح كامل لمرة واحدة فقط)
+    cursor.execute('''
+        INSERT OR REPLACE INTO system_counters (name, value)
+        SELECT 'active_bots', COUNT(*) FROM bots WHERE status = 'active'
+        UNION ALL
+        SELECT 'total_users', COUNT(*) FROM users
+        UNION ALL
+        SELECT 'active_messages', COALESCE(SUM(total_messages), 0) FROM bots WHERE status = 'active'
+        UNION ALL
+        SELECT 'active_bot_users', COALESCE(SUM(total_users), 0) FROM bots WHERE status = 'active'
+    ''')
+
+    _create_counter_triggers(cursor)
+
+def _create_counter_triggers(cursor: sqlite3.Cursor):
+    """مشغلات تحديث system_counters (تُعاد عند إعادة بناء جداول bots و users)"""
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_counters_bots_insert
+        AFTER INSERT ON bots WHEN NEW.status = 'active'
+        BEGIN
+            UPDATE system_counters SET value = value + CASE name
+                WHEN 'active_bots' THEN 1
+                WHEN 'active_messages' THEN COALESCE(NEW.total_messages, 0)
+                WHEN 'active_bot_users' THEN COALESCE(NEW.total_users, 0)
+            END
+            WHERE name IN ('active_bots', 'active_messages', 'active_bot_users');
+        END
+    ''')
+
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_counters_bots_delete
+        AFTER DELETE ON bots WHEN OLD.status = 'active'
+        BEGIN
+            UPDATE system_counters SET value = value - CASE name
+                WHEN 'active_bots' THEN 1
+                WHEN 'active_messages' THEN COALESCE(OLD.total_messages, 0)
+                WHEN 'active_bot_users' THEN COALESCE(OLD.total_users, 0)
+            END
+            WHERE name IN ('active_bots', 'active_messages', 'active_bot_users');
+        END
+    ''')
+
+    # أي تغيير في الحالة أو المجاميع يُطرح أثره القديم ويُضاف الجديد
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_counters_bots_update
+        AFTER UPDATE OF status, total_messages, total_users ON bots
+        WHEN OLD.status IS NOT NEW.status
+          OR OLD.total_messages IS NOT NEW.total_messages
+          OR OLD.total_users IS NOT NEW.total_users
+        BEGIN
+            UPDATE system_counters SET value = value + CASE name
+                WHEN 'active_bots' THEN
+                    (NEW.status = 'active') - (OLD.status = 'active')
+                WHEN 'active_messages' THEN
+                    (CASE WHEN NEW.status = 'active' THEN COALESCE(NEW.total_messages, 0) ELSE 0 END)
+                  - (CASE WHEN OLD.status = 'active' THEN COALESCE(OLD.total_messages, 0) ELSE 0 END)
+                WHEN 'active_bot_users' THEN
+                    (CASE WHEN NEW.status = 'active' THEN COALESCE(NEW.total_users, 0) ELSE 0 END)
+                  - (CASE WHEN OLD.status = 'active' THEN COALESCE(OLD.total_users, 0) ELSE 0 END)
+            END
+            WHERE name IN ('active_bots', 'active_messages', 'active_bot_users');
+        END
+    ''')
+
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_counters_users_insert
+        AFTER INSERT ON users
+        BEGIN
+            UPDATE system_counters SET value = value + 1 WHERE name = 'total_users';
+        END
+    ''')
+
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_counters_users_delete
+        AFTER DELETE ON users
+        BEGIN
+            UPDATE system_counters SET value = value - 1 WHERE name = 'total_users';
+        END
+    ''')
+
+def _migration_005_recount_bot_users(cursor: sqlite3.Cursor):
+    """إعادة حساب total_users مرة واحدة قبل الاعتماد على التحديث التدريجي"""
+    cursor.execute('''
+        UPDATE bots SET total_users = (
+            SELECT COUNT(*) FROM bot_users WHERE bot_users.bot_id = bots.id
+        )
+    ''')
+
+def _migration_006_keyset_indexes(cursor: sqlite3.Cursor):
+    """فهرس الترقيم بالمفتاح للبوتات حسب الحالة"""
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_bots_status_id ON bots(status, id)')
+
+def _epoch(column: str) -> str:
+    """تعبير SQL يحول نص ISO بالتوقيت المحلي إلى ثوانٍ منذ epoch"""
+    return (
+        f"CASE WHEN typeof({column}) = 'integer' THEN {column} "
+        f"ELSE CAST(strftime('%s', {column}, 'utc') AS INTEGER) END"
+    )
+
+def _epoch_not_null(column: str) -> str:
+    return f"COALESCE({_epoch(column)}, CAST(strftime('%s', 'now') AS INTEGER))"
+
+def _migration_007_epoch_timestamps(cursor: sqlite3.Cursor):
+    """تحويل أعمدة الوقت من نصوص ISO إلى أعداد صحيحة (ثوانٍ منذ epoch)
+
+    ترحيل غير متصل (offline): يعيد بناء ستة جداول في معاملة واحدة ويمسك قفل الكتابة طوال النسخ،
+    فلا يُطبق تلقائياً على قاعدة بيانات فيها صفوف (انظر OFFLINE_MIGRATIONS وREADME)
+    """
+    # SQLite لا يدعم تغيير نوع العمود، لذا يُعاد بناء كل جدول ثم تُعاد الفهارس والمشغلات
+    cursor.execute('''
+        CREATE TABLE bots_new (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            owner_id INTEGER NOT NULL,
+            token TEXT NOT NULL UNIQUE,
+            bot_username TEXT,
+            bot_name TEXT,
+            date_created INTEGER NOT NULL,
+            last_active INTEGER,
+            status TEXT NOT NULL DEFAULT 'active',
+            total_users INTEGER DEFAULT 0,
+            total_messages INTEGER DEFAULT 0,
+            settings TEXT DEFAULT '{}',
+            FOREIGN KEY (owner_id) REFERENCES users (user_id)
+        )
+    ''')
+    cursor.execute(f'''
+        INSERT INTO bots_new
+        SELECT id, owner_id, token, bot_username, bot_name,
+               {_epoch_not_null('date_created')}, {_epoch('last_active')},
+               status, total_users, total_messages, settings
+        FROM bots
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE users_new (
+            user_id INTEGER PRIMARY KEY,
+            username TEXT,
+            first_name TEXT,
+            last_name TEXT,
+            date_joined INTEGER NOT NULL,
+            last_seen INTEGER,
+            bot_limit INTEGER DEFAULT 3,
+            is_premium BOOLEAN DEFAULT FALSE,
+            total_bots_created INTEGER DEFAULT 0
+        )
+    ''')
+    cursor.execute(f'''
+        INSERT INTO users_new
+        SELECT user_id, username, first_name, last_name,
+               {_epoch_not_null('date_joined')}, {_epoch('last_seen')},
+               bot_limit, is_premium, total_bots_created
+        FROM users
+    ''')
+
+    # bot_stats.date أصبح بداية اليوم (منتصف الليل المحلي) بالثواني
+    cursor.execute('''
+        CREATE TABLE bot_stats_new (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            bot_id INTEGER NOT NULL,
+            date INTEGER NOT NULL,
+            messages_count INTEGER DEFAULT 0,
+            users_count INTEGER DEFAULT 0,
+            groups_count INTEGER DEFAULT 0,
+            FOREIGN KEY (bot_id) REFERENCES bots (id)
+        )
+    ''')
+    cursor.execute(f'''
+        INSERT INTO bot_stats_new
+        SELECT id, bot_id, {_epoch_not_null('date')},
+               messages_count, users_count, groups_count
+        FROM bot_stats
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE bot_users_new (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            bot_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            username TEXT,
+            first_name TEXT,
+            chat_type TEXT,
+            date_joined INTEGER NOT NULL,
+            last_interaction INTEGER,
+            message_count INTEGER DEFAULT 0,
+            FOREIGN KEY (bot_id) REFERENCES bots (id),
+            UNIQUE(bot_id, user_id)
+        )
+    ''')
+    cursor.execute(f'''
+        INSERT INTO bot_users_new
+        SELECT id, bot_id, user_id, username, first_name, chat_type,
+               {_epoch_not_null('date_joined')}, {_epoch('last_interaction')}, message_count
+        FROM bot_users
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE broadcasts_new (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            sender_id INTEGER NOT NULL,
+            message_text TEXT NOT NULL,
+            target_type TEXT NOT NULL,
+            date_sent INTEGER NOT NULL,
+            total_sent INTEGER DEFAULT 0,
+            total_failed INTEGER DEFAULT 0,
+            status TEXT DEFAULT 'pending'
+        )
+    ''')
+    cursor.execute(f'''
+        INSERT INTO broadcasts_new
+        SELECT id, sender_id, message_text, target_type, {_epoch_not_null('date_sent')},
+               total_sent, total_failed, status
+        FROM broadcasts
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE activity_log_new (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            action TEXT NOT NULL,
+            details TEXT,
+            timestamp INTEGER NOT NULL,
+            ip_address TEXT
+        )
+    ''')
+    cursor.execute(f'''
+        INSERT INTO activity_log_new
+        SELECT id, user_id, action, details, {_epoch_not_null('timestamp')}, ip_address
+        FROM activity_log
+    ''')
+
+    for table in ('bots', 'users', 'bot_stats', 'bot_users', 'broadcasts', 'activity_log'):
+        cursor.execute(f'DROP TABLE {table}')
+        cursor.execute(f'ALTER TABLE {table}_new RENAME TO {table}')
+
+    # الفهارس: أعمدة مركبة تناسب استعلامات النطاق الزمني
+    cursor.execute('CREATE INDEX idx_bots_owner_status ON bots(owner_id, status, date_created)')
+    cursor.execute('CREATE INDEX idx_bots_status_messages ON bots(status, total_messages)')
+    cursor.execute('CREATE INDEX idx_bots_created ON bots(date_created)')
+    cursor.execute('CREATE INDEX idx_bots_status_id ON bots(status, id)')
+    cursor.execute('CREATE UNIQUE INDEX idx_bot_stats_bot_date ON bot_stats(bot_id, date)')
+    cursor.execute('CREATE INDEX idx_bot_users_bot_interaction ON bot_users(bot_id, last_interaction)')
+    cursor.execute('CREATE INDEX idx_activity_user_time ON activity_log(user_id, timestamp)')
+    cursor.execute('CREATE INDEX idx_activity_timestamp ON activity_log(timestamp)')
+
+    _create_counter_triggers(cursor)
+
+def _migration_008_activity_rollups(cursor: sqlite3.Cursor):
+    """جدول التجميع اليومي لسجل الأنشطة القديم"""
+    # user_id = 0 للأنشطة التي ليس لها مستخدم
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS activity_daily (
+            day INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            action TEXT NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, user_id, action)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_activity_daily_user ON activity_daily(user_id, day)')
+
+def _migration_009_health_history(cursor: sqlite3.Cursor):
+    """سجل فحوصات صحة البوتات وتجميعاتها الزمنية"""
+    # الفحوصات الخام مرتبة بالوقت (حذف القديم يكون نطاقاً متصلاً)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS health_checks (
+            ts INTEGER NOT NULL,
+            bot_id INTEGER NOT NULL,
+            status INTEGER NOT NULL,
+            latency_ms INTEGER NOT NULL,
+            PRIMARY KEY (ts, bot_id)
+        ) WITHOUT ROWID
+    ''')
+
+    # resolution بالثواني (60 / 3600 / 86400)، و bot_id = 0 لمجموع الأسطول
+    # h0..h7 مدرج زمن الاستجابة للفحوصات الناجحة
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS health_rollups (
+            resolution INTEGER NOT NULL,
+            bot_id INTEGER NOT NULL,
+            bucket INTEGER NOT NULL,
+            checks INTEGER NOT NULL DEFAULT 0,
+            ok INTEGER NOT NULL DEFAULT 0,
+            latency_sum INTEGER NOT NULL DEFAULT 0,
+            h0 INTEGER NOT NULL DEFAULT 0,
+            h1 INTEGER NOT NULL DEFAULT 0,
+            h2 INTEGER NOT NULL DEFAULT 0,
+            h3 INTEGER NOT NULL DEFAULT 0,
+            h4 INTEGER NOT NULL DEFAULT 0,
+            h5 INTEGER NOT NULL DEFAULT 0,
+            h6 INTEGER NOT NULL DEFAULT 0,
+            h7 INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (resolution, bot_id, bucket)
+        ) WITHOUT ROWID
+    ''')
+
+def _migration_010_bot_outages(cursor: sqlite3.Cursor):
+    """سجل انقطاعات البوتات (صف لكل انقطاع بدلاً من صف لكل فحص)"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS bot_outages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            bot_id INTEGER NOT NULL,
+            started_at INTEGER NOT NULL,
+            ended_at INTEGER,
+            duration_seconds INTEGER,
+            failed_checks INTEGER NOT NULL DEFAULT 0,
+            last_status TEXT
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_bot_outages_bot ON bot_outages(bot_id, started_at)')
+    # الانقطاعات المفتوحة تُحمّل عند بدء المراقبة
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_bot_outages_open ON bot_outages(bot_id) WHERE ended_at IS NULL')
+
+def _migration_011_bot_heartbeats(cursor: sqlite3.Cursor):
+    """آخر نبض من كل بوت مستضاف (صف واحد لكل بوت يُحدَّث في مكانه)"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS bot_heartbeats (
+            bot_id INTEGER PRIMARY KEY,
+            ts INTEGER NOT NULL,
+            started_at INTEGER NOT NULL,
+            last_poll_at INTEGER,
+            last_update_at INTEGER,
+            update_lag_ms INTEGER,
+            messages_count INTEGER NOT NULL DEFAULT 0,
+            users_count INTEGER NOT NULL DEFAULT 0,
+            groups_count INTEGER NOT NULL DEFAULT 0,
+            pid INTEGER
+        ) WITHOUT ROWID
+    ''')
+
+# قائمة الترحيلات المرتبة: (الإصدار، الوصف، الدالة)
+MIGRATIONS: List[Tuple[int, str, Callable[[sqlite3.Cursor], None]]] = [
+    (1, 'initial schema', _migration_001_initial_schema),
+    (2, 'unique bot_stats (bot_id, date)', _migration_002_bot_stats_unique_day),
+    (3, 'query pattern indexes', _migration_003_query_indexes),
+    (4, 'system counters', _migration_004_system_counters),
+    (5, 'recount bots.total_users', _migration_005_recount_bot_users),
+    (6, 'keyset pagination indexes', _migration_006_keyset_indexes),
+    (7, 'integer epoch timestamps', _migration_007_epoch_timestamps),
+    (8, 'activity daily rollups', _migration_008_activity_rollups),
+    (9, 'health history', _migration_009_health_history),
+    (10, 'bot outages', _migration_010_bot_outages),
+    (11, 'bot heartbeats', _migration_011_bot_heartbeats),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+# ترحيلات تعيد بناء جداول كبيرة وتقفل الكتابة حتى تنتهي؛ ليست آمنة مع كتّاب آخرين نشطين.
+# الإصدار -> الجداول التي يعيد كتابتها؛ إن كانت فيها صفوف لا يُطبق إلا بخطوة صريحة (--offline)
+OFFLINE_MIGRATIONS = {
+    7: ('bots', 'users', 'bot_stats', 'bot_users', 'broadcasts', 'activity_log'),
+}
+
+def _shard_migration_001_schema(cursor: sqlite3.Cursor):
+    """مخطط ملف جزء: جداول البوتات الكبيرة فقط (جدول bots يبقى في الملف الأساسي)"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS bot_users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            bot_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            username TEXT,
+            first_name TEXT,
+            chat_type TEXT,
+            date_joined INTEGER NOT NULL,
+            last_interaction INTEGER,
+            message_count INTEGER DEFAULT 0,
+            UNIQUE(bot_id, user_id)
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS bot_stats (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            bot_id INTEGER NOT NULL,
+            date INTEGER NOT NULL,
+            messages_count INTEGER DEFAULT 0,
+            users_count INTEGER DEFAULT 0,
+            groups_count INTEGER DEFAULT 0
+        )
+    ''')
+    cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_bot_stats_bot_date ON bot_stats(bot_id, date)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_bot_users_bot_interaction ON bot_users(bot_id, last_interaction)')
+
+# ترحيلات ملفات الأجزاء (إصداراتها مستقلة عن الملف الأساسي)
+SHARD_MIGRATIONS: List[Tuple[int, str, Callable[[sqlite3.Cursor], None]]] = [
+    (1, 'shard schema', _shard_migration_001_schema),
+]
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    """الحصول على إصدار المخطط الحالي"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT,
+            applied_at TEXT NOT NULL
+        )
+    ''')
+    row = conn.execute('SELECT MAX(version) FROM schema_version').fetchone()
+    return row[0] or 0
+
+def get_applied_versions(conn: sqlite3.Connection) -> Set[int]:
+    """إصدارات الترحيلات المطبقة (قد يكون فيها فراغ لترحيل غير متصل مؤجل)"""
+    get_schema_version(conn)
+    return {row[0] for row in conn.execute('SELECT version FROM schema_version')}
+
+def _has_rows(conn: sqlite3.Connection, tables: Tuple[str, ...]) -> bool:
+    """هل في أي من الجداول صفوف سيعيد الترحيل كتابتها"""
+    for table in tables:
+        try:
+            if conn.execute(f'SELECT 1 FROM {table} LIMIT 1').fetchone():
+                return True
+        except sqlite3.OperationalError:
+            # الجدول غير موجود بعد
+            continue
+    return False
+
+def pending_offline_migrations(conn: sqlite3.Connection) -> List[int]:
+    """الترحيلات غير المتصلة المؤجلة على هذه القاعدة"""
+    applied = get_applied_versions(conn)
+    return [version for version in sorted(OFFLINE_MIGRATIONS) if version not in applied]
+
+def enable_incremental_vacuum(conn: sqlite3.Connection) -> bool:
+    """تفعيل auto_vacuum=INCREMENTAL على قاعدة موجودة (خطوة غير متصلة: VACUUM كامل يعيد كتابة الملف)
+
+    الإعداد في ConnectionPool يسري على القواعد الجديدة فقط؛ ترجع True إن أُعيد بناء الملف
+    """
+    if conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 2:
+        return False
+    logger.warning("⏳ تفعيل التفريغ التدريجي: VACUUM كامل يعيد كتابة قاعدة البيانات ويقفلها حتى ينتهي")
+    conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
+    conn.execute('VACUUM')
+    return True
+
+def apply_migrations(conn: sqlite3.Connection, migrations=None, offline: bool = False) -> int:
+    """تطبيق الترحيلات المعلقة بالترتيب، كل ترحيل في معاملة مستقلة
+
+    الترحيلات غير المتصلة تُؤجل إن كانت ستعيد كتابة صفوف موجودة، إلا مع offline=True
+    (python migrations.py --offline أو DB_OFFLINE_MIGRATIONS=true)؛ بقية الترحيلات لا تعتمد عليها
+    """
+    migrations = migrations or MIGRATIONS
+    applied = get_applied_versions(conn)
+    if all(version in applied for version, _, _ in migrations):
+        return get_schema_version(conn)
+
+    for version, description, migrate in migrations:
+        if version in applied:
+            continue
+
+        # قفل الكتابة ثم إعادة التحقق في حال سبقتنا عملية أخرى
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            if version in get_applied_versions(conn):
+                conn.rollback()
+                continue
+
+            if migrations is MIGRATIONS and version in OFFLINE_MIGRATIONS \
+                    and _has_rows(conn, OFFLINE_MIGRATIONS[version]):
+                if not offline:
+                    conn.rollback()
+                    logger.warning(f"⏸️ ترحيل {version} ({description}) مؤجل: يعيد كتابة بيانات موجودة؛ "
+                                   f"أوقف المصنع والبوتات المستضافة ثم شغّل python migrations.py --offline")
+                    continue
+                logger.warning(f"⏳ ترحيل {version} ({description}) يعيد كتابة الصفوف الموجودة "
+                               f"ويقفل الكتابة حتى ينتهي")
+            migrate(conn.cursor())
+            conn.execute(
+                'INSERT INTO schema_version (version, description, applied_at) VALUES (?, ?, ?)',
+                (version, description, datetime.datetime.now().isoformat())
+            )
+            conn.commit()
+            logger.info(f"✅ تم تطبيق ترحيل قاعدة البيانات {version}: {description}")
+        except Exception:
+            conn.rollback()
+            logger.error(f"❌ فشل ترحيل قاعدة البيانات {version}: {description}")
+            raise
+
+    return get_schema_version(conn)
+
+def main():
+    """واجهة سطر الأوامر لتطبيق الترحيلات، بما فيها غير المتصلة مع --offline"""
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description='ترحيل مخطط قاعدة بيانات مصنع البوتات')
+    parser.add_argument('--offline', action='store_true',
+                        help='تطبيق الترحيلات التي تعيد بناء الجداول وتفعيل التفريغ التدريجي '
+                             '(أوقف المصنع والبوتات المستضافة أولاً)')
+    parser.add_argument('--db', default=Config.DB_PATH, help='مسار قاعدة البيانات')
+
+    args = parser.parse_args()
+    conn = sqlite3.connect(args.db, timeout=Config.DB_BUSY_TIMEOUT / 1000)
+    try:
+        version = apply_migrations(conn, offline=args.offline)
+        if args.offline:
+            enable_incremental_vacuum(conn)
+        pending = pending_offline_migrations(conn)
+    except Exception as e:
+        logger.error(f"خطأ في ترحيل قاعدة البيانات: {e}")
+        return 1
+    finally:
+        conn.close()
+    logger.info(f"إصدار المخطط {version}" + (f"؛ ترحيلات غير متصلة مؤجلة: {pending}" if pending else ""))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,286 @@
+"""
+تتبع انقطاعات البوتات بآلة حالات لكل بوت
+Bot Outage Tracker
+
+online ← (فشل) → degraded ← (فشل متكرر) → offline ← (نجاح) → recovered ← (نجاح متكرر) → online
+
+لا يُكتب في قاعدة البيانات إلا عند فتح انقطاع أو إغلاقه، مهما طال الانقطاع
+"""
+import logging
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from config import Config
+from database_manager import db, async_db, now_ts
+
+logger = logging.getLogger(__name__)
+
+ONLINE, DEGRADED, OFFLINE, RECOVERED = 'online', 'degraded', 'offline', 'recovered'
+
+# أحداث الإشعار
+EVENT_OFFLINE, EVENT_RECOVERED, EVENT_REVOKED = 'offline', 'recovered', 'revoked'
+
+class OutageTracker:
+    """آلة حالات للانقطاعات مع حفظ الانتقالات فقط وإشعارات مخففة (debounced)"""
+
+    def __init__(self, failure_threshold: int = None, recovery_threshold: int = None,
+                 notify_debounce: int = None):
+        self.failure_threshold = max(1, failure_threshold or Config.OUTAGE_FAILURE_THRESHOLD)
+        self.recovery_threshold = max(1, recovery_threshold or Config.OUTAGE_RECOVERY_THRESHOLD)
+        self.notify_debounce = Config.OUTAGE_NOTIFY_DEBOUNCE if notify_debounce is None else notify_debounce
+        # bot_id -> {state, failures, successes, outage_id, started_at, failed_checks, last_status, notified}
+        self._states: Dict[int, Dict] = {}
+        self._last_notified: Dict[int, int] = {}
+        self._listeners: List[Callable[[Dict], None]] = []
+
+    def add_listener(self, callback: Callable[[Dict], None]):
+        """تسجيل دالة تُستدعى عند بدء انقطاع أو انتهائه (من خيط المراقبة أو من حلقة التطبيق)"""
+        self._listeners.append(callback)
+
+    def load(self):
+        """تحميل الانقطاعات المفتوحة حتى لا يبدأ انقطاع جديد بعد إعادة التشغيل"""
+        try:
+            with db.get_connection() as conn:
+                rows = conn.execute('''
+                    SELECT o.id, o.bot_id, o.started_at, o.failed_checks, o.last_status
+                    FROM bot_outages o JOIN bots b ON b.id = o.bot_id
+                    WHERE o.ended_at IS NULL AND b.status = 'active'
+                ''').fetchall()
+        except Exception as e:
+            logger.error(f"خطأ في تحميل الانقطاعات المفتوحة: {e}")
+            return
+        for row in rows:
+            self._states[row['bot_id']] = {
+                'state': OFFLINE, 'failures': 0, 'successes': 0,
+                'outage_id': row['id'], 'started_at': row['started_at'],
+                'failed_checks': row['failed_checks'], 'last_status': row['last_status'],
+                # نفترض أن الانقطاع أُبلغ عنه قبل إعادة التشغيل ليصل إشعار العودة
+                'notified': True
+            }
+
+    def forget(self, bot_ids: Iterable[int]):
+        """إسقاط حالة البوتات التي لم تعد مراقبة (الانقطاع المفتوح يبقى في قاعدة البيانات)"""
+        for bot_id in bot_ids:
+            self._states.pop(bot_id, None)
+            self._last_notified.pop(bot_id, None)
+
+    def revoked(self, bot: Dict):
+        """إسقاط بوت أُلغي توكنه وإغلاق انقطاعه المفتوح وإشعار المستمعين (بدون تخفيف: الحدث نهائي)"""
+        ts = now_ts()
+        closed = self._close_revoked(bot, ts)
+        if closed:
+            self._persist([], closed, ts)
+        self._notify_revoked(bot, ts)
+
+    async def revoked_async(self, bot: Dict):
+        """نسخة revoked لحلقة الأحداث: الحالة والإشعار على الحلقة والكتابة فقط عبر async_db"""
+        ts = now_ts()
+        closed = self._close_revoked(bot, ts)
+        if closed:
+            await async_db.run(self._write, self._changes([], closed))
+        self._notify_revoked(bot, ts)
+
+    def _close_revoked(self, bot: Dict, ts: int) -> List[Tuple[Dict, Dict]]:
+        """إسقاط حالة البوت وإرجاع انقطاعه المفتوح (إن وجد) مغلقاً بحالة revoked"""
+        state = self._states.get(bot['id'])
+        self.forget([bot['id']])
+        if not state or state['outage_id'] is None:
+            return []
+        state['ended_at'] = ts
+        state['last_status'] = EVENT_REVOKED
+        return [(bot, state)]
+
+    def _notify_revoked(self, bot: Dict, ts: int):
+        event = {'event': EVENT_REVOKED, 'bot': bot, 'status': 'revoked', 'started_at': ts,
+                 'ended_at': None, 'duration_seconds': None}
+        for listener in self._listeners:
+            try:
+                listener(event)
+            except Exception as e:
+                logger.error(f"خطأ في إشعار الانقطاع: {e}")
+
+    def get_state(self, bot_id: int) -> Optional[str]:
+        state = self._states.get(bot_id)
+        return state['state'] if state else None
+
+    def open_outages(self) -> int:
+        """عدد البوتات المنقطعة حالياً (بما فيها قيد التعافي)"""
+        return sum(1 for state in self._states.values() if state['outage_id'] is not None)
+
+    def observe(self, bots: Iterable[Dict], results: Dict[int, Tuple[str, float]], ts: int = None) -> List[Dict]:
+        """تحديث آلة الحالات بنتائج دفعة فحص وحفظ الانتقالات وإرجاع الأحداث"""
+        ts = ts or now_ts()
+        opened, closed = self._transition(bots, results, ts)
+        if not opened and not closed:
+            return []
+        self._persist(opened, closed, ts)
+        return self._events(opened, closed, ts)
+
+    async def observe_async(self, bots: Iterable[Dict], results: Dict[int, Tuple[str, float]],
+                            ts: int = None) -> List[Dict]:
+        """نسخة observe لحلقة الأحداث: الحالات والإشعارات على الحلقة والكتابة فقط عبر async_db"""
+        ts = ts or now_ts()
+        opened, closed = self._transition(bots, results, ts)
+        if not opened and not closed:
+            return []
+        outage_ids = await async_db.run(self._write, self._changes(opened, closed))
+        self._assign_ids(opened, outage_ids)
+        return self._events(opened, closed, ts)
+
+    def _transition(self, bots: Iterable[Dict], results: Dict[int, Tuple[str, float]],
+                    ts: int) -> Tuple[List[Tuple[Dict, Dict]], List[Tuple[Dict, Dict]]]:
+        """تطبيق نتائج الدفعة على آلة الحالات وإرجاع الانقطاعات المفتوحة والمغلقة (بدون كتابة)"""
+        opened: List[Tuple[Dict, Dict]] = []
+        closed: List[Tuple[Dict, Dict]] = []
+
+        for bot in bots:
+            status = results[bot['id']][0]
+            state = self._states.get(bot['id'])
+            if state is None:
+                state = self._states[bot['id']] = {
+                    'state': ONLINE, 'failures': 0, 'successes': 0, 'outage_id': None,
+                    'started_at': None, 'failed_checks': 0, 'last_status': None, 'notified': False
+                }
+
+            if status == 'online':
+                state['failures'] = 0
+                if state['state'] == DEGRADED:
+                    state['state'] = ONLINE
+                elif state['state'] in (OFFLINE, RECOVERED):
+                    if state['state'] == OFFLINE:
+                        state['state'] = RECOVERED
+                        state['successes'] = 0
+                        state['ended_at'] = ts
+                    state['successes'] += 1
+                    if state['successes'] >= self.recovery_threshold:
+                        closed.append((bot, state))
+                continue
+
+            state['last_status'] = status
+            state['failed_checks'] += 1
+            if state['state'] == ONLINE:
+                state['state'] = DEGRADED
+                state['started_at'] = ts
+                state['failed_checks'] = 1
+            elif state['state'] == RECOVERED:
+                # تذبذب أثناء التعافي: يستمر الانقطاع نفسه
+                state['state'] = OFFLINE
+                continue
+            if state['state'] == DEGRADED:
+                state['failures'] += 1
+                if state['failures'] >= self.failure_threshold:
+                    state['state'] = OFFLINE
+                    opened.append((bot, state))
+        return opened, closed
+
+    def _events(self, opened: List[Tuple[Dict, Dict]], closed: List[Tuple[Dict, Dict]], ts: int) -> List[Dict]:
+        """أحداث الانتقالات بعد حفظها، مع تصفير حالة الانقطاعات المغلقة وإشعار المستمعين"""
+        events = []
+        for bot, state in opened:
+            events.append({
+                'event': EVENT_OFFLINE, 'bot': bot, 'status': state['last_status'],
+                'started_at': state['started_at'], 'ended_at': None, 'duration_seconds': None
+            })
+        for bot, state in closed:
+            events.append({
+                'event': EVENT_RECOVERED, 'bot': bot, 'status': ONLINE,
+                'started_at': state['started_at'], 'ended_at': state['ended_at'],
+                'duration_seconds': state['ended_at'] - state['started_at'],
+                'notified': state['notified']
+            })
+            self._states[bot['id']] = {
+                'state': ONLINE, 'failures': 0, 'successes': 0, 'outage_id': None,
+                'started_at': None, 'failed_checks': 0, 'last_status': None, 'notified': False
+            }
+        self._notify(events, ts)
+        return events
+
+    def _persist(self, opened: List[Tuple[Dict, Dict]], closed: List[Tuple[Dict, Dict]], ts: int):
+        """حفظ الانتقالات في معاملة واحدة مع سطر نشاط لكل انتقال"""
+        self._assign_ids(opened, self._write(self._changes(opened, closed)))
+
+    @staticmethod
+    def _changes(opened: List[Tuple[Dict, Dict]], closed: List[Tuple[Dict, Dict]]) -> Dict[str, list]:
+        """لقطة الصفوف المطلوب كتابتها، تُبنى حيث تتغير الحالات فتُكتب من أي خيط"""
+        activities = []
+        for bot, state in opened:
+            logger.warning(f"⚠️ البوت {bot['id']} متوقف ({state['last_status']})")
+            activities.append((bot['owner_id'], 'bot_offline', f"البوت {bot['bot_username'] or bot['id']} متوقف"))
+        for bot, state in closed:
+            if state['last_status'] == EVENT_REVOKED:
+                # الإلغاء يُسجَّل نشاطه في المراقب
+                continue
+            duration = state['ended_at'] - state['started_at']
+            logger.info(f"✅ البوت {bot['id']} عاد للعمل بعد {duration} ثانية")
+            activities.append((bot['owner_id'], 'bot_recovered',
+                               f"البوت {bot['bot_username'] or bot['id']} عاد للعمل بعد {duration // 60} دقيقة"))
+        return {
+            'opened': [(bot['id'], state['started_at'], state['failed_checks'], state['last_status'])
+                       for bot, state in opened],
+            'closed': [(state['ended_at'], state['ended_at'] - state['started_at'], state['failed_checks'],
+                        state['last_status'], state['outage_id'])
+                       for _, state in closed if state['outage_id'] is not None],
+            'activities': activities
+        }
+
+    @staticmethod
+    def _write(changes: Dict[str, list]) -> List[int]:
+        """كتابة لقطة الانتقالات وإرجاع معرفات الانقطاعات الجديدة بترتيبها"""
+        outage_ids = []
+        try:
+            with db.get_connection() as conn:
+                for row in changes['opened']:
+                    cursor = conn.execute('''
+                        INSERT INTO bot_outages (bot_id, started_at, failed_checks, last_status)
+                        VALUES (?, ?, ?, ?)
+                    ''', row)
+                    outage_ids.append(cursor.lastrowid)
+                conn.executemany('''
+                    UPDATE bot_outages
+                    SET ended_at = ?, duration_seconds = ?, failed_checks = ?, last_status = ?
+                    WHERE id = ?
+                ''', changes['closed'])
+                conn.commit()
+        except Exception as e:
+            logger.error(f"خطأ في حفظ انقطاعات البوتات: {e}")
+            outage_ids = []
+
+        for user_id, action, details in changes['activities']:
+            db.log_activity(user_id=user_id, action=action, details=details)
+        return outage_ids
+
+    @staticmethod
+    def _assign_ids(opened: List[Tuple[Dict, Dict]], outage_ids: List[int]):
+        for (_, state), outage_id in zip(opened, outage_ids):
+            state['outage_id'] = outage_id
+
+    def _notify(self, events: List[Dict], ts: int):
+        """إشعار المستمعين مع تجاهل الانقطاعات المتكررة للبوت نفسه خلال فترة التخفيف"""
+        if not self._listeners:
+            return
+        for event in events:
+            bot_id = event['bot']['id']
+            if event['event'] == EVENT_OFFLINE:
+                if ts - self._last_notified.get(bot_id, 0) < self.notify_debounce:
+                    continue
+                self._last_notified[bot_id] = ts
+                self._states[bot_id]['notified'] = True
+            elif not event.pop('notified'):
+                # لا إشعار بالعودة لانقطاع لم يُبلغ عنه
+                continue
+            for listener in self._listeners:
+                try:
+                    listener(event)
+                except Exception as e:
+                    logger.error(f"خطأ في إشعار الانقطاع: {e}")
+
+    def get_outages(self, bot_id: int, limit: int = 10) -> List[Dict]:
+        """آخر انقطاعات بوت محدد"""
+        try:
+            with db.get_connection() as conn:
+                rows = conn.execute('''
+                    SELECT * FROM bot_outages WHERE bot_id = ?
+                    ORDER BY started_at DESC LIMIT ?
+                ''', (bot_id, limit)).fetchall()
+                return [dict(row) for row in rows]
+        except Exception as e:
+            logger.error(f"خطأ في الحصول على انقطاعات البوت {bot_id}: {e}")
+            return []
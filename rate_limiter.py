@@ -0,0 +1,239 @@
+"""
+محدد معدل الإرسال إلى تيليجرام (دلاء رموز لكل توكن ولكل محادثة)
+Telegram Send Rate Limiter
+
+حدود تيليجرام التقريبية: ~30 رسالة/ثانية لكل بوت، رسالة/ثانية لكل محادثة خاصة،
+و20 رسالة/دقيقة لكل مجموعة. عند رد 429 يُحترم retry_after ويُخفض معدل البوت مؤقتاً
+"""
+import time
+import asyncio
+import logging
+import threading
+from typing import Any, AsyncIterable, Awaitable, Callable, Dict, Iterable, Optional, Set, Tuple, Union
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# نقاط API التي تخضع لحدود الرسائل في محول python-telegram-bot (مثل ما يحده قالب البوت)
+SEND_ENDPOINTS = frozenset({
+    'sendMessage', 'sendPhoto', 'sendDocument', 'sendVideo', 'sendAudio', 'sendVoice',
+    'sendAnimation', 'sendSticker', 'sendMediaGroup', 'sendLocation', 'sendContact',
+    'sendPoll', 'sendDice', 'copyMessage', 'forwardMessage',
+    'editMessageText', 'editMessageCaption', 'editMessageMedia', 'editMessageReplyMarkup',
+})
+
+class TokenBucket:
+    """دلو رموز بحجز مسبق: الرصيد قد يصبح سالباً فيعرف كل طالب مدة انتظاره دون حلقات"""
+
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated')
+
+    def __init__(self, rate: float, capacity: float, now: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+
+    def refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, now: float) -> float:
+        """حجز رمز وإرجاع الانتظار اللازم بالثواني"""
+        self.refill(now)
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def idle(self, now: float) -> bool:
+        """ممتلئ عند now، أي مطابق لدلو جديد ويمكن حذفه"""
+        return self.tokens + (now - self.updated) * self.rate >= self.capacity
+
+def _bot_key(token: str) -> str:
+    # الجزء الرقمي من التوكن يكفي للتمييز ولا يكشف التوكن في الذاكرة أو السجلات
+    return token.split(':', 1)[0]
+
+def retry_after_in(result: Dict) -> Optional[float]:
+    """مدة retry_after من رد JSON لطلب API مباشر (أو None إن لم يكن 429)"""
+    if not result or result.get('error_code') != 429:
+        return None
+    return float((result.get('parameters') or {}).get('retry_after', 1))
+
+def retry_after_of(error: Exception) -> Optional[float]:
+    """مدة retry_after من أخطاء 429 في python-telegram-bot أو pyTelegramBotAPI (أو None)"""
+    retry_after = getattr(error, 'retry_after', None)
+    if retry_after is not None:
+        return float(getattr(retry_after, 'total_seconds', lambda: retry_after)())
+    return retry_after_in(getattr(error, 'result_json', None))
+
+class RateLimiter:
+    """دلاء عامة لكل توكن ودلاء لكل محادثة، مع إبطاء تكيفي بعد 429
+
+    آمن للاستخدام من عدة خيوط ومن حلقات أحداث مختلفة
+    """
+
+    def __init__(self, global_rate: float = None, chat_rate: float = None, group_rate: float = None,
+                 chat_burst: int = None):
+        self.global_rate = global_rate or Config.RATE_LIMIT_GLOBAL
+        self.chat_rate = chat_rate or Config.RATE_LIMIT_CHAT
+        self.group_rate = group_rate or Config.RATE_LIMIT_GROUP_PER_MINUTE / 60
+        self.chat_burst = chat_burst or Config.RATE_LIMIT_CHAT_BURST
+        self._global: Dict[str, TokenBucket] = {}
+        self._chats: Dict[Tuple[str, int], TokenBucket] = {}
+        # حظر مؤقت بعد 429؛ retry_after في تيليجرام يخص البوت كله لا المحادثة
+        self._blocked_until: Dict[str, float] = {}
+        # آخر 429 لكل توكن لإعادة المعدل الكامل بعد فترة هدوء
+        self._penalized_at: Dict[str, float] = {}
+        self._operations = 0
+        self._lock = threading.Lock()
+
+    def delay(self, token: str, chat_id: Optional[int] = None) -> float:
+        """حجز مكان لرسالة وإرجاع مدة الانتظار قبل إرسالها"""
+        key = _bot_key(token)
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._global.get(key)
+            if bucket is None:
+                bucket = self._global[key] = TokenBucket(self.global_rate, self.global_rate, now)
+            elif key in self._penalized_at and now - self._penalized_at[key] >= Config.RATE_LIMIT_RECOVERY:
+                del self._penalized_at[key]
+                bucket.rate = self.global_rate
+            wait = bucket.reserve(now)
+
+            if chat_id is not None:
+                chat_key = (key, chat_id)
+                chat = self._chats.get(chat_key)
+                if chat is None:
+                    # معرفات المجموعات والقنوات سالبة
+                    rate = self.group_rate if chat_id < 0 else self.chat_rate
+                    chat = self._chats[chat_key] = TokenBucket(rate, self.chat_burst, now)
+                wait = max(wait, chat.reserve(now))
+            wait = max(wait, self._blocked_until.get(key, 0) - now)
+
+            self._operations += 1
+            if self._operations % 10000 == 0:
+                self._prune(now)
+        return wait
+
+    async def acquire(self, token: str, chat_id: Optional[int] = None):
+        wait = self.delay(token, chat_id)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def acquire_sync(self, token: str, chat_id: Optional[int] = None):
+        wait = self.delay(token, chat_id)
+        if wait > 0:
+            time.sleep(wait)
+
+    def on_retry_after(self, token: str, retry_after: float):
+        """تسجيل رد 429: حظر البوت كله حتى retry_after وتخفيض معدله"""
+        key = _bot_key(token)
+        now = time.monotonic()
+        with self._lock:
+            self._blocked_until[key] = max(self._blocked_until.get(key, 0), now + retry_after)
+            bucket = self._global.get(key)
+            if bucket is not None:
+                bucket.rate = max(Config.RATE_LIMIT_MIN, bucket.rate * Config.RATE_LIMIT_BACKOFF)
+                bucket.tokens = min(bucket.tokens, 0)
+            self._penalized_at[key] = now
+        logger.warning(f"⏳ 429 للبوت {key}: انتظار {retry_after:g} ثانية وتخفيض المعدل")
+
+    def _prune(self, now: float):
+        """حذف الدلاء الممتلئة والحظر المنتهي (تعود كما لو كانت جديدة)"""
+        for buckets in (self._chats, self._global):
+            for key in [key for key, bucket in buckets.items()
+                        if bucket.idle(now) and key not in self._penalized_at]:
+                del buckets[key]
+        for key in [key for key, until in self._blocked_until.items() if until <= now]:
+            del self._blocked_until[key]
+
+    async def call(self, token: str, chat_id: Optional[int], func: Callable, *args, **kwargs):
+        """استدعاء دالة إرسال غير متزامنة مع الانتظار وإعادة المحاولة عند 429"""
+        for attempt in range(Config.MAX_BROADCAST_RETRIES + 1):
+            await self.acquire(token, chat_id)
+            try:
+                return await func(*args, **kwargs)
+            except Exception as e:
+                retry_after = retry_after_of(e)
+                if retry_after is None or attempt == Config.MAX_BROADCAST_RETRIES:
+                    raise
+                self.on_retry_after(token, retry_after)
+
+    def call_sync(self, token: str, chat_id: Optional[int], func: Callable, *args, **kwargs):
+        """نسخة متزامنة من call (للبوتات المبنية على pyTelegramBotAPI)"""
+        for attempt in range(Config.MAX_BROADCAST_RETRIES + 1):
+            self.acquire_sync(token, chat_id)
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                retry_after = retry_after_of(e)
+                if retry_after is None or attempt == Config.MAX_BROADCAST_RETRIES:
+                    raise
+                self.on_retry_after(token, retry_after)
+
+# محدد مشترك لكل الإرسال من هذه العملية
+rate_limiter = RateLimiter()
+
+async def send_all(targets: Union[Iterable, AsyncIterable], send: Callable[[Any], Awaitable[bool]],
+                   concurrency: int = None) -> Tuple[int, int]:
+    """تشغيل send لكل هدف بالتوازي (بحد concurrency) وإرجاع (الإجمالي، الناجح)
+
+    السرعة يحددها محدد المعدل داخل send؛ التوازي يمنع زمن الذهاب والعودة من أن يصبح هو الحد.
+    الأهداف تُقرأ تدريجياً فلا يُحمّل الجمهور كله في الذاكرة
+    """
+    semaphore = asyncio.Semaphore(concurrency or Config.BROADCAST_CONCURRENCY)
+    pending: Set[asyncio.Task] = set()
+    total = success = 0
+
+    async def run(target):
+        nonlocal success
+        try:
+            if await send(target):
+                success += 1
+        except Exception as e:
+            logger.error(f"خطأ في الإرسال إلى {target}: {e}")
+        finally:
+            semaphore.release()
+
+    async def schedule(target):
+        nonlocal total
+        await semaphore.acquire()
+        total += 1
+        task = asyncio.create_task(run(target))
+        pending.add(task)
+        task.add_done_callback(pending.discard)
+
+    if hasattr(targets, '__aiter__'):
+        async for target in targets:
+            await schedule(target)
+    else:
+        for target in targets:
+            await schedule(target)
+    if pending:
+        await asyncio.gather(*pending)
+    return total, success
+
+try:
+    from telegram.ext import BaseRateLimiter
+except ImportError:  # pragma: no cover - عند استخدام المحدد بدون python-telegram-bot
+    BaseRateLimiter = None
+
+if BaseRateLimiter is not None:
+    class PTBRateLimiter(BaseRateLimiter):
+        """محول RateLimiter لـ ApplicationBuilder().rate_limiter في python-telegram-bot"""
+
+        def __init__(self, token: str, limiter: RateLimiter = None):
+            self.token = token
+            self.limiter = limiter or rate_limiter
+
+        async def initialize(self):
+            pass
+
+        async def shutdown(self):
+            pass
+
+        async def process_request(self, callback, args, kwargs, endpoint, data, rate_limit_args):
+            if endpoint not in SEND_ENDPOINTS:
+                return await callback(*args, **kwargs)
+            chat_id = data.get('chat_id')
+            # chat_id قد يكون @username للقنوات؛ يُحد بالدلو العام فقط
+            chat_id = chat_id if isinstance(chat_id, int) else None
+            return await self.limiter.call(self.token, chat_id, callback, *args, **kwargs)
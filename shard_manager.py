@@ -0,0 +1,150 @@
+"""
+أداة إدارة أجزاء قاعدة البيانات (bot_users و bot_stats)
+Shard Management Tool
+
+الاستخدام (أوقف مصنع البوتات أولاً):
+    python shard_manager.py status
+    python shard_manager.py rebalance --from 1    # نقل البيانات من عدد الأجزاء القديم إلى DB_SHARDS الحالي
+    python shard_manager.py recount               # إعادة حساب bots.total_users من الأجزاء
+"""
+import os
+import sys
+import sqlite3
+import logging
+import argparse
+from typing import Dict, List
+from config import Config
+from database_manager import db, shard_index
+
+logger = logging.getLogger(__name__)
+
+# الدمج عند التعارض يأخذ القيمة الأكبر حتى تكون إعادة التشغيل بعد انقطاع آمنة
+MOVE_SQL = {
+    'bot_users': '''
+        INSERT INTO bot_users (bot_id, user_id, username, first_name, chat_type,
+                               date_joined, last_interaction, message_count)
+        VALUES (:bot_id, :user_id, :username, :first_name, :chat_type,
+                :date_joined, :last_interaction, :message_count)
+        ON CONFLICT(bot_id, user_id) DO UPDATE SET
+            date_joined = MIN(date_joined, excluded.date_joined),
+            last_interaction = MAX(COALESCE(last_interaction, 0), COALESCE(excluded.last_interaction, 0)),
+            message_count = MAX(message_count, excluded.message_count)
+    ''',
+    'bot_stats': '''
+        INSERT INTO bot_stats (bot_id, date, messages_count, users_count, groups_count)
+        VALUES (:bot_id, :date, :messages_count, :users_count, :groups_count)
+        ON CONFLICT(bot_id, date) DO UPDATE SET
+            messages_count = MAX(messages_count, excluded.messages_count),
+            users_count = MAX(users_count, excluded.users_count),
+            groups_count = MAX(groups_count, excluded.groups_count)
+    ''',
+}
+
+def layout(count: int) -> List[str]:
+    """مسارات الملفات التي تحفظ bot_users و bot_stats لعدد أجزاء معين"""
+    return Config.shard_paths(count) or [Config.DB_PATH]
+
+def _target_connection(index: int):
+    return db.shards.get_connection(index) if db.shards else db.get_connection()
+
+def status() -> List[Dict]:
+    """عدد الصفوف في كل جزء حسب الإعدادات الحالية"""
+    result = []
+    for index, path in enumerate(layout(Config.DB_SHARDS)):
+        with _target_connection(index) as conn:
+            result.append({
+                'shard': index,
+                'path': path,
+                'bot_users': conn.execute('SELECT COUNT(*) FROM bot_users').fetchone()[0],
+                'bot_stats': conn.execute('SELECT COUNT(*) FROM bot_stats').fetchone()[0],
+            })
+    return result
+
+def rebalance(old_count: int, batch_size: int = 5000) -> Dict[str, int]:
+    """نقل الصفوف من توزيع old_count إلى التوزيع الحالي على دفعات"""
+    targets = [os.path.abspath(path) for path in layout(Config.DB_SHARDS)]
+    moved = {'bot_users': 0, 'bot_stats': 0}
+
+    for source_path in layout(old_count):
+        if not os.path.exists(source_path):
+            continue
+        source = sqlite3.connect(source_path, timeout=Config.DB_BUSY_TIMEOUT / 1000)
+        source.row_factory = sqlite3.Row
+        try:
+            for table, insert_sql in MOVE_SQL.items():
+                last_id = 0
+                while True:
+                    rows = source.execute(
+                        f'SELECT * FROM {table} WHERE id > ? ORDER BY id LIMIT ?', (last_id, batch_size)
+                    ).fetchall()
+                    if not rows:
+                        break
+                    last_id = rows[-1]['id']
+
+                    groups: Dict[int, List[dict]] = {}
+                    for row in rows:
+                        index = shard_index(row['bot_id'])
+                        if targets[index] != os.path.abspath(source_path):
+                            groups.setdefault(index, []).append(dict(row))
+
+                    # الكتابة في الهدف أولاً ثم الحذف من المصدر
+                    for index, group in groups.items():
+                        with _target_connection(index) as conn:
+                            conn.executemany(insert_sql, group)
+                            conn.commit()
+                        source.executemany(f'DELETE FROM {table} WHERE id = ?',
+                                           [(row['id'],) for row in group])
+                        source.commit()
+                        moved[table] += len(group)
+            logger.info(f"🔀 تم نقل البيانات من {source_path}")
+        finally:
+            source.close()
+
+    if any(moved.values()):
+        recount()
+    return moved
+
+def recount() -> int:
+    """إعادة حساب bots.total_users من عدد الصفوف الفعلي في الأجزاء"""
+    totals: Dict[int, int] = {}
+    for index in range(len(layout(Config.DB_SHARDS))):
+        with _target_connection(index) as conn:
+            for row in conn.execute('SELECT bot_id, COUNT(*) FROM bot_users GROUP BY bot_id'):
+                totals[row[0]] = totals.get(row[0], 0) + row[1]
+
+    with db.get_connection() as conn:
+        conn.execute('UPDATE bots SET total_users = 0 WHERE total_users != 0')
+        conn.executemany('UPDATE bots SET total_users = ? WHERE id = ?',
+                         [(count, bot_id) for bot_id, count in totals.items()])
+        conn.commit()
+    db.cache.clear()
+    return len(totals)
+
+def main():
+    """واجهة سطر الأوامر لإدارة الأجزاء"""
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description='إدارة أجزاء قاعدة بيانات مصنع البوتات')
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('status', help='عدد الصفوف في كل جزء')
+    rebalance_parser = commands.add_parser('rebalance', help='إعادة توزيع البيانات على DB_SHARDS الحالي')
+    rebalance_parser.add_argument('--from', dest='old_count', type=int, default=1,
+                                  help='عدد الأجزاء السابق (1 = الملف الأساسي)')
+    rebalance_parser.add_argument('--batch-size', type=int, default=5000)
+    commands.add_parser('recount', help='إعادة حساب bots.total_users')
+
+    args = parser.parse_args()
+    try:
+        if args.command == 'status':
+            for item in status():
+                print(f"{item['shard']}\t{item['path']}\tbot_users={item['bot_users']:,}\tbot_stats={item['bot_stats']:,}")
+        elif args.command == 'rebalance':
+            moved = rebalance(args.old_count, args.batch_size)
+            print(f"bot_users={moved['bot_users']:,} bot_stats={moved['bot_stats']:,}")
+        else:
+            print(f"bots={recount():,}")
+        return 0
+    finally:
+        db.close()
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,169 @@
+"""
+مخزن حالات المراقبة المضغوط
+Compact Monitor Status Store
+"""
+import os
+import struct
+import threading
+from array import array
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+from health_history import STATUS_CODES
+
+STATUS_NAMES = {code: name for name, code in STATUS_CODES.items()}
+ONLINE = STATUS_CODES['online']
+
+# زمن الاستجابة بالميلي ثانية في 16 بت؛ القيمة القصوى تعني "بلا زمن" (نتيجة نبض)
+NO_LATENCY = 0xFFFF
+
+# ترويسة ملف الحفظ: المعرّف ثم عدد البوتات
+FILE_MAGIC = b'BMS1'
+
+class StatusStore:
+    """حالة آخر فحص لكل بوت في مصفوفات متوازية (حوالي 15 بايت لكل بوت بدون فهرس المعرفات)
+
+    يحتفظ بعدد البوتات لكل حالة وبقائمة البوتات المتعثرة أثناء التحديث، فلا يحتاج التقرير للمرور على الكل
+    """
+
+    __slots__ = ('_slots', '_ids', '_codes', '_checked', '_latency', '_free', '_counts', '_failing', '_lock')
+
+    def __init__(self):
+        self._slots: Dict[int, int] = {}
+        self._ids = array('q')
+        self._codes = array('b')
+        self._checked = array('I')
+        self._latency = array('H')
+        self._free: List[int] = []
+        self._counts = [0] * len(STATUS_CODES)
+        # البوتات غير المتصلة بترتيب الإضافة (عادة قليلة)
+        self._failing: Dict[int, None] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def __contains__(self, bot_id: int) -> bool:
+        return bot_id in self._slots
+
+    def set(self, bot_id: int, status: str, latency_ms: Optional[float], ts: int = None):
+        """تسجيل نتيجة فحص"""
+        code = STATUS_CODES.get(status, STATUS_CODES['error'])
+        latency = NO_LATENCY if latency_ms is None else min(int(latency_ms), NO_LATENCY - 1)
+        ts = ts or int(datetime.now().timestamp())
+
+        with self._lock:
+            slot = self._slots.get(bot_id)
+            if slot is not None:
+                self._counts[self._codes[slot]] -= 1
+                self._codes[slot], self._checked[slot], self._latency[slot] = code, ts, latency
+            elif self._free:
+                slot = self._slots[bot_id] = self._free.pop()
+                self._ids[slot] = bot_id
+                self._codes[slot], self._checked[slot], self._latency[slot] = code, ts, latency
+            else:
+                self._slots[bot_id] = len(self._ids)
+                self._ids.append(bot_id)
+                self._codes.append(code)
+                self._checked.append(ts)
+                self._latency.append(latency)
+            self._counts[code] += 1
+
+            if code == ONLINE:
+                self._failing.pop(bot_id, None)
+            else:
+                self._failing[bot_id] = None
+
+    def remove(self, bot_id: int):
+        with self._lock:
+            self._remove(bot_id)
+
+    def _remove(self, bot_id: int):
+        # يُستدعى مع الإمساك بالقفل
+        slot = self._slots.pop(bot_id, None)
+        if slot is None:
+            return
+        self._counts[self._codes[slot]] -= 1
+        self._failing.pop(bot_id, None)
+        self._free.append(slot)
+
+    def retain(self, bot_ids: Iterable[int]):
+        """إسقاط كل البوتات غير الموجودة في bot_ids (قد تشمل بوتات لم تعد تُفحص مثل الملغاة)"""
+        keep = set(bot_ids)
+        with self._lock:
+            for bot_id in [bot_id for bot_id in self._slots if bot_id not in keep]:
+                self._remove(bot_id)
+
+    def status(self, bot_id: int) -> Optional[str]:
+        slot = self._slots.get(bot_id)
+        return None if slot is None else STATUS_NAMES[self._codes[slot]]
+
+    def get(self, bot_id: int) -> Optional[Dict]:
+        """آخر نتيجة لبوت بصيغة القاموس المستخدمة في الواجهة"""
+        with self._lock:
+            slot = self._slots.get(bot_id)
+            if slot is None:
+                return None
+            code, ts, latency = self._codes[slot], self._checked[slot], self._latency[slot]
+        return {
+            'status': STATUS_NAMES[code],
+            'latency_ms': None if latency == NO_LATENCY else float(latency),
+            'last_check': datetime.fromtimestamp(ts).isoformat()
+        }
+
+    def counts(self) -> Dict[str, int]:
+        """عدد البوتات لكل حالة (محسوب أثناء التحديث)"""
+        return {STATUS_NAMES[code]: count for code, count in enumerate(self._counts)}
+
+    def failing(self, limit: int = 5) -> List[Tuple[int, str]]:
+        """أول limit بوتات غير متصلة مع حالاتها"""
+        with self._lock:
+            result = []
+            for bot_id in self._failing:
+                result.append((bot_id, STATUS_NAMES[self._codes[self._slots[bot_id]]]))
+                if len(result) >= limit:
+                    break
+            return result
+
+    def save(self, path: str) -> int:
+        """حفظ الحالات في ملف ثنائي (استبدال ذري) وإرجاع عددها"""
+        with self._lock:
+            slots = list(self._slots.values())
+            columns = (
+                array('q', (self._ids[slot] for slot in slots)),
+                array('b', (self._codes[slot] for slot in slots)),
+                array('I', (self._checked[slot] for slot in slots)),
+                array('H', (self._latency[slot] for slot in slots)),
+            )
+
+        temp_path = f'{path}.tmp'
+        with open(temp_path, 'wb') as output:
+            output.write(FILE_MAGIC)
+            output.write(struct.pack('<I', len(slots)))
+            for column in columns:
+                column.tofile(output)
+        os.replace(temp_path, path)
+        return len(slots)
+
+    def load(self, path: str) -> int:
+        """تحميل الحالات المحفوظة (تستبدل الحالية) وإرجاع عددها"""
+        if not os.path.exists(path):
+            return 0
+        with open(path, 'rb') as source:
+            if source.read(4) != FILE_MAGIC:
+                raise ValueError(f'ملف حالات المراقبة غير صالح: {path}')
+            (count,) = struct.unpack('<I', source.read(4))
+            ids, codes, checked, latency = array('q'), array('b'), array('I'), array('H')
+            for column in (ids, codes, checked, latency):
+                column.fromfile(source, count)
+
+        with self._lock:
+            self._ids, self._codes, self._checked, self._latency = ids, codes, checked, latency
+            self._slots = {bot_id: slot for slot, bot_id in enumerate(ids)}
+            self._free = []
+            self._counts = [0] * len(STATUS_CODES)
+            self._failing = {}
+            for bot_id, code in zip(ids, codes):
+                self._counts[code] += 1
+                if code != ONLINE:
+                    self._failing[bot_id] = None
+        return count
@@ -0,0 +1,13 @@
+"""
+إعداد الاختبارات: قاعدة بيانات مؤقتة قبل استيراد أي وحدة تنشئ db عند الاستيراد
+"""
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+os.environ['DB_PATH'] = os.path.join(tempfile.mkdtemp(prefix='hema-tests-'), 'database.db')
+os.environ.setdefault('WRITE_BUFFER_ENABLED', 'false')
+os.environ.setdefault('ANALYTICS_REPLICA', 'false')
@@ -0,0 +1,87 @@
+"""
+الذاكرة المؤقتة: الصلاحية والإخراج والإبطاء وعداد الأجيال
+"""
+import pytest
+
+import cache_manager
+from cache_manager import MISSING, TTLCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """ساعة يدوية بدلاً من time.monotonic"""
+    now = [1000.0]
+    monkeypatch.setattr(cache_manager.time, 'monotonic', lambda: now[0])
+    return now
+
+
+def test_get_missing_and_set():
+    cache = TTLCache()
+    assert cache.get('k') is MISSING
+    cache.set('k', None)
+    assert cache.get('k') is None
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = TTLCache(ttl=60)
+    cache.set('k', 1)
+    clock[0] += 59
+    assert cache.get('k') == 1
+    clock[0] += 2
+    assert cache.get('k') is MISSING
+    assert cache.stats()['size'] == 0
+
+
+def test_evicts_least_recently_used():
+    cache = TTLCache(max_size=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+    assert cache.get('b') is MISSING
+    assert cache.get('a') == 1
+    assert cache.get('c') == 3
+
+
+def test_invalidate_and_clear():
+    cache = TTLCache()
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.set('c', 3)
+    cache.invalidate('a', 'b', 'missing')
+    assert cache.get('a') is MISSING and cache.get('b') is MISSING
+    assert cache.get('c') == 3
+    cache.clear()
+    assert cache.get('c') is MISSING
+
+
+def test_set_skipped_after_invalidation_during_read():
+    cache = TTLCache()
+    generation = cache.generation
+    # إبطاء بين أخذ الجيل وتخزين نتيجة القراءة
+    cache.invalidate('other')
+    cache.set('k', 'stale', generation)
+    assert cache.get('k') is MISSING
+
+    generation = cache.generation
+    cache.set('k', 'fresh', generation)
+    assert cache.get('k') == 'fresh'
+
+
+def test_clear_bumps_generation():
+    cache = TTLCache()
+    generation = cache.generation
+    cache.clear()
+    cache.set('k', 1, generation)
+    assert cache.get('k') is MISSING
+
+
+def test_stats_hit_rate():
+    cache = TTLCache(max_size=5, ttl=30)
+    cache.set('k', 1)
+    cache.get('k')
+    cache.get('k')
+    cache.get('x')
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['size']) == (2, 1, 1)
+    assert stats['hit_rate'] == 66.67
@@ -0,0 +1,39 @@
+"""
+تقدير النسب المئوية لزمن الاستجابة من المدرج
+"""
+import math
+
+from health_history import LATENCY_BUCKETS_MS, _latency_bucket, _percentile, format_latency
+
+
+def histogram(**counts):
+    """مدرج من عدد الفحوصات لكل خانة، مثل histogram(h0=3, h7=1)"""
+    return [counts.get(f'h{i}', 0) for i in range(len(LATENCY_BUCKETS_MS) + 1)]
+
+
+def test_empty_histogram_has_no_percentile():
+    assert _percentile(histogram(), 50) is None
+
+
+def test_percentile_is_bucket_upper_bound():
+    # 6 فحوصات ≤50ms و4 فحوصات ≤500ms
+    data = histogram(h0=6, h3=4)
+    assert _percentile(data, 50) == 50.0
+    assert _percentile(data, 60) == 50.0
+    assert _percentile(data, 61) == 500.0
+    assert _percentile(data, 95) == 500.0
+
+
+def test_overflow_bucket_reports_infinity():
+    data = histogram(h1=1, h7=9)
+    assert _percentile(data, 50) == math.inf
+    assert format_latency(_percentile(data, 95)) == f'>{LATENCY_BUCKETS_MS[-1]}ms'
+    assert format_latency(_percentile(data, 10)) == '≤100ms'
+
+
+def test_latency_bucket_boundaries():
+    assert _latency_bucket(0) == 0
+    assert _latency_bucket(50) == 0
+    assert _latency_bucket(50.1) == 1
+    assert _latency_bucket(LATENCY_BUCKETS_MS[-1]) == len(LATENCY_BUCKETS_MS) - 1
+    assert _latency_bucket(LATENCY_BUCKETS_MS[-1] + 1) == len(LATENCY_BUCKETS_MS)
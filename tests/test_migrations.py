@@ -0,0 +1,111 @@
+"""
+ترحيل قاعدة بيانات بشكل الإصدار الأول (بدون schema_version وبأوقات نصية)
+"""
+import logging
+import sqlite3
+
+import pytest
+
+from migrations import (LATEST_VERSION, MIGRATIONS, _migration_001_initial_schema, apply_migrations,
+                        get_applied_versions, pending_offline_migrations)
+
+
+@pytest.fixture
+def baseline(tmp_path):
+    """قاعدة بيانات كما كان ينشئها المصنع قبل الترحيلات، مع بيانات"""
+    conn = sqlite3.connect(tmp_path / 'baseline.db')
+    conn.row_factory = sqlite3.Row
+    _migration_001_initial_schema(conn.cursor())
+    conn.executemany(
+        'INSERT INTO users (user_id, username, date_joined, last_seen) VALUES (?, ?, ?, ?)',
+        [(1, 'owner', '2024-01-01T10:00:00', '2024-01-02T10:00:00'), (2, 'other', '2024-01-03T09:30:00', None)]
+    )
+    conn.executemany(
+        'INSERT INTO bots (owner_id, token, bot_username, date_created, status, total_users, total_messages) '
+        'VALUES (?, ?, ?, ?, ?, ?, ?)',
+        [(1, '1:a', 'a_bot', '2024-01-01T11:00:00', 'active', 99, 10),
+         (1, '2:b', 'b_bot', '2024-01-01T12:00:00', 'inactive', 0, 5)]
+    )
+    conn.executemany(
+        'INSERT INTO bot_users (bot_id, user_id, date_joined, last_interaction) VALUES (?, ?, ?, ?)',
+        [(1, 10, '2024-01-01T11:05:00', '2024-01-01T11:05:00'), (1, 11, '2024-01-01T11:06:00', None)]
+    )
+    # أيام مكررة في bot_stats (قبل قيد التفرد)
+    conn.executemany(
+        'INSERT INTO bot_stats (bot_id, date, messages_count) VALUES (?, ?, ?)',
+        [(1, '2024-01-01', 3), (1, '2024-01-01', 4), (1, '2024-01-02', 1)]
+    )
+    conn.execute("INSERT INTO activity_log (user_id, action, timestamp) VALUES (1, 'start', '2024-01-01T10:00:00')")
+    conn.commit()
+    yield conn
+    conn.close()
+
+
+def test_upgrade_baseline_to_latest(baseline):
+    assert apply_migrations(baseline, offline=True) == LATEST_VERSION
+    versions = [row[0] for row in baseline.execute('SELECT version FROM schema_version ORDER BY version')]
+    assert versions == [version for version, _, _ in MIGRATIONS]
+
+
+def test_upgrade_converts_timestamps_to_epoch(baseline):
+    apply_migrations(baseline, offline=True)
+    for table, column in (('users', 'date_joined'), ('bots', 'date_created'), ('bot_users', 'date_joined'),
+                          ('bot_stats', 'date'), ('activity_log', 'timestamp')):
+        types = {row[0] for row in baseline.execute(f'SELECT typeof({column}) FROM {table}')}
+        assert types == {'integer'}, table
+    # الأعمدة الاختيارية تبقى NULL
+    assert baseline.execute('SELECT last_seen FROM users WHERE user_id = 2').fetchone()[0] is None
+
+
+def test_upgrade_merges_duplicate_stat_days(baseline):
+    apply_migrations(baseline, offline=True)
+    rows = baseline.execute('SELECT messages_count FROM bot_stats WHERE bot_id = 1 ORDER BY date').fetchall()
+    assert [row[0] for row in rows] == [7, 1]
+    with pytest.raises(sqlite3.IntegrityError):
+        day = baseline.execute('SELECT date FROM bot_stats LIMIT 1').fetchone()[0]
+        baseline.execute('INSERT INTO bot_stats (bot_id, date) VALUES (1, ?)', (day,))
+
+
+def test_upgrade_recounts_and_maintains_counters(baseline):
+    apply_migrations(baseline, offline=True)
+    assert baseline.execute('SELECT total_users FROM bots WHERE id = 1').fetchone()[0] == 2
+
+    def counters():
+        return {row[0]: row[1] for row in baseline.execute('SELECT name, value FROM system_counters')}
+
+    assert counters() == {'active_bots': 1, 'total_users': 2, 'active_messages': 10, 'active_bot_users': 2}
+
+    # المشغلات تعمل بعد إعادة بناء الجداول في الترحيل 7
+    baseline.execute("UPDATE bots SET status = 'active' WHERE id = 2")
+    baseline.execute("INSERT INTO users (user_id, date_joined) VALUES (3, 0)")
+    assert counters() == {'active_bots': 2, 'total_users': 3, 'active_messages': 15, 'active_bot_users': 2}
+
+
+def test_apply_is_idempotent(baseline):
+    apply_migrations(baseline, offline=True)
+    count = baseline.execute('SELECT COUNT(*) FROM schema_version').fetchone()[0]
+    assert apply_migrations(baseline, offline=True) == LATEST_VERSION
+    assert baseline.execute('SELECT COUNT(*) FROM schema_version').fetchone()[0] == count
+
+
+def test_offline_migration_deferred_on_populated_database(baseline, caplog):
+    with caplog.at_level(logging.WARNING, logger='migrations'):
+        apply_migrations(baseline)
+    assert pending_offline_migrations(baseline) == [7]
+    # الترحيلات اللاحقة لا تعتمد على 7
+    assert get_applied_versions(baseline) == {version for version, _, _ in MIGRATIONS} - {7}
+    assert baseline.execute("SELECT typeof(date_joined) FROM users").fetchone()[0] == 'text'
+    assert 'migrations.py --offline' in caplog.text
+
+    # الخطوة الصريحة تطبقه لاحقاً رغم أن الإصدارات الأحدث مطبقة
+    apply_migrations(baseline, offline=True)
+    assert pending_offline_migrations(baseline) == []
+    assert baseline.execute("SELECT typeof(date_joined) FROM users").fetchone()[0] == 'integer'
+
+
+def test_fresh_database_migrates_without_warning(tmp_path, caplog):
+    conn = sqlite3.connect(tmp_path / 'fresh.db')
+    with caplog.at_level(logging.WARNING, logger='migrations'):
+        assert apply_migrations(conn) == LATEST_VERSION
+    conn.close()
+    assert not caplog.records
@@ -0,0 +1,117 @@
+"""
+آلة حالات الانقطاعات: الفتح والإغلاق والتذبذب والتخفيف والإلغاء
+"""
+import asyncio
+
+import pytest
+
+from database_manager import db
+from outage_tracker import DEGRADED, OFFLINE, ONLINE, RECOVERED, OutageTracker
+
+
+# أوقات epoch واقعية (الإزاحات أدناه بالثواني منها)
+T0 = 1_700_000_000
+
+
+def make_bot(bot_id):
+    return {'id': bot_id, 'owner_id': 7, 'bot_username': f'bot{bot_id}'}
+
+
+@pytest.fixture(autouse=True)
+def empty_outages():
+    with db.get_connection() as conn:
+        conn.execute('DELETE FROM bot_outages')
+        conn.commit()
+
+
+@pytest.fixture
+def tracker():
+    tracker = OutageTracker(failure_threshold=2, recovery_threshold=2, notify_debounce=600)
+    tracker.events = []
+    tracker.add_listener(tracker.events.append)
+    return tracker
+
+
+def check(tracker, bot, status, offset):
+    return tracker.observe([bot], {bot['id']: (status, None)}, ts=T0 + offset)
+
+
+def test_single_failure_only_degrades(tracker):
+    bot = make_bot(1)
+    assert check(tracker, bot, 'timeout', 100) == []
+    assert tracker.get_state(1) == DEGRADED
+    check(tracker, bot, 'online', 160)
+    assert tracker.get_state(1) == ONLINE
+    assert tracker.get_outages(1) == []
+
+
+def test_outage_opens_and_closes(tracker):
+    bot = make_bot(2)
+    check(tracker, bot, 'offline', 100)
+    events = check(tracker, bot, 'offline', 160)
+    assert [event['event'] for event in events] == ['offline']
+    assert tracker.get_state(2) == OFFLINE
+    assert tracker.open_outages() == 1
+    [outage] = tracker.get_outages(2)
+    assert (outage['started_at'], outage['ended_at'], outage['failed_checks']) == (T0 + 100, None, 2)
+
+    check(tracker, bot, 'online', 220)
+    assert tracker.get_state(2) == RECOVERED
+    events = check(tracker, bot, 'online', 280)
+    assert [event['event'] for event in events] == ['recovered']
+    assert events[0]['duration_seconds'] == 120
+    assert tracker.get_state(2) == ONLINE
+    [outage] = tracker.get_outages(2)
+    assert (outage['ended_at'], outage['duration_seconds'], outage['last_status']) == (T0 + 220, 120, 'offline')
+    assert [event['event'] for event in tracker.events] == ['offline', 'recovered']
+
+
+def test_flapping_during_recovery_keeps_outage(tracker):
+    bot = make_bot(3)
+    for ts in (100, 160):
+        check(tracker, bot, 'offline', ts)
+    check(tracker, bot, 'online', 220)
+    check(tracker, bot, 'error', 280)
+    assert tracker.get_state(3) == OFFLINE
+    for ts in (340, 400):
+        check(tracker, bot, 'online', ts)
+    [outage] = tracker.get_outages(3)
+    assert (outage['started_at'], outage['ended_at'], outage['failed_checks']) == (T0 + 100, T0 + 340, 3)
+
+
+def test_repeated_outages_are_debounced(tracker):
+    bot = make_bot(4)
+    for ts in (100, 160, 220, 280):
+        check(tracker, bot, 'offline' if ts < 200 else 'online', ts)
+    for ts in (340, 400, 460, 520):
+        check(tracker, bot, 'offline' if ts < 450 else 'online', ts)
+    # الانقطاع الثاني خلال فترة التخفيف: لا إشعار بالبدء ولا بالعودة، لكنه محفوظ
+    assert [event['event'] for event in tracker.events] == ['offline', 'recovered']
+    assert len(tracker.get_outages(4)) == 2
+
+
+def test_revoked_closes_open_outage(tracker):
+    bot = make_bot(5)
+    for ts in (100, 160):
+        check(tracker, bot, 'offline', ts)
+    tracker.revoked(bot)
+    assert tracker.get_state(5) is None
+    assert tracker.open_outages() == 0
+    [outage] = tracker.get_outages(5)
+    assert outage['ended_at'] is not None
+    assert outage['last_status'] == 'revoked'
+    assert tracker.events[-1]['event'] == 'revoked'
+
+
+def test_observe_async_matches_observe(tracker):
+    bot = make_bot(6)
+
+    async def run():
+        for ts, status in ((100, 'offline'), (160, 'offline'), (220, 'online'), (280, 'online')):
+            await tracker.observe_async([bot], {6: (status, None)}, ts=T0 + ts)
+        await tracker.revoked_async(bot)
+
+    asyncio.run(run())
+    [outage] = tracker.get_outages(6)
+    assert (outage['started_at'], outage['ended_at'], outage['last_status']) == (T0 + 100, T0 + 220, 'offline')
+    assert [event['event'] for event in tracker.events] == ['offline', 'recovered', 'revoked']
@@ -0,0 +1,146 @@
+"""
+محدد معدل الإرسال: الدلاء والحظر بعد 429 وإعادة المحاولة والإرسال المتوازي
+"""
+import asyncio
+
+import pytest
+
+import rate_limiter as rate_limiter_module
+from config import Config
+from rate_limiter import RateLimiter, retry_after_in, retry_after_of, send_all
+
+TOKEN = '123:secret'
+
+
+class RetryAfter(Exception):
+    """مثل telegram.error.RetryAfter"""
+
+    def __init__(self, seconds):
+        super().__init__(f'retry after {seconds}')
+        self.retry_after = seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """ساعة يدوية؛ sleep يقدّمها بدلاً من الانتظار"""
+    now = [1000.0]
+    monkeypatch.setattr(rate_limiter_module.time, 'monotonic', lambda: now[0])
+    monkeypatch.setattr(rate_limiter_module.time, 'sleep', lambda seconds: now.__setitem__(0, now[0] + seconds))
+    return now
+
+
+@pytest.fixture
+def limiter(clock):
+    return RateLimiter(global_rate=10, chat_rate=1, group_rate=0.5, chat_burst=3)
+
+
+def test_global_bucket_allows_burst_then_spaces(limiter):
+    assert [limiter.delay(TOKEN) for _ in range(10)] == [0.0] * 10
+    assert limiter.delay(TOKEN) == pytest.approx(0.1)
+    assert limiter.delay(TOKEN) == pytest.approx(0.2)
+
+
+def test_bucket_refills_over_time(limiter, clock):
+    for _ in range(10):
+        limiter.delay(TOKEN)
+    clock[0] += 0.5
+    assert [limiter.delay(TOKEN) for _ in range(5)] == [0.0] * 5
+    assert limiter.delay(TOKEN) > 0
+
+
+def test_private_and_group_chat_limits(limiter):
+    assert [limiter.delay(TOKEN, 42) for _ in range(3)] == [0.0] * 3
+    assert limiter.delay(TOKEN, 42) == pytest.approx(1.0)
+    # المجموعات (معرف سالب) أبطأ
+    assert [limiter.delay(TOKEN, -100) for _ in range(3)] == [0.0] * 3
+    assert limiter.delay(TOKEN, -100) == pytest.approx(2.0)
+
+
+def test_buckets_are_per_bot(limiter):
+    for _ in range(10):
+        limiter.delay(TOKEN)
+    assert limiter.delay('456:other') == 0.0
+    # المفتاح هو الجزء الرقمي من التوكن
+    assert limiter.delay('123:rotated') > 0
+
+
+def test_retry_after_blocks_bot_and_backs_off(limiter, clock):
+    limiter.delay(TOKEN)
+    limiter.on_retry_after(TOKEN, 5)
+    assert limiter.delay(TOKEN, 42) >= 5
+    assert limiter.delay('456:other') == 0.0
+    assert limiter._global['123'].rate == max(Config.RATE_LIMIT_MIN, 10 * Config.RATE_LIMIT_BACKOFF)
+
+    clock[0] += Config.RATE_LIMIT_RECOVERY
+    limiter.delay(TOKEN)
+    assert limiter._global['123'].rate == 10
+
+
+def test_retry_after_parsing():
+    assert retry_after_in({'ok': False, 'error_code': 429, 'parameters': {'retry_after': 7}}) == 7.0
+    assert retry_after_in({'ok': False, 'error_code': 400}) is None
+    assert retry_after_in(None) is None
+    assert retry_after_of(RetryAfter(3)) == 3.0
+
+    error = Exception('Too Many Requests')
+    error.result_json = {'error_code': 429, 'parameters': {'retry_after': 2}}
+    assert retry_after_of(error) == 2.0
+    assert retry_after_of(ValueError('boom')) is None
+
+
+def test_call_sync_retries_after_429(limiter, clock):
+    calls = []
+
+    def send(text):
+        calls.append(clock[0])
+        if len(calls) == 1:
+            raise RetryAfter(4)
+        return text
+
+    assert limiter.call_sync(TOKEN, 42, send, 'hi') == 'hi'
+    assert len(calls) == 2
+    assert calls[1] - calls[0] >= 4
+
+
+def test_call_sync_gives_up_and_reraises(limiter):
+    def send():
+        raise RetryAfter(1)
+
+    with pytest.raises(RetryAfter):
+        limiter.call_sync(TOKEN, None, send)
+
+    def broken():
+        raise ValueError('not a rate limit')
+
+    with pytest.raises(ValueError):
+        limiter.call_sync(TOKEN, None, broken)
+
+
+def test_send_all_counts_and_bounds_concurrency():
+    running = [0, 0]
+
+    async def send(target):
+        running[0] += 1
+        running[1] = max(running[1], running[0])
+        await asyncio.sleep(0.01)
+        running[0] -= 1
+        if target % 5 == 0:
+            raise RuntimeError('failed')
+        return target % 2 == 0
+
+    total, success = asyncio.run(send_all(range(1, 21), send, concurrency=4))
+    assert total == 20
+    # الزوجية غير المضاعفة لخمسة: 2، 4، 6، 8، 12، 14، 16، 18
+    assert success == 8
+    assert running[1] == 4
+
+
+def test_send_all_accepts_async_iterables():
+    async def targets():
+        for target in range(5):
+            yield target
+
+    async def send(target):
+        return True
+
+    assert asyncio.run(send_all(targets(), send)) == (5, 5)
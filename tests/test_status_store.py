@@ -0,0 +1,80 @@
+"""
+مخزن حالات المراقبة: الأعداد والمتعثرة وإعادة استخدام الخانات والحفظ
+"""
+import pytest
+
+from status_store import FILE_MAGIC, StatusStore
+
+
+@pytest.fixture
+def store():
+    store = StatusStore()
+    store.set(1, 'online', 120, 1000)
+    store.set(2, 'offline', None, 1000)
+    store.set(3, 'timeout', 5000, 1000)
+    return store
+
+
+def test_counts_and_failing(store):
+    counts = store.counts()
+    assert (counts['online'], counts['offline'], counts['timeout']) == (1, 1, 1)
+    assert len(store) == 3
+    assert store.failing() == [(2, 'offline'), (3, 'timeout')]
+    assert store.failing(limit=1) == [(2, 'offline')]
+
+
+def test_update_moves_counts(store):
+    store.set(2, 'online', 80, 2000)
+    assert store.counts()['online'] == 2
+    assert store.counts()['offline'] == 0
+    assert store.failing() == [(3, 'timeout')]
+    assert store.get(2)['latency_ms'] == 80.0
+
+
+def test_get_without_latency(store):
+    result = store.get(2)
+    assert result['status'] == 'offline'
+    assert result['latency_ms'] is None
+    assert store.get(99) is None
+
+
+def test_unknown_status_counts_as_error():
+    store = StatusStore()
+    store.set(1, 'weird', None)
+    assert store.status(1) == 'error'
+
+
+def test_remove_reuses_slot(store):
+    store.remove(2)
+    assert 2 not in store
+    assert store.counts()['offline'] == 0
+    store.set(4, 'online', 10, 1000)
+    assert len(store._ids) == 3
+    assert store.status(4) == 'online'
+
+
+def test_retain_drops_others(store):
+    store.retain([1, 3, 42])
+    assert sorted(bot_id for bot_id in (1, 2, 3) if bot_id in store) == [1, 3]
+    assert sum(store.counts().values()) == 2
+    assert store.failing() == [(3, 'timeout')]
+
+
+def test_save_and_load_round_trip(store, tmp_path):
+    path = str(tmp_path / 'state.bin')
+    store.remove(1)
+    assert store.save(path) == 2
+
+    loaded = StatusStore()
+    assert loaded.load(path) == 2
+    assert loaded.counts() == store.counts()
+    assert loaded.failing() == store.failing()
+    assert loaded.get(3) == store.get(3)
+
+
+def test_load_rejects_foreign_file(tmp_path):
+    path = tmp_path / 'state.bin'
+    path.write_bytes(b'XXXX' + FILE_MAGIC)
+    with pytest.raises(ValueError):
+        StatusStore().load(str(path))
+    assert StatusStore().load(str(tmp_path / 'missing.bin')) == 0
@@ -2,13 +2,19 @@
 أدوات ومساعدات مصنع البوتات
 Bot Factory Utilities
 """
+import os
 import re
 import requests
+import functools
 import asyncio
 import logging
 from typing import Dict, Optional, List, Tuple
 from datetime import datetime
 from config import Config, EMOJIS, MESSAGES
+from rate_limiter import rate_limiter, retry_after_in, send_all
+
+# مجلد المصنع؛ البوتات المولدة تستورد منه محدد المعدل المشترك
+FACTORY_DIR = os.path.dirname(os.path.abspath(__file__))
 
 logger = logging.getLogger(__name__)
 
@@ -68,7 +74,7 @@ class MessageFormatter:
     def format_bot_info(bot: Dict, include_stats: bool = True) -> str:
         """تنسيق معلومات البوت"""
         bot_name = bot.get('bot_username', '') or bot.get('bot_name', '') or f"Bot {bot['id']}"
-        created_date = datetime.fromisoformat(bot['date_created']).strftime('%Y-%m-%d')
+        created_date = datetime.fromtimestamp(bot['date_created']).strftime('%Y-%m-%d')
         
         text = f"""
 {EMOJIS['bot']} **{bot_name}**
@@ -119,10 +125,10 @@ class MessageFormatter:
         return text
     
     @staticmethod
-    def format_time_ago(timestamp_str: str) -> str:
-        """تنسيق الوقت المنقضي"""
+    def format_time_ago(timestamp: int) -> str:
+        """تنسيق الوقت المنقضي (من ثوانٍ منذ epoch)"""
         try:
-            timestamp = datetime.fromisoformat(timestamp_str)
+            timestamp = datetime.fromtimestamp(timestamp)
             now = datetime.now()
             diff = now - timestamp
             
@@ -145,30 +151,27 @@ class BroadcastManager:
     @staticmethod
     async def send_broadcast_via_factory(bot_instance, message: str, target_users: List[int]) -> Dict:
         """إرسال إذاعة عبر البوت الرئيسي"""
-        sent = 0
-        failed = 0
         errors = []
         
-        for user_id in target_users:
+        async def deliver(user_id: int) -> bool:
+            # حدود API يطبقها PTBRateLimiter المسجل في تطبيق المصنع
             try:
                 await bot_instance.send_message(
                     chat_id=user_id,
                     text=f"{EMOJIS['broadcast']} **إذاعة من مصنع البوتات**\n\n{message}",
                     parse_mode='Markdown'
                 )
-                sent += 1
-                
-                # تأخير بسيط لتجنب حدود API
-                await asyncio.sleep(Config.BROADCAST_DELAY)
-                
+                return True
             except Exception as e:
-                failed += 1
                 errors.append(f"User {user_id}: {str(e)}")
                 logger.error(f"فشل إرسال الإذاعة للمستخدم {user_id}: {e}")
+                return False
+        
+        _, sent = await send_all(target_users, deliver)
         
         return {
             'sent': sent,
-            'failed': failed,
+            'failed': len(target_users) - sent,
             'total': len(target_users),
             'errors': errors
         }
@@ -176,61 +179,60 @@ class BroadcastManager:
     @staticmethod
     async def send_broadcast_via_bots(message: str, bot_tokens: List[str], target_users: List[int]) -> Dict:
         """إرسال إذاعة عبر البوتات المصنوعة"""
-        sent = 0
-        failed = 0
-        errors = []
-        
         # توزيع المستخدمين على البوتات
         users_per_bot = len(target_users) // len(bot_tokens) if bot_tokens else 0
         
+        batches = []
         for i, token in enumerate(bot_tokens):
             start_idx = i * users_per_bot
             end_idx = start_idx + users_per_bot if i < len(bot_tokens) - 1 else len(target_users)
-            bot_users = target_users[start_idx:end_idx]
-            
-            bot_result = await BroadcastManager._send_via_single_bot(token, message, bot_users)
-            sent += bot_result['sent']
-            failed += bot_result['failed']
-            errors.extend(bot_result['errors'])
+            batches.append(BroadcastManager._send_via_single_bot(token, message, target_users[start_idx:end_idx]))
+        
+        # لكل بوت دلوه الخاص في محدد المعدل فتعمل البوتات بالتوازي
+        results = await asyncio.gather(*batches)
         
         return {
-            'sent': sent,
-            'failed': failed,
+            'sent': sum(result['sent'] for result in results),
+            'failed': sum(result['failed'] for result in results),
             'total': len(target_users),
-            'errors': errors,
+            'errors': [error for result in results for error in result['errors']],
             'bots_used': len(bot_tokens)
         }
     
     @staticmethod
     async def _send_via_single_bot(token: str, message: str, users: List[int]) -> Dict:
         """إرسال عبر بوت واحد"""
-        sent = 0
-        failed = 0
         errors = []
+        url = f"https://api.telegram.org/bot{token}/sendMessage"
+        loop = asyncio.get_running_loop()
         
-        for user_id in users:
+        async def deliver(user_id: int) -> bool:
+            data = {
+                'chat_id': user_id,
+                'text': f"{EMOJIS['broadcast']} {message}",
+                'parse_mode': 'Markdown'
+            }
             try:
-                url = f"https://api.telegram.org/bot{token}/sendMessage"
-                data = {
-                    'chat_id': user_id,
-                    'text': f"{EMOJIS['broadcast']} {message}",
-                    'parse_mode': 'Markdown'
-                }
+                for attempt in range(Config.MAX_BROADCAST_RETRIES + 1):
+                    await rate_limiter.acquire(token, user_id)
+                    # requests متزامنة فتُنفذ في خيط حتى لا توقف حلقة الأحداث
+                    response = await loop.run_in_executor(
+                        None, functools.partial(requests.post, url, data=data, timeout=10)
+                    )
+                    if response.status_code != 429:
+                        break
+                    rate_limiter.on_retry_after(token, retry_after_in(response.json()) or 1)
                 
-                response = requests.post(url, data=data, timeout=10)
                 if response.status_code == 200:
-                    sent += 1
-                else:
-                    failed += 1
-                    errors.append(f"User {user_id}: HTTP {response.status_code}")
-                
-                await asyncio.sleep(Config.BROADCAST_DELAY)
-                
+                    return True
+                errors.append(f"User {user_id}: HTTP {response.status_code}")
             except Exception as e:
-                failed += 1
                 errors.append(f"User {user_id}: {str(e)}")
+            return False
         
-        return {'sent': sent, 'failed': failed, 'errors': errors}
+        _, sent = await send_all(users, deliver)
+        
+        return {'sent': sent, 'failed': len(users) - sent, 'errors': errors}
 
 class SecurityManager:
     """مدير الأمان"""
@@ -281,20 +283,69 @@ Bot ID: {bot_id}
 Created: {datetime.now().isoformat()}
 """
 import os
+import sys
 import json
 import random
+import sqlite3
 import logging
 import requests
-from telebot import TeleBot
+import threading
+import time
 from telebot.types import Message
 
+sys.path.insert(0, {FACTORY_DIR!r})
+from rate_limiter import rate_limiter
+from bot_template import PollingTeleBot, HEARTBEAT_DB, HEARTBEAT_INTERVAL, HEARTBEAT_UPSERT_SQL
+
 # إعداد التسجيل
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger('bot_{bot_id}')
 
-# التوكن
+# التوكن ومعرف البوت في المصنع
 BOT_TOKEN = "{token}"
-bot = TeleBot(BOT_TOKEN)
+BOT_ID = {bot_id}
+
+# PollingTeleBot يمرر الإرسال عبر محدد المعدل ويحفظ وقت آخر getUpdates للنبض
+bot = PollingTeleBot(BOT_TOKEN)
+
+# عدادات النبض
+STARTED_AT = int(time.time())
+STATS = {{'messages_count': 0, 'last_update_at': None, 'update_lag_ms': None}}
+USERS = set()
+GROUPS = set()
+
+def track_messages(messages):
+    """تحديث عدادات النبض لكل دفعة رسائل"""
+    now = time.time()
+    for message in messages:
+        STATS['messages_count'] += 1
+        STATS['last_update_at'] = int(now)
+        STATS['update_lag_ms'] = max(0, int((now - message.date) * 1000))
+        if message.from_user:
+            USERS.add(message.from_user.id)
+        if message.chat.type in ('group', 'supergroup'):
+            GROUPS.add(message.chat.id)
+
+bot.set_update_listener(track_messages)
+
+def heartbeat_loop():
+    """كتابة النبض في قاعدة بيانات المصنع كل HEARTBEAT_INTERVAL ثانية"""
+    conn = None
+    while True:
+        try:
+            if conn is None:
+                conn = sqlite3.connect(HEARTBEAT_DB, timeout=5)
+            conn.execute(HEARTBEAT_UPSERT_SQL, (
+                BOT_ID, int(time.time()), STARTED_AT, bot.last_poll_at, STATS['last_update_at'],
+                STATS['update_lag_ms'], STATS['messages_count'], len(USERS), len(GROUPS), os.getpid()
+            ))
+            conn.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"تعذر إرسال النبض: {{e}}")
+            if conn is not None:
+                conn.close()
+                conn = None
+        time.sleep(HEARTBEAT_INTERVAL)
 
 # رسالة الترحيب
 WELCOME_MESSAGE = """{welcome_msg}"""
@@ -386,6 +437,7 @@ def handle_all_messages(message: Message):
                     'reaction': json.dumps([{{'type': 'emoji', 'emoji': emoji}}])
                 }}
                 
+                rate_limiter.acquire_sync(BOT_TOKEN)
                 response = requests.post(reaction_url, data=reaction_data, timeout=5)
                 if response.status_code != 200:
                     # إذا فشل التفاعل، أرسل رد نصي
@@ -404,6 +456,8 @@ def handle_all_messages(message: Message):
 
 if __name__ == '__main__':
     logger.info("🚀 بدء تشغيل البوت...")
+    if HEARTBEAT_INTERVAL > 0:
+        threading.Thread(target=heartbeat_loop, name='heartbeat', daemon=True).start()
     try:
         bot.infinity_polling(timeout=10, long_polling_timeout=5)
     except Exception as e: